@@ -0,0 +1,794 @@
+import argparse
+import contextlib
+import gc
+import io
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from functools import lru_cache
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from typing import Dict, List, Any, Callable, Tuple
+
+import main
+
+# Varsayılan ölçüm boyutları: (bugünkü maç sayısı, geçmiş maç sayısı)
+DEFAULT_SIMILARITY_SIZES = [(50, 2000), (100, 10000), (400, 30000)]
+QUICK_SIMILARITY_SIZES = [(20, 500), (50, 2000)]
+# Blok taraması ölçümünün bellek bütçesi (bayt)
+SCAN_BENCHMARK_BUDGET = 1024 * 1024
+# Sonuç küpü ölçümünde maçların dağıtıldığı lig sayısı ve lig bazlı özetlenen bugünkü maç sayısı
+CUBE_BENCHMARK_LEAGUES = 120
+CUBE_BENCHMARK_TODAY = 100
+
+LEAGUES = [
+    "İngiltere Premier Lig", "İspanya La Liga", "İtalya Serie A", "Almanya Bundesliga",
+    "Fransa Ligue 1", "Türkiye Süper Lig", "Hollanda Eredivisie", "Portekiz Liga",
+    "Belçika Pro Lig", "İskoçya Premiership", "Brezilya Serie A", "Arjantin Lig"
+]
+
+# MatchData.market_types ters çevrilmiş hali (ham API verisi üretmek için)
+MARKET_IDS = {market_type: market_id for market_id, market_type in main.MatchData().market_types.items()}
+
+def poisson_pmf(k: int, lam: float) -> float:
+    return math.exp(-lam) * lam ** k / math.factorial(k)
+
+def score_distribution(lam_home: float, lam_away: float, max_goals: int = 10) -> Dict[Tuple[int, int], float]:
+    """Bağımsız Poisson varsayımıyla skor olasılıkları"""
+    return {
+        (home, away): poisson_pmf(home, lam_home) * poisson_pmf(away, lam_away)
+        for home in range(max_goals + 1) for away in range(max_goals + 1)
+    }
+
+def probability(distribution: Dict[Tuple[int, int], float], condition: Callable[[int, int], bool]) -> float:
+    return sum(p for (home, away), p in distribution.items() if condition(home, away))
+
+def to_odd(p: float, margin: float) -> int:
+    """Olasılığı bahis marjı eklenmiş orana çevirir (saklama biçimindeki gibi tick olarak)"""
+    return main.decimal_odds_to_ticks(f"{max(1.01, min(50.0, 1 / max(p * margin, 1e-6))):.2f}")
+
+@lru_cache(maxsize=None)
+def generate_match_odds(lam_home: float, lam_away: float, margin: float) -> Dict[str, int]:
+    """Beklenen gollerden tüm marketler için tutarlı oranlar üretir (sonuç önbelleğe alınır, değiştirilmemeli)"""
+    ft = score_distribution(lam_home, lam_away)
+    ht = score_distribution(lam_home * 0.45, lam_away * 0.45, max_goals=5)
+    result = lambda h, a: "1" if h > a else ("X" if h == a else "2")
+
+    odds = {}
+    for outcome in ["1", "X", "2"]:
+        odds[f"Maç Sonucu_{outcome}"] = to_odd(probability(ft, lambda h, a: result(h, a) == outcome), margin)
+        odds[f"İlk Yarı_{outcome}"] = to_odd(probability(ht, lambda h, a: result(h, a) == outcome), margin)
+    both = probability(ft, lambda h, a: h > 0 and a > 0)
+    odds["Karşılıklı Gol_Var"] = to_odd(both, margin)
+    odds["Karşılıklı Gol_Yok"] = to_odd(1 - both, margin)
+    over = probability(ft, lambda h, a: h + a > 2.5)
+    odds["A/U 2.5_Üst"] = to_odd(over, margin)
+    odds["A/U 2.5_Alt"] = to_odd(1 - over, margin)
+    ht_over = probability(ht, lambda h, a: h + a > 1.5)
+    odds["IY 1.5_Üst"] = to_odd(ht_over, margin)
+    odds["IY 1.5_Alt"] = to_odd(1 - ht_over, margin)
+    for outcome, low, high in [("0-1", 0, 1), ("2-3", 2, 3), ("4-5", 4, 5), ("6+", 6, 99)]:
+        odds[f"Toplam Gol_{outcome}"] = to_odd(probability(ft, lambda h, a: low <= h + a <= high), margin)
+    home_over = probability(ft, lambda h, a: h > 1.5)
+    odds["EV 1.5_Üst"] = to_odd(home_over, margin)
+    odds["EV 1.5_Alt"] = to_odd(1 - home_over, margin)
+    away_over = probability(ft, lambda h, a: a > 1.5)
+    odds["DEP 1.5_Üst"] = to_odd(away_over, margin)
+    odds["DEP 1.5_Alt"] = to_odd(1 - away_over, margin)
+    # İY/MS: ilk yarı ve ikinci yarı bağımsız kabul edilir
+    second_half = score_distribution(lam_home * 0.55, lam_away * 0.55, max_goals=5)
+    htft = {}
+    for (ht_home, ht_away), p_ht in ht.items():
+        for (sh_home, sh_away), p_sh in second_half.items():
+            key = f"{result(ht_home, ht_away)}/{result(ht_home + sh_home, ht_away + sh_away)}"
+            htft[key] = htft.get(key, 0.0) + p_ht * p_sh
+    for outcome in main.MARKET_OUTCOMES["IY/MS"]:
+        odds[f"IY/MS_{outcome}"] = to_odd(htft.get(outcome, 0.0), margin)
+    return odds
+
+def generate_synthetic_match(rng: random.Random, match_id: int, date_str: str, finished: bool,
+                             market_coverage: float, missing_ht_ratio: float, margin: float,
+                             strength_spread: float, missing_outcome_ratio: float = 0.0) -> Dict[str, Any]:
+    """
+    historic_matches.json içindeki biçimde tek bir maç üretir.
+    missing_outcome_ratio: bulunan marketlerde tek bir seçenek oranının eksik olma olasılığı
+    """
+    # Beklenen goller 0.05 adımlarla yuvarlanır; oran üretimi önbellekten gelir
+    lam_home = round(max(0.2, rng.gauss(1.45, strength_spread)) * 20) / 20
+    lam_away = round(max(0.2, rng.gauss(1.15, strength_spread)) * 20) / 20
+    match = {
+        "id": match_id,
+        "uuid": f"synthetic-{match_id}",
+        "Lig": rng.choice(LEAGUES),
+        "Tarih": date_str,
+        "Saat": f"{rng.randint(12, 22):02d}:{rng.choice(['00', '15', '30', '45'])}",
+        "Ev Sahibi": f"Takım {rng.randint(1, 800)}",
+        "Deplasman": f"Takım {rng.randint(1, 800)}",
+        "Status": 3 if finished else 1,
+        "Skor": "- - -",
+        "İlk Yarı Skoru": "- - -"
+    }
+
+    if finished:
+        ht_home = sum(1 for _ in range(10) if rng.random() < lam_home * 0.045)
+        ht_away = sum(1 for _ in range(10) if rng.random() < lam_away * 0.045)
+        home = ht_home + sum(1 for _ in range(10) if rng.random() < lam_home * 0.055)
+        away = ht_away + sum(1 for _ in range(10) if rng.random() < lam_away * 0.055)
+        match["Skor"] = f"{home} - {away}"
+        if rng.random() >= missing_ht_ratio:
+            match["İlk Yarı Skoru"] = f"{ht_home} - {ht_away}"
+
+    odds = generate_match_odds(lam_home, lam_away, margin)
+    for market_type in main.MARKET_OUTCOMES:
+        if market_type != "Maç Sonucu" and rng.random() > market_coverage:
+            continue
+        for outcome in main.MARKET_OUTCOMES[market_type]:
+            if missing_outcome_ratio and rng.random() < missing_outcome_ratio:
+                continue
+            match[f"{market_type}_{outcome}"] = odds[f"{market_type}_{outcome}"]
+    return match
+
+def generate_synthetic_history(days: int = 30, matches_per_day: int = 300, market_coverage: float = 0.9,
+                               missing_ht_ratio: float = 0.1, margin: float = 1.07, strength_spread: float = 0.45,
+                               end_date: str = "2025-02-03", seed: int = 42,
+                               missing_outcome_ratio: float = 0.0) -> Dict[str, Any]:
+    """
+    historic_matches.json biçiminde sentetik geçmiş veri üretir.
+    market_coverage: Maç Sonucu dışındaki her marketin bulunma olasılığı
+    missing_ht_ratio: ilk yarı skoru olmayan ("- - -") maç oranı
+    missing_outcome_ratio: bulunan marketlerde tek tek seçenek oranlarının eksik olma olasılığı
+    margin / strength_spread: oran dağılımını belirleyen bahis marjı ve takım gücü saçılımı
+    """
+    rng = random.Random(seed)
+    last_day = datetime.strptime(end_date, "%Y-%m-%d")
+    matches = {}
+    match_id = 1
+    for offset in range(days - 1, -1, -1):
+        date_str = (last_day - timedelta(days=offset)).strftime("%Y-%m-%d")
+        day_matches = []
+        for _ in range(matches_per_day):
+            day_matches.append(generate_synthetic_match(rng, match_id, date_str, True, market_coverage,
+                                                        missing_ht_ratio, margin, strength_spread, missing_outcome_ratio))
+            match_id += 1
+        matches[date_str] = day_matches
+    return {"matches": matches, "last_update": f"{end_date} 23:59:59", "odds_scale": main.ODDS_SCALE}
+
+def generate_synthetic_bulletin(matches: int = 300, date_str: str = "2025-02-04", market_coverage: float = 0.9,
+                                margin: float = 1.07, strength_spread: float = 0.45, seed: int = 7,
+                                missing_outcome_ratio: float = 0.0) -> List[Dict[str, Any]]:
+    """Analiz günü için oynanmamış (Status 1) sentetik bülten üretir"""
+    rng = random.Random(seed)
+    return [
+        generate_synthetic_match(rng, 10_000_000 + i, date_str, False, market_coverage, 0.0, margin, strength_spread,
+                                 missing_outcome_ratio)
+        for i in range(matches)
+    ]
+
+def to_raw_api_match(match: Dict[str, Any]) -> Dict[str, Any]:
+    """Saklanan maç kaydını bülten API'sinin ham biçimine çevirir (parse_match_data ölçümü için)"""
+    markets = {}
+    for column in main.ODDS_COLUMNS:
+        if column in match:
+            market_type, outcome = column.split("_", 1)
+            markets.setdefault(market_type, []).append({"n": outcome, "v": main.ticks_to_odds(match[column])})
+    home, away = main.parse_score(match.get("Skor"))
+    ht_home, ht_away = main.parse_score(match.get("İlk Yarı Skoru"))
+    return {
+        "id": match["id"],
+        "uuid": match["uuid"],
+        "title": match["Lig"],
+        "time": match["Saat"],
+        "team_A": match["Ev Sahibi"],
+        "team_B": match["Deplasman"],
+        "Status": match["Status"],
+        "fts_A": home, "fts_B": away, "hts_A": ht_home, "hts_B": ht_away,
+        "markets": [{"i": MARKET_IDS[market_type], "o": [{"l": outcomes}]} for market_type, outcomes in markets.items()]
+    }
+
+@lru_cache(maxsize=None)
+def generate_api_day(date_str: str, matches: int) -> Tuple[Dict[str, Any], ...]:
+    """Sahte API sunucusunun bir gün için döndürdüğü bitmiş maçlar (id'ler günden türetilir, çakışmaz)"""
+    day_number = datetime.strptime(date_str, "%Y-%m-%d").toordinal()
+    rng = random.Random(day_number)
+    return tuple(generate_synthetic_match(rng, day_number * 10_000 + i, date_str, True, 0.9, 0.1, 1.07, 0.45)
+                 for i in range(matches))
+
+class StubFeedHandler(BaseHTTPRequestHandler):
+    """Token, bülten ve maç detayı uç noktalarını sentetik veriyle yanıtlayan yerel API sunucusu"""
+
+    matches_per_day = 300
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        date_str = parse_qs(url.query).get("date", [""])[0]
+        if url.path == "/token":
+            payload = {"data": {"token": "benchmark"}}
+        elif url.path.startswith("/betting-service/bulletin/"):
+            areas = {}
+            for match in generate_api_day(date_str, self.matches_per_day):
+                areas.setdefault(match["Lig"], []).append(to_raw_api_match(match))
+            payload = {"data": {"soccer": [{"title": league, "matches": matches} for league, matches in areas.items()]}}
+        elif url.path.startswith("/api/matches/"):
+            details = []
+            for match in generate_api_day(date_str, self.matches_per_day):
+                raw = to_raw_api_match(match)
+                details.append({key: raw[key] for key in ("id", "fts_A", "fts_B", "hts_A", "hts_B")})
+                details[-1].update({"match_time": match["Saat"], "status": "Played"})
+            payload = {"data": {"areas": [{"competitions": [{"matches": details}]}]}}
+        else:
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args):
+        pass
+
+class ThrottlingStubHandler(StubFeedHandler):
+    """
+    Kısıtlama yapan sahte API: saniyede rate_limit isteği ve en fazla max_in_flight eşzamanlı isteği kabul eder,
+    fazlasına Retry-After ile 429 döner. Kabul edilen her istek eşzamanlı istek sayısıyla artan gecikmeyle yanıtlanır.
+    """
+
+    rate_limit = 5.0
+    max_in_flight = 2
+    latency = 0.02
+    stats = {"accepted": 0, "throttled": 0}
+    _lock = threading.Lock()
+    _tokens = 0.0
+    _refilled_at = 0.0
+    _in_flight = 0
+
+    @classmethod
+    def reset(cls):
+        with cls._lock:
+            cls.stats = {"accepted": 0, "throttled": 0}
+            cls._tokens = cls.rate_limit
+            cls._refilled_at = time.monotonic()
+            cls._in_flight = 0
+
+    def do_GET(self):
+        cls = type(self)
+        with cls._lock:
+            now = time.monotonic()
+            cls._tokens = min(cls.rate_limit, cls._tokens + (now - cls._refilled_at) * cls.rate_limit)
+            cls._refilled_at = now
+            accepted = cls._tokens >= 1 and cls._in_flight < cls.max_in_flight
+            if accepted:
+                cls._tokens -= 1
+                cls._in_flight += 1
+            cls.stats["accepted" if accepted else "throttled"] += 1
+            in_flight = cls._in_flight
+        if not accepted:
+            self.send_response(429)
+            self.send_header("Retry-After", "1")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        try:
+            time.sleep(cls.latency * in_flight)
+            super().do_GET()
+        finally:
+            with cls._lock:
+                cls._in_flight -= 1
+
+def measure(func: Callable[[], Any], repeat: int = 3, track_memory: bool = True) -> Dict[str, float]:
+    """Fonksiyonu tekrar tekrar çalıştırır; en iyi/medyan süre ve (ayrı bir çalıştırmada) tepe bellek döner"""
+    timings = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            gc.collect()
+            started = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - started)
+
+        peak_mb = None
+        if track_memory:
+            gc.collect()
+            tracemalloc.start()
+            func()
+            peak_mb = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+            tracemalloc.stop()
+
+    timings.sort()
+    return {
+        "best_seconds": round(timings[0], 6),
+        "median_seconds": round(timings[len(timings) // 2], 6),
+        "peak_memory_mb": round(peak_mb, 3) if peak_mb is not None else None
+    }
+
+def measure_runs(setup: Callable[[], Any], func: Callable[[], Any], repeat: int = 3) -> Dict[str, float]:
+    """Her tekrardan önce setup'ı (süreye katmadan) çalıştırır; alt süreç ölçümleri için bellek izlenmez"""
+    timings = []
+    for _ in range(repeat):
+        setup()
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return {
+        "best_seconds": round(timings[0], 6),
+        "median_seconds": round(timings[len(timings) // 2], 6),
+        "peak_memory_mb": None
+    }
+
+def count_scan_rejections(func: Callable[[], Any]) -> Dict[str, Any]:
+    """Fonksiyonu ölçümler açıkken bir kez çalıştırır ve tarama çekirdeğinin eleme sayaçlarını döndürür"""
+    metrics_enabled = main.METRICS.enabled
+    main.METRICS.enable()
+    main.METRICS.reset()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            func()
+        counters = main.METRICS.snapshot()["counters"]
+    finally:
+        main.METRICS.reset()
+        if not metrics_enabled:
+            main.METRICS.disable()
+    pairs = counters.get("pairs_compared", 0)
+    rejected = counters.get("pairs_rejected_early", 0)
+    return {
+        "pairs": pairs,
+        "rejected_early": rejected,
+        "unfinished_skipped": counters.get("pairs_unfinished_skipped", 0),
+        "ht_pairs_skipped": counters.get("ht_pairs_skipped", 0),
+        "candidates": pairs - counters.get("candidates_pruned", 0),
+        "rejected_ratio": round(rejected / pairs, 4) if pairs else None
+    }
+
+# Kural doğrulamasının boyutu (bugünkü maç, geçmiş maç); referans döngü çift başına çalıştığı için küçük tutulur
+REFERENCE_CHECK_SIZE = (20, 600)
+
+def reference_similar_matches(historical_df: main.pd.DataFrame, today_df: main.pd.DataFrame,
+                              threshold: float = 0.05) -> List[Dict[str, Any]]:
+    """
+    find_similar_matches'in vektörel çekirdekten önceki çift başına döngüsü (kuralların referansı).
+    Marketin seçenekleri bugünkü tablonun sütunlarından alınır; sütunu olup oranı eksik (NaN) seçenek sayılır
+    ve eşleşmez. Oranlar tick olarak saklandığı için fark tick cinsinden karşılaştırılır.
+    """
+    threshold_ticks = main.threshold_to_ticks(threshold)
+    historical_df = historical_df.drop_duplicates(subset=["Ev Sahibi", "Deplasman", "Tarih"])
+    today_df = today_df.drop_duplicates(subset=["Ev Sahibi", "Deplasman"])
+    similar_matches = []
+
+    def compare_market(today_match, hist_match, market_type):
+        market_odds = []
+        valid_outcomes_count = 0
+        total_outcomes_count = 0
+        for outcome in [col for col in today_match.index if col.startswith(market_type)]:
+            today_odd = today_match.get(outcome, "-")
+            hist_odd = hist_match.get(outcome, "-")
+            try:
+                today_odd = float(today_odd) if today_odd != "-" else None
+                hist_odd = float(hist_odd) if hist_odd != "-" else None
+            except ValueError:
+                continue
+            if today_odd is not None and hist_odd is not None:
+                total_outcomes_count += 1
+                difference = abs(today_odd - hist_odd)
+                if difference <= threshold_ticks:
+                    valid_outcomes_count += 1
+                    market_odds.append({
+                        'outcome': outcome.split('_')[-1],
+                        'today': main.ticks_to_odds(today_odd),
+                        'historical': main.ticks_to_odds(hist_odd),
+                        'difference': main.ticks_to_odds(difference)
+                    })
+        if total_outcomes_count == 0:
+            return None
+        if market_type == "IY/MS":
+            return market_odds if valid_outcomes_count >= 3 else None
+        return market_odds if valid_outcomes_count == total_outcomes_count else None
+
+    for _, today_match in today_df.iterrows():
+        if today_match["Status"] != 1:
+            continue
+        for _, hist_match in historical_df.iterrows():
+            if hist_match["Status"] != 3:
+                continue
+            markets = list(main.NON_HT_MARKETS)
+            if hist_match.get("İlk Yarı Skoru", "-") != "- - -":
+                markets += main.HT_REQUIRED_MARKETS
+            odds_comparison = {}
+            for market_type in markets:
+                market_odds = compare_market(today_match, hist_match, market_type)
+                if market_odds is not None:
+                    odds_comparison[market_type] = market_odds
+            if len(odds_comparison) >= 3:
+                similar_matches.append({
+                    "Bugünkü Maç": f"{today_match['Ev Sahibi']} vs {today_match['Deplasman']}",
+                    "Benzer Geçmiş Maç": f"{hist_match['Ev Sahibi']} vs {hist_match['Deplasman']}",
+                    "Geçmiş Maç Tarihi": hist_match["Tarih"],
+                    "Oranlar": odds_comparison,
+                    "Eşleşen Kategori Sayısı": len(odds_comparison)
+                })
+    return similar_matches
+
+def similarity_signature(similar_matches: List[Dict[str, Any]]) -> List[Tuple]:
+    """Benzer maç listesinin sıradan bağımsız karşılaştırılabilir özeti"""
+    return sorted(
+        (match["Bugünkü Maç"], match["Benzer Geçmiş Maç"], str(match["Geçmiş Maç Tarihi"]), match["Eşleşen Kategori Sayısı"],
+         tuple(sorted((market_type, tuple(sorted((o["outcome"], o["today"], o["historical"], o["difference"]) for o in odds)))
+                      for market_type, odds in match["Oranlar"].items())))
+        for match in similar_matches
+    )
+
+def check_similarity_rules(historical_matches: List[Dict[str, Any]], today_matches: List[Dict[str, Any]],
+                           threshold: float = 0.05) -> Dict[str, Any]:
+    """find_similar_matches sonuçlarını referans döngüyle karşılaştırır"""
+    historical_df, historical_odds = main.prepare_historical_data(historical_matches)
+    today_df = main.pd.DataFrame(today_matches)
+    expected = similarity_signature(reference_similar_matches(historical_df, today_df, threshold))
+    with contextlib.redirect_stdout(io.StringIO()):
+        actual = similarity_signature(main.find_similar_matches(historical_df, today_df, threshold,
+                                                                historical_odds=historical_odds, verbose=False))
+    # Market sütunu tabloda olup bu maçta oranı olmayan seçenekler
+    today_missing = sum(1 for match in today_matches for column in main.ODDS_COLUMNS
+                        if column not in match and column in today_df.columns)
+    return {
+        "name": "similarity_rules",
+        "size": {"today": len(today_matches), "history": len(historical_matches),
+                 "today_outcomes_missing": today_missing},
+        "reference_found": len(expected),
+        "similar_found": len(actual),
+        "matches_reference": expected == actual
+    }
+
+def scenario_result(name: str, size: Dict[str, Any], items: int, unit: str, timing: Dict[str, float]) -> Dict[str, Any]:
+    return dict(
+        name=name,
+        size=size,
+        items=items,
+        unit=unit,
+        throughput=round(items / timing["best_seconds"], 2) if timing["best_seconds"] > 0 else None,
+        **timing
+    )
+
+def run_benchmarks(similarity_sizes: List[Tuple[int, int]], io_days: int, io_matches_per_day: int,
+                   repeat: int, track_memory: bool, market_coverage: float, missing_ht_ratio: float,
+                   missing_outcome_ratio: float = 0.0) -> List[Dict[str, Any]]:
+    results = []
+    work_dir = tempfile.mkdtemp(prefix="oran_analiz_bench_")
+    try:
+        history = generate_synthetic_history(io_days, io_matches_per_day, market_coverage, missing_ht_ratio)
+        match_count = sum(len(day_matches) for day_matches in history["matches"].values())
+        historic_file = os.path.join(work_dir, "historic_matches.json")
+        main.save_historic_data(json.loads(json.dumps(history)), historic_file)
+        file_size = os.path.getsize(historic_file)
+        io_size = {"days": io_days, "matches_per_day": io_matches_per_day, "file_bytes": file_size}
+
+        # load_historic_data (indeks dosyası ile, taşıma yapılmadan)
+        timing = measure(lambda: main.load_historic_data(historic_file), repeat, track_memory)
+        results.append(scenario_result("load_historic_data", io_size, match_count, "matches/s", timing))
+
+        # save_historic_data
+        loaded = main.load_historic_data(historic_file)
+        timing = measure(lambda: main.save_historic_data(loaded, historic_file), repeat, track_memory)
+        results.append(scenario_result("save_historic_data", io_size, match_count, "matches/s", timing))
+
+        # HistoryArrays.window (7 ve 365 günlük pencere aynı maliyette olmalı)
+        history_arrays = main.HistoryArrays.build(loaded)
+        last_day = datetime.strptime(max(loaded["matches"]), "%Y-%m-%d")
+        for window_days in (7, 365):
+            start = (last_day - timedelta(days=window_days)).strftime("%Y-%m-%d")
+            end = last_day.strftime("%Y-%m-%d")
+            window_size = len(history_arrays.window(start, end)[0])
+            timing = measure(lambda: history_arrays.window(start, end), repeat, track_memory)
+            results.append(scenario_result("history_window", {"window_days": window_days, "matches": window_size},
+                                           1, "windows/s", timing))
+
+        # Sonuç küpü: lig kırılımı ilk lig bazlı sorguda eklenir ve seyrek tutulur; bellek lig x gün ile
+        # değil maçların dokunduğu hücrelerle büyür
+        cube_history = generate_synthetic_history(io_days, io_matches_per_day, market_coverage, missing_ht_ratio)
+        cube_today = generate_synthetic_bulletin(CUBE_BENCHMARK_TODAY, date_str=(last_day + timedelta(days=1)).strftime("%Y-%m-%d"),
+                                                 market_coverage=market_coverage)
+        for match in [m for day_matches in cube_history["matches"].values() for m in day_matches] + cube_today:
+            match["Lig"] = f"Lig {match['id'] % CUBE_BENCHMARK_LEAGUES}"
+        cube_json = json.dumps(cube_history)
+        cube_data = {}
+
+        def build_cube_data():
+            cube_data.clear()
+            cube_data.update(json.loads(cube_json))
+            main.get_odds_index(cube_data)
+
+        timing = measure_runs(build_cube_data, lambda: main.get_outcome_cube(cube_data), repeat)
+        cube = main.get_outcome_cube(cube_data)
+        cube_size = {"days": io_days, "matches_per_day": io_matches_per_day, "leagues": CUBE_BENCHMARK_LEAGUES}
+        results.append(dict(scenario_result("outcome_cube_build", cube_size, match_count, "matches/s", timing),
+                            cube_bytes=cube.nbytes))
+        timing = measure_runs(build_cube_data, lambda: main.get_outcome_cube(cube_data, by_league=True), repeat)
+        cube = main.get_outcome_cube(cube_data, by_league=True)
+        results.append(dict(scenario_result("outcome_cube_leagues", cube_size, match_count, "matches/s", timing),
+                            cube_bytes=cube.nbytes))
+        cube_today_df = main.pd.DataFrame(cube_today)
+        cube_dictionary = main.get_string_dictionary(cube_data)
+        start = (last_day - timedelta(days=365)).strftime("%Y-%m-%d")
+        end = last_day.strftime("%Y-%m-%d")
+        timing = measure(lambda: main.summarize_with_cube(cube, cube_today_df, start, end, dictionary=cube_dictionary),
+                         repeat, False)
+        results.append(dict(scenario_result("outcome_cube_summary", dict(cube_size, today=CUBE_BENCHMARK_TODAY, by_league=True),
+                                            CUBE_BENCHMARK_TODAY, "matches/s", timing), cube_bytes=cube.nbytes))
+
+        # MatchData.parse_match_data
+        parser = main.MatchData()
+        raw_matches = [to_raw_api_match(match) for day_matches in history["matches"].values() for match in day_matches]
+        timing = measure(lambda: [parser.parse_match_data(raw) for raw in raw_matches], repeat, track_memory)
+        results.append(scenario_result("parse_match_data", {"matches": len(raw_matches)}, len(raw_matches), "matches/s", timing))
+
+        # find_similar_matches (N bugünkü maç x M geçmiş maç)
+        last_result = []
+        for today_count, history_count in similarity_sizes:
+            days = max(1, math.ceil(history_count / io_matches_per_day))
+            similarity_history = generate_synthetic_history(days, math.ceil(history_count / days), market_coverage,
+                                                            missing_ht_ratio, missing_outcome_ratio=missing_outcome_ratio)
+            historical_matches = [m for day_matches in similarity_history["matches"].values() for m in day_matches][:history_count]
+            historical_df, historical_odds = main.prepare_historical_data(historical_matches)
+            today_df = main.pd.DataFrame(generate_synthetic_bulletin(today_count, market_coverage=market_coverage,
+                                                                     missing_outcome_ratio=missing_outcome_ratio))
+
+            def run_similarity():
+                last_result[:] = main.find_similar_matches(historical_df, today_df, historical_odds=historical_odds, verbose=False)
+
+            timing = measure(run_similarity, repeat, track_memory)
+            size = {"today": today_count, "history": history_count, "similar_found": len(last_result)}
+            result = scenario_result("find_similar_matches", size, today_count * history_count, "pairs/s", timing)
+            result["early_exit"] = count_scan_rejections(run_similarity)
+            results.append(result)
+
+            # Sabit bellek bütçeli blok taraması: sonuçlar biriktirilmeden sayılır, tepe bellek sadece
+            # taramanın çalışma belleğidir ve geçmiş büyüdükçe artmamalıdır
+            block_rows = main.scan_block_rows(SCAN_BENCHMARK_BUDGET)
+            timing = measure(lambda: sum(1 for _ in main.iter_similar_matches(historical_df, historical_odds, today_df,
+                                                                              block_rows=block_rows)),
+                             repeat, track_memory)
+            size = {"today": today_count, "history": history_count, "budget_mb": SCAN_BENCHMARK_BUDGET // (1024 * 1024),
+                    "blocks": math.ceil(history_count / block_rows)}
+            results.append(scenario_result("similarity_scan_budget", size, today_count * history_count, "pairs/s", timing))
+
+        # Vektörel çekirdek, eski çift başına döngünün kurallarıyla aynı sonucu vermeli
+        today_count, history_count = REFERENCE_CHECK_SIZE
+        reference_history = generate_synthetic_history(2, history_count // 2, market_coverage, missing_ht_ratio,
+                                                       missing_outcome_ratio=missing_outcome_ratio)
+        results.append(check_similarity_rules(
+            [m for day_matches in reference_history["matches"].values() for m in day_matches],
+            generate_synthetic_bulletin(today_count, market_coverage=market_coverage,
+                                        missing_outcome_ratio=missing_outcome_ratio)
+        ))
+
+        # save_results_to_file (son benzerlik ölçümünün sonuçlarıyla)
+        report_dir = os.path.join(work_dir, "Analizler")
+        timing = measure(lambda: main.save_results_to_file(last_result, report_dir, False, None, today_df), repeat, track_memory)
+        written = sum(os.path.getsize(os.path.join(report_dir, name)) for name in os.listdir(report_dir))
+        results.append(scenario_result("save_results_to_file",
+                                       {"similar_matches": len(last_result), "bytes_per_report": written // max(1, len(os.listdir(report_dir)))},
+                                       len(last_result), "similar_matches/s", timing))
+
+        # write_match_reports (maç başına ayrı metin, JSON ve CSV raporları)
+        per_match_dir = os.path.join(work_dir, "Analizler", "Mac_Bazinda")
+        timing = measure(lambda: main.write_match_reports(last_result, per_match_dir, today_df, ("text", "json", "csv")),
+                         repeat, track_memory)
+        results.append(scenario_result("write_match_reports",
+                                       {"similar_matches": len(last_result), "reports": len(os.listdir(per_match_dir))},
+                                       len(last_result), "similar_matches/s", timing))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    results.extend(run_startup_benchmarks(repeat, io_days, io_matches_per_day))
+    results.extend(run_throttled_backfill_benchmark(max(io_days, 10), io_matches_per_day))
+    return results
+
+def run_startup_benchmarks(repeat: int, history_days: int, matches_per_day: int) -> List[Dict[str, Any]]:
+    """
+    main.py'yi alt süreç olarak yerel sahte API sunucusuna karşı çalıştırır: modül yükleme, menünün ilk
+    sorusuna kadar geçen süre ve sadece güncelleme (--update-only) çalıştırmasının toplam süresi.
+    Her tekrar aynı geçmiş dosyasıyla başlar; güncelleme dünü ve bugünü API'den çeker.
+    """
+    results = []
+    work_dir = tempfile.mkdtemp(prefix="oran_analiz_startup_")
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubFeedHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    script = os.path.join(script_dir, "main.py")
+    # Etkileşimli mod ana dizini ev dizininden bulur
+    env = dict(os.environ, HOME=work_dir, PYTHONIOENCODING="utf-8", PYTHONUNBUFFERED="1",
+               ORAN_ANALIZ_TOKEN_URL=f"{base_url}/token", ORAN_ANALIZ_FEED_URL=base_url)
+    base_dir = os.path.join(work_dir, "Oran Analiz")
+
+    today = datetime.now(timezone.utc)
+    history = generate_synthetic_history(history_days, matches_per_day,
+                                         end_date=(today - timedelta(days=2)).strftime("%Y-%m-%d"))
+    history["last_update"] = (today - timedelta(days=1)).strftime("%Y-%m-%d 00:00:00")
+    seed_json = json.dumps(history)
+    size = {"history_matches": history_days * matches_per_day, "fetched_days": 2, "matches_per_day": StubFeedHandler.matches_per_day}
+
+    def seed_history():
+        shutil.rmtree(base_dir, ignore_errors=True)
+        os.makedirs(os.path.join(base_dir, "Veriler"))
+        with contextlib.redirect_stdout(io.StringIO()):
+            main.save_historic_data(json.loads(seed_json), os.path.join(base_dir, "Veriler", "historic_matches.json"))
+
+    def run_until_prompt():
+        process = subprocess.Popen([sys.executable, script], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                   stderr=subprocess.DEVNULL, env=env, cwd=work_dir)
+        output = b""
+        prompt = "Seçiminiz".encode("utf-8")
+        while prompt not in output:
+            chunk = process.stdout.read1(4096)
+            if not chunk:
+                break
+            output += chunk
+        process.communicate(b"2\n", timeout=60)
+        if prompt not in output:
+            raise RuntimeError("Menü sorusu görülmedi")
+
+    def run_update_only():
+        subprocess.run([sys.executable, script, "--update-only", "--base-dir", base_dir], env=env, cwd=work_dir,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+
+    try:
+        timing = measure_runs(lambda: None, lambda: subprocess.run([sys.executable, "-c", "import main"], cwd=script_dir,
+                                                                   env=env, check=True), repeat)
+        results.append(scenario_result("startup_import", {}, 1, "starts/s", timing))
+        timing = measure_runs(seed_history, run_until_prompt, repeat)
+        results.append(scenario_result("startup_first_prompt", size, 1, "starts/s", timing))
+        timing = measure_runs(seed_history, run_update_only, repeat)
+        results.append(scenario_result("startup_update_only", size, 1, "runs/s", timing))
+    finally:
+        server.shutdown()
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+def run_throttled_backfill_benchmark(days: int, matches_per_day: int) -> List[Dict[str, Any]]:
+    """
+    Kısıtlama yapan sahte API'ye karşı son `days` günün güncellemesini (auto_update_data) ölçer.
+    Sunucunun kabul ettiği/reddettiği istekler ile zamanlayıcının yeniden deneme sayısı ve son durumu raporlanır.
+    """
+    work_dir = tempfile.mkdtemp(prefix="oran_analiz_throttle_")
+    ThrottlingStubHandler.matches_per_day = matches_per_day
+    ThrottlingStubHandler.reset()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ThrottlingStubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    urls = (main.TOKEN_URL, main.FEED_BASE_URL, main.FEED_HOST)
+    metrics_enabled = main.METRICS.enabled
+    scheduler = main.SCHEDULER
+    main.TOKEN_URL, main.FEED_BASE_URL, main.FEED_HOST = f"{base_url}/token", base_url, urlparse(base_url).netloc
+    main.SCHEDULER = main.RequestScheduler()
+    main.METRICS.enable()
+    main.METRICS.reset()
+    try:
+        historic_file = os.path.join(work_dir, "historic_matches.json")
+        last_update = datetime.now(timezone.utc) - timedelta(days=days - 1)
+        history = generate_synthetic_history(1, matches_per_day, end_date=(last_update - timedelta(days=1)).strftime("%Y-%m-%d"))
+        history["last_update"] = last_update.strftime("%Y-%m-%d 00:00:00")
+        with contextlib.redirect_stdout(io.StringIO()):
+            main.save_historic_data(history, historic_file)
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            historic_data = main.auto_update_data(historic_file)
+        elapsed = time.perf_counter() - started
+        counters = main.METRICS.snapshot()["counters"]
+        result = scenario_result("backfill_throttled", {"days": days, "matches_per_day": matches_per_day,
+                                                        "server_rate": ThrottlingStubHandler.rate_limit,
+                                                        "server_concurrency": ThrottlingStubHandler.max_in_flight},
+                                 days, "days/s", {"best_seconds": round(elapsed, 6), "median_seconds": round(elapsed, 6),
+                                                  "peak_memory_mb": None})
+        result.update(
+            days_loaded=sum(1 for day_matches in historic_data["matches"].values() if day_matches) - 1,
+            server_accepted=ThrottlingStubHandler.stats["accepted"],
+            server_throttled=ThrottlingStubHandler.stats["throttled"],
+            http_retries=counters.get("http_retries", 0),
+            http_backoffs=counters.get("http_backoffs", 0),
+            scheduler=main.SCHEDULER.state()
+        )
+        return [result]
+    finally:
+        main.TOKEN_URL, main.FEED_BASE_URL, main.FEED_HOST = urls
+        main.SCHEDULER = scheduler
+        main.METRICS.reset()
+        if not metrics_enabled:
+            main.METRICS.disable()
+        server.shutdown()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def get_code_version() -> str:
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip() or "unknown"
+    except Exception:
+        return "unknown"
+
+def compare_reports(previous: Dict[str, Any], current: Dict[str, Any]) -> List[str]:
+    """İki benchmark raporunu senaryo ve boyut bazında karşılaştırır"""
+    key = lambda result: (result["name"], json.dumps(result["size"], sort_keys=True))
+    previous_results = {key(result): result for result in previous.get("scenarios", [])}
+    lines = []
+    for result in current.get("scenarios", []):
+        old = previous_results.get(key(result))
+        if not old or not old.get("best_seconds"):
+            continue
+        ratio = result["best_seconds"] / old["best_seconds"]
+        marker = "⚠️" if ratio > 1.10 else ("🚀" if ratio < 0.90 else "  ")
+        lines.append(f"{marker} {result['name']:<22} {json.dumps(result['size'], ensure_ascii=False):<60} "
+                     f"{old['best_seconds']:.4f}s -> {result['best_seconds']:.4f}s (x{ratio:.2f})")
+    return lines
+
+def main_benchmark(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Oran Analiz performans ölçümleri (sentetik veri ile)")
+    parser.add_argument("--quick", action="store_true", help="Küçük boyutlarla hızlı çalıştırma")
+    parser.add_argument("--sizes", help="Benzerlik boyutları, 'bugün x geçmiş' listesi (örnek: 50x2000,400x30000)")
+    parser.add_argument("--days", type=int, default=None, help="Okuma/yazma ölçümü için gün sayısı")
+    parser.add_argument("--matches-per-day", type=int, default=300, help="Günlük maç sayısı (varsayılan: 300)")
+    parser.add_argument("--market-coverage", type=float, default=0.9, help="Market bulunma oranı (varsayılan: 0.9)")
+    parser.add_argument("--missing-ht", type=float, default=0.1, help="İlk yarı skoru eksik maç oranı (varsayılan: 0.1)")
+    parser.add_argument("--missing-outcomes", type=float, default=0.05,
+                        help="Benzerlik verisinde tek tek eksik seçenek oranı olasılığı (varsayılan: 0.05)")
+    parser.add_argument("--repeat", type=int, default=3, help="Tekrar sayısı (varsayılan: 3)")
+    parser.add_argument("--no-memory", action="store_true", help="tracemalloc ile tepe bellek ölçümünü atla")
+    parser.add_argument("--output", help="JSON raporun yazılacağı dosya (varsayılan: stdout)")
+    parser.add_argument("--compare", help="Karşılaştırılacak önceki JSON rapor")
+    args = parser.parse_args(argv)
+
+    if args.sizes:
+        try:
+            sizes = [tuple(int(part) for part in item.lower().split("x")) for item in args.sizes.split(",")]
+        except ValueError:
+            parser.error("--sizes biçimi: 50x2000,400x30000")
+    else:
+        sizes = QUICK_SIMILARITY_SIZES if args.quick else DEFAULT_SIMILARITY_SIZES
+    days = args.days or (3 if args.quick else 30)
+
+    report = {
+        "version": get_code_version(),
+        "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            "similarity_sizes": [list(size) for size in sizes], "days": days,
+            "matches_per_day": args.matches_per_day, "market_coverage": args.market_coverage,
+            "missing_ht_ratio": args.missing_ht, "missing_outcome_ratio": args.missing_outcomes, "repeat": args.repeat
+        },
+        "scenarios": run_benchmarks(sizes, days, args.matches_per_day, args.repeat, not args.no_memory,
+                                    args.market_coverage, args.missing_ht, args.missing_outcomes)
+    }
+
+    output = json.dumps(report, ensure_ascii=False, indent=4)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+        print(f"✅ Benchmark raporu kaydedildi: {args.output}")
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            previous = json.load(f)
+        print(f"\n📊 Karşılaştırma ({previous.get('version', '?')} -> {report['version']}):", file=sys.stderr)
+        for line in compare_reports(previous, report):
+            print(line, file=sys.stderr)
+
+    mismatched = [scenario for scenario in report["scenarios"] if scenario.get("matches_reference") is False]
+    if mismatched:
+        print("❌ Benzerlik sonuçları referans döngüden farklı!", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main_benchmark())
@@ -1,79 +1,322 @@
+from __future__ import annotations
+
 import json
-import requests
-import pandas as pd
+import csv
+import hashlib
+import importlib
+import numpy as np
 import os
 import platform
+import random
+import sqlite3
 import threading
-from typing import Dict, List, Any, Tuple
+import argparse
+import sys
+import time
+import contextlib
+import functools
+import cProfile
+import pstats
+import io
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from socketserver import ThreadingMixIn, UnixStreamServer
+from urllib.parse import urlparse, parse_qs
+from typing import Dict, List, Any, Tuple, Callable, Set
 from datetime import datetime, timedelta, timezone
 
-def update_match_fields(existing_match: Dict, new_match: Dict) -> bool:
+class LazyModule:
     """
-    Mevcut maç verisini yeni veriyle günceller
-    Returns: True if updated, False if no update needed
+    Modülü ilk öznitelik erişiminde yükleyen vekil. pandas ve requests sadece onları kullanan
+    kod yollarında yüklenir; menü ve sadece güncelleme çalıştırmaları pandas'ın yükleme süresini ödemez.
     """
-    updated = False
-    
-    # SADECE detay API'sinden skorları kullan
-    fts_A = new_match.get("fts_A")
-    fts_B = new_match.get("fts_B")
-    hts_A = new_match.get("hts_A") 
-    hts_B = new_match.get("hts_B")
-    
-    # Güncellenecek alanlar
-    fields_to_update = {
-        "Status": new_match.get("Status"),
-        "Period": new_match.get("Period"),
-        "Tarih": new_match.get("Tarih"),
-        "Saat": new_match.get("Saat")
-    }
-    
-    # Skorlar varsa ekle
-    if fts_A is not None and fts_B is not None:
-        fields_to_update["Skor"] = f"{fts_A} - {fts_B}"
-    
-    if hts_A is not None and hts_B is not None:
-        fields_to_update["İlk Yarı Skoru"] = f"{hts_A} - {hts_B}"
-
-    # Market tiplerine göre oranları güncelle
-    market_types = {
-        "Maç Sonucu": ["1", "X", "2"],
-        "İlk Yarı": ["1", "X", "2"],
-        "Karşılıklı Gol": ["Var", "Yok"],
-        "A/U 2.5": ["Üst", "Alt"],
-        "IY 1.5": ["Üst", "Alt"],
-        "Toplam Gol": ["0-1", "2-3", "4-5", "6+"],
-        "EV 1.5": ["Üst", "Alt"],
-        "DEP 1.5": ["Üst", "Alt"],
-        "IY/MS": ["1/1", "1/X", "1/2", "X/1", "X/X", "X/2", "2/1", "2/X", "2/2"]
-    }
 
-    # Her market tipi için oranları kontrol et ve güncelle
-    for market_type, outcomes in market_types.items():
-        for outcome in outcomes:
-            field_name = f"{market_type}_{outcome}"
-            new_value = new_match.get(field_name)
-            if new_value and new_value != existing_match.get(field_name):
-                existing_match[field_name] = new_value
-                updated = True
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr: str) -> Any:
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        # Sonraki erişimler __getattr__'a düşmeden normal öznitelik olarak bulunur
+        value = getattr(self._module, attr)
+        setattr(self, attr, value)
+        return value
+
+pd = LazyModule("pandas")
+requests = LazyModule("requests")
+
+# API adresleri ortam değişkenleriyle değiştirilebilir (yerel test sunucusu ve başlangıç ölçümleri için)
+TOKEN_URL = os.environ.get("ORAN_ANALIZ_TOKEN_URL", "https://www.mackolik.com/ajax/middleware/token")
+FEED_BASE_URL = os.environ.get("ORAN_ANALIZ_FEED_URL", "https://api.mackolikfeeds.com").rstrip("/")
+FEED_HOST = urlparse(FEED_BASE_URL).netloc
+
+# Market tipleri ve seçenekleri (oran alanları "<market>_<seçenek>" biçiminde tutulur)
+MARKET_OUTCOMES = {
+    "Maç Sonucu": ["1", "X", "2"],
+    "İlk Yarı": ["1", "X", "2"],
+    "Karşılıklı Gol": ["Var", "Yok"],
+    "A/U 2.5": ["Üst", "Alt"],
+    "IY 1.5": ["Üst", "Alt"],
+    "Toplam Gol": ["0-1", "2-3", "4-5", "6+"],
+    "EV 1.5": ["Üst", "Alt"],
+    "DEP 1.5": ["Üst", "Alt"],
+    "IY/MS": ["1/1", "1/X", "1/2", "X/1", "X/X", "X/2", "2/1", "2/X", "2/2"]
+}
+
+# İlk yarı skoru gerektiren ve gerektirmeyen marketler
+HT_REQUIRED_MARKETS = ["İlk Yarı", "IY 1.5", "IY/MS"]
+NON_HT_MARKETS = ["Maç Sonucu", "Karşılıklı Gol", "A/U 2.5", "Toplam Gol", "EV 1.5", "DEP 1.5"]
+
+# Oran matrisinin sütun sırası
+ODDS_COLUMNS = [f"{market}_{outcome}" for market, outcomes in MARKET_OUTCOMES.items() for outcome in outcomes]
+ODDS_COLUMN_INDEX = {column: idx for idx, column in enumerate(ODDS_COLUMNS)}
+
+# Oranlar yüzde birlik tamsayı "tick" olarak saklanır (1.85 -> 185), 0 eksik oran demektir
+ODDS_SCALE = 100
+ODDS_MISSING = 0
+ODDS_DTYPE = np.uint16
+ODDS_MAX_TICKS = np.iinfo(ODDS_DTYPE).max
+
+def decimal_odds_to_ticks(value: Any) -> int:
+    """API'den veya eski dosyalardan gelen ondalık oranı ("1.85" ya da 1.85) tick'e çevirir, geçersizse ODDS_MISSING"""
+    try:
+        ticks = float(value) * ODDS_SCALE
+    except (TypeError, ValueError):
+        return ODDS_MISSING
+    if ticks != ticks or not 0 < round(ticks) <= ODDS_MAX_TICKS:
+        return ODDS_MISSING
+    return int(round(ticks))
+
+def odds_to_ticks(value: Any) -> int:
+    """
+    Oran değerini tick'e çevirir. Metin değerler (API'den gelen "1.85") ondalık oran, sayılar
+    zaten tick kabul edilir (DataFrame'de eksik oranlı sütunlar float olur). Geçersiz veya boş
+    değerler ODDS_MISSING döner.
+    """
+    if value is None or isinstance(value, bool):
+        return ODDS_MISSING
+    if isinstance(value, str):
+        return decimal_odds_to_ticks(value)
+    try:
+        ticks = float(value)
+    except (TypeError, ValueError):
+        return ODDS_MISSING
+    if ticks != ticks or not 0 < round(ticks) <= ODDS_MAX_TICKS:
+        return ODDS_MISSING
+    return int(round(ticks))
+
+def ticks_to_odds(ticks: int) -> float:
+    """Tick değerini ondalık orana çevirir (185 -> 1.85)"""
+    return int(ticks) / ODDS_SCALE
+
+def threshold_to_ticks(threshold: float) -> int:
+    """Ondalık oran eşiğini tick sayısına çevirir (0.05 -> 5)"""
+    return int(round(threshold * ODDS_SCALE))
+
+def format_odds(value: Any) -> str:
+    """Saklanan oranı raporda gösterilecek metne çevirir, eksikse '-'"""
+    ticks = odds_to_ticks(value)
+    return f"{ticks_to_odds(ticks):.2f}" if ticks != ODDS_MISSING else "-"
+
+# Tamsayı kodlu kategorik tutulan metin sütunları ve paylaştıkları sözlük alanı
+CATEGORICAL_COLUMNS = {
+    "Lig": "Lig",
+    "Ev Sahibi": "Takım",
+    "Deplasman": "Takım",
+    "Tarih": "Tarih",
+    "Saat": "Saat",
+    "Skor": "Skor",
+    "İlk Yarı Skoru": "Skor"
+}
+
+class Metrics:
+    """
+    Aşama süreleri (span) ve sayaçlar için hafif ölçüm katmanı.
+    Kapalıyken span() paylaşılan boş bir bağlam döndürür ve incr() hemen çıkar.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.spans = {}
+        self.counters = {}
+        self.gauges = {}
+        self.started_at = None
+        self._lock = threading.Lock()
+        self._null_span = contextlib.nullcontext()
+
+    def enable(self):
+        self.enabled = True
+        self.started_at = time.perf_counter()
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        with self._lock:
+            self.spans.clear()
+            self.counters.clear()
+            self.gauges.clear()
+        self.started_at = time.perf_counter() if self.enabled else None
+
+    def span(self, name: str):
+        if not self.enabled:
+            return self._null_span
+        return _MetricsSpan(self, name)
+
+    def timed(self, name: str):
+        """Fonksiyonun tamamını bir span olarak ölçen dekoratör"""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with _MetricsSpan(self, name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def record_span(self, name: str, seconds: float):
+        with self._lock:
+            stats = self.spans.get(name)
+            if stats is None:
+                stats = self.spans[name] = {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0}
+            stats["count"] += 1
+            stats["total_seconds"] += seconds
+            stats["max_seconds"] = max(stats["max_seconds"], seconds)
+
+    def incr(self, name: str, value: int = 1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def gauge(self, name: str, value: float):
+        """Anlık durum değeri (son yazılan değer saklanır)"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self.gauges[name] = value
+
+    def snapshot(self, run_params: Dict = None) -> Dict:
+        with self._lock:
+            spans = {name: dict(stats, total_seconds=round(stats["total_seconds"], 6), max_seconds=round(stats["max_seconds"], 6))
+                     for name, stats in sorted(self.spans.items())}
+            counters = dict(sorted(self.counters.items()))
+            gauges = dict(sorted(self.gauges.items()))
+        return {
+            "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "wall_seconds": round(time.perf_counter() - self.started_at, 6) if self.started_at else None,
+            "params": run_params or {},
+            "spans": spans,
+            "counters": counters,
+            "gauges": gauges
+        }
 
-    # Temel alanları güncelle
-    for field, new_value in fields_to_update.items():
-        if new_value and new_value != existing_match.get(field):
-            existing_match[field] = new_value
-            updated = True
+    def write(self, directory: str, run_params: Dict = None) -> str:
+        """Ölçümleri çalıştırma başına bir JSON dosyasına yazar"""
+        os.makedirs(directory, exist_ok=True)
+        filepath = os.path.join(directory, f"metrics_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.json")
+        with open(filepath, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(run_params), f, ensure_ascii=False, indent=4, default=str)
+        return filepath
+
+    def summary_table(self) -> str:
+        snapshot = self.snapshot()
+        lines = ["", "⏱️ Aşama Süreleri", "─" * 62, f"{'Aşama':<30} {'Adet':>6} {'Toplam (s)':>12} {'En uzun (s)':>12}", "─" * 62]
+        for name, stats in sorted(snapshot["spans"].items(), key=lambda item: item[1]["total_seconds"], reverse=True):
+            lines.append(f"{name:<30} {stats['count']:>6} {stats['total_seconds']:>12.4f} {stats['max_seconds']:>12.4f}")
+        lines += ["", "🔢 Sayaçlar", "─" * 62]
+        for name, value in snapshot["counters"].items():
+            lines.append(f"{name:<30} {value:>31}")
+        if snapshot["gauges"]:
+            lines += ["", "🎚️ Anlık Durum", "─" * 62]
+            for name, value in snapshot["gauges"].items():
+                lines.append(f"{name:<30} {value:>31}")
+        return "\n".join(lines)
+
+class _MetricsSpan:
+    __slots__ = ("metrics", "name", "started")
+
+    def __init__(self, metrics: Metrics, name: str):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.record_span(self.name, time.perf_counter() - self.started)
+        return False
+
+# Uygulama genelinde kullanılan ölçüm nesnesi (--metrics ile açılır)
+METRICS = Metrics()
+
+# Maç içeriği özetine giren alanlar: güncellemede yazılabilen temel alanlar, skorlar ve oranlar
+MATCH_CONTENT_FIELDS = ["Status", "Period", "Tarih", "Saat", "Skor", "İlk Yarı Skoru"] + ODDS_COLUMNS
+
+def get_update_values(new_match: Dict) -> Dict:
+    """Yeni maç verisinden kayıtlı maça yazılacak alanları çıkarır (boş değerler ve eksik oranlar yazılmaz)"""
+    values = {field: new_match.get(field) for field in ("Status", "Period", "Tarih", "Saat") if new_match.get(field)}
+
+    # Skorlar önce detay API'sinin fts_*/hts_* alanlarından, yoksa normalize edilmiş skor metninden alınır
+    fts_A, fts_B = new_match.get("fts_A"), new_match.get("fts_B")
+    if fts_A is not None and fts_B is not None:
+        values["Skor"] = f"{fts_A} - {fts_B}"
+    elif new_match.get("Skor", "- - -") != "- - -":
+        values["Skor"] = new_match["Skor"]
+    hts_A, hts_B = new_match.get("hts_A"), new_match.get("hts_B")
+    if hts_A is not None and hts_B is not None:
+        values["İlk Yarı Skoru"] = f"{hts_A} - {hts_B}"
+    elif new_match.get("İlk Yarı Skoru", "- - -") != "- - -":
+        values["İlk Yarı Skoru"] = new_match["İlk Yarı Skoru"]
+
+    for field_name in ODDS_COLUMNS:
+        ticks = odds_to_ticks(new_match.get(field_name))
+        if ticks != ODDS_MISSING:
+            values[field_name] = ticks
+    return values
+
+def match_content_hash(values: Dict) -> int:
+    """Güncelleme alanlarının 63 bitlik özeti (DataFrame'de int64 sütun olarak kalır)"""
+    content = "\u001f".join(f"{values[field]}" if field in values else "" for field in MATCH_CONTENT_FIELDS)
+    return int.from_bytes(hashlib.blake2b(content.encode("utf-8"), digest_size=8).digest(), "big") >> 1
+
+def update_match_fields(existing_match: Dict, new_match: Dict) -> Set[str]:
+    """
+    Mevcut maç verisini yeni veriyle günceller. Kayıtlı maç son uygulanan güncellemenin özetini
+    "hash" alanında taşır; özet aynıysa alanlar tek tek karşılaştırılmaz.
+    Returns: değişen alanların kümesi (değişiklik yoksa boş küme)
+    """
+    values = get_update_values(new_match)
+    content_hash = match_content_hash(values)
+    if existing_match.get("hash") == content_hash:
+        return set()
 
-    return updated
+    changed = {field for field, value in values.items() if value != existing_match.get(field)}
+    for field in changed:
+        existing_match[field] = values[field]
+    existing_match["hash"] = content_hash
+    return changed
 
 def auto_update_data(historic_file: str) -> Dict:
+    """
+    Son güncellemeden bugüne kadar bitmiş maçları çekip kaydeder. Çekilemeyen veya işlenemeyen günler ve
+    başarısız kayıt, dönen verinin "_update_errors" alanında sayılır (kaydedilmez); 0 ise güncelleme tamdır.
+    """
+    historic_data = {"matches": {}, "last_update": None}
     try:
         historic_data = load_historic_data(historic_file)
         if not historic_data.get("matches"):
             historic_data = {"matches": {}, "last_update": None}
+        historic_data["_update_errors"] = 0
 
         token = get_token()
         if not token:
             print("❌ Token alınamadı! Güncelleme yapılamıyor.")
+            historic_data["_update_errors"] = 1
             return historic_data
 
         current_time = datetime.now(timezone.utc)
@@ -107,8 +350,8 @@ def auto_update_data(historic_file: str) -> Dict:
                 # Önce geçmiş verilerde bu tarih var mı kontrol et
                 day_has_data = date_str in historic_data["matches"] and len(historic_data["matches"][date_str]) > 0
                 
-                # Günün maçlarını al
-                daily_matches = get_matches_for_date(token, date_str)
+                # Günün maçlarını al; istek hatası gün hatası olarak sayılır
+                daily_matches = get_matches_for_date(token, date_str, raise_errors=True)
                 
                 if not daily_matches:
                     print(f"❌ {date_str} için veri bulunamadı.")
@@ -118,36 +361,16 @@ def auto_update_data(historic_file: str) -> Dict:
                 finished_matches = [match for match in daily_matches if match.get("Status") == 3]
                 
                 if finished_matches:
+                    # Normalizasyon get_matches_for_date'te yapıldı; tekrarlar indeks ile reddedilir
+                    new_matches_count, updated_count = ingest_matches(historic_data, date_str, finished_matches)
+                    update_stats["new_matches"] += new_matches_count
+                    update_stats["updated_matches"] += updated_count
+
                     if not day_has_data:
-                        # Bu gün için hiç veri yoksa, tüm bitmiş maçları ekle
-                        historic_data["matches"][date_str] = finished_matches
-                        update_stats["new_matches"] += len(finished_matches)
-                        print(f"✅ {date_str}: {len(finished_matches)} yeni maç eklendi.")
-                    else:
-                        # Bu gün için veri varsa, eksik maçları ekle ve mevcut maçları güncelle
-                        existing_matches = historic_data["matches"][date_str]
-                        existing_match_ids = {m.get("id"): m for m in existing_matches}
-                        
-                        new_matches_count = 0
-                        updated_count = 0
-                        
-                        for new_match in finished_matches:
-                            match_id = new_match.get("id")
-                            if match_id in existing_match_ids:
-                                # Mevcut maçın bilgilerini güncelle
-                                if update_match_fields(existing_match_ids[match_id], new_match):
-                                    updated_count += 1
-                            else:
-                                # Yeni maçı ekle
-                                existing_matches.append(new_match)
-                                new_matches_count += 1
-                        
-                        update_stats["new_matches"] += new_matches_count
-                        update_stats["updated_matches"] += updated_count
-                        
-                        if new_matches_count > 0 or updated_count > 0:
-                            print(f"✅ {date_str}: {new_matches_count} yeni maç, {updated_count} maç güncellendi.")
-                    
+                        print(f"✅ {date_str}: {new_matches_count} yeni maç eklendi.")
+                    elif new_matches_count > 0 or updated_count > 0:
+                        print(f"✅ {date_str}: {new_matches_count} yeni maç, {updated_count} maç güncellendi.")
+
                     update_stats["processed_days"] += 1
                 else:
                     print(f"ℹ️ {date_str}: Bitmiş maç bulunamadı.")
@@ -156,19 +379,10 @@ def auto_update_data(historic_file: str) -> Dict:
                 update_stats["errors"] += 1
                 print(f"❌ {date_str} verisi işlenirken hata: {str(e)}")
         
-        # Tarih aralığındaki her gün için thread oluştur
-        threads = []
-        check_date = start_date
-        while check_date <= end_date:
-            date_str = check_date.strftime("%Y-%m-%d")
-            thread = threading.Thread(target=process_day, args=(date_str,))
-            threads.append(thread)
-            thread.start()
-            check_date += timedelta(days=1)
-        
-        # Tüm thread'lerin bitmesini bekle
-        for thread in threads:
-            thread.join()
+        # Günler eşzamanlılık üst sınırı kadar thread ile işlenir; istek hızı ve anlık sınır SCHEDULER'dadır
+        day_count = (end_date - start_date).days + 1
+        with ThreadPoolExecutor(max_workers=max(1, min(MAX_CONCURRENCY, day_count))) as executor:
+            list(executor.map(process_day, [(start_date + timedelta(days=i)).strftime("%Y-%m-%d") for i in range(day_count)]))
         
         # Bugünün bitiş saatini kontrol et ve günü güncelle
         # Gün içinde biten maçları da almak için bugünü her zaman kontrol ediyoruz
@@ -176,26 +390,18 @@ def auto_update_data(historic_file: str) -> Dict:
         if today_str not in historic_data["matches"]:
             historic_data["matches"][today_str] = []
         
-        today_matches = get_matches_for_date(token, today_str)
+        try:
+            today_matches = get_matches_for_date(token, today_str, raise_errors=True)
+        except requests.exceptions.RequestException as e:
+            update_stats["errors"] += 1
+            print(f"❌ Bugün ({today_str}) verisi alınamadı: {str(e)}")
+            today_matches = []
         if today_matches:
             today_finished_matches = [match for match in today_matches if match.get("Status") == 3]
             
             if today_finished_matches:
-                existing_matches = historic_data["matches"][today_str]
-                existing_match_ids = {m.get("id"): m for m in existing_matches}
-                
-                new_today_matches = 0
-                updated_today_matches = 0
-                
-                for new_match in today_finished_matches:
-                    match_id = new_match.get("id")
-                    if match_id in existing_match_ids:
-                        if update_match_fields(existing_match_ids[match_id], new_match):
-                            updated_today_matches += 1
-                    else:
-                        existing_matches.append(new_match)
-                        new_today_matches += 1
-                
+                new_today_matches, updated_today_matches = ingest_matches(historic_data, today_str, today_finished_matches)
+
                 if new_today_matches > 0 or updated_today_matches > 0:
                     print(f"✅ Bugün ({today_str}): {new_today_matches} yeni bitmiş maç, {updated_today_matches} maç güncellendi.")
                     update_stats["new_matches"] += new_today_matches
@@ -203,19 +409,22 @@ def auto_update_data(historic_file: str) -> Dict:
         
         # Güncelleme tamamlandıktan sonra kaydet
         historic_data["last_update"] = current_time.strftime("%Y-%m-%d %H:%M:%S")
-        save_historic_data(historic_data, historic_file)
+        if not save_historic_data(historic_data, historic_file):
+            update_stats["errors"] += 1
+        historic_data["_update_errors"] = update_stats["errors"]
         
         print("\n📊 Güncelleme Özeti:")
         print(f"📅 İşlenen gün: {update_stats['processed_days']}")
         print(f"📈 Yeni maç: {update_stats['new_matches']}")
         print(f"🔄 Güncellenen maç: {update_stats['updated_matches']}")
         if update_stats["errors"] > 0:
-            print(f"❌ Hatalı gün: {update_stats['errors']}")
+            print(f"❌ Hata: {update_stats['errors']} (başarısız gün veya kayıt)")
         
         return historic_data
     
     except Exception as e:
         print(f"\n❌ Otomatik güncelleme hatası: {str(e)}")
+        historic_data["_update_errors"] = historic_data.get("_update_errors", 0) + 1
         return historic_data
 
 class MatchData:
@@ -274,17 +483,156 @@ class MatchData:
             if first_odds:
                 for outcome in first_odds[0].get("l", []):
                     outcome_name = outcome.get("n")
-                    outcome_value = outcome.get("v")
-                    if outcome_value:
-                        match_data[f"{market_type}_{outcome_name}"] = outcome_value
+                    outcome_ticks = decimal_odds_to_ticks(outcome.get("v"))
+                    if outcome_ticks != ODDS_MISSING:
+                        match_data[f"{market_type}_{outcome_name}"] = outcome_ticks
 
         return match_data
 
+# İstek zamanlayıcısı ayarları: saniyedeki istek hızı, biriktirilebilecek istek hakkı ve eşzamanlı istek sınırları
+REQUEST_RATE = float(os.environ.get("ORAN_ANALIZ_REQUEST_RATE", 8))
+REQUEST_BURST = 4
+MAX_CONCURRENCY = int(os.environ.get("ORAN_ANALIZ_MAX_CONCURRENCY", 8))
+MIN_CONCURRENCY = 1
+# Bu süreyi aşan yanıt aşırı yük işareti sayılır; iki azaltma arasında en az BACKOFF_COOLDOWN saniye geçer
+LATENCY_TARGET = 3.0
+BACKOFF_COOLDOWN = 1.0
+REQUEST_TIMEOUT = 30
+MAX_RETRIES = 4
+RETRY_BACKOFF = 0.5
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class RequestScheduler:
+    """
+    Tüm API isteklerinin paylaştığı hız ve eşzamanlılık denetleyicisi.
+    Hız bir token kovasıyla sınırlanır (rate istek/sn, en fazla burst hak birikir). Eşzamanlı istek sınırı
+    AIMD ile ayarlanır: gecikmesi hedefin altında kalan her başarılı yanıt sınırı 1/limit kadar artırır
+    (her tam turda +1), 429/5xx, bağlantı hatası veya hedefi aşan gecikme sınırı yarıya indirir.
+    429/5xx ayrıca hızı yarıya indirir ve Retry-After süresince yeni istek başlatılmaz.
+    """
+
+    def __init__(self, rate: float = REQUEST_RATE, burst: int = REQUEST_BURST, max_concurrency: int = MAX_CONCURRENCY,
+                 min_concurrency: int = MIN_CONCURRENCY, latency_target: float = LATENCY_TARGET):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.latency_target = latency_target
+        self.limit = float(max(min_concurrency, max_concurrency // 2))
+        self.in_flight = 0
+        self._tokens = float(burst)
+        self._refilled_at = time.monotonic()
+        self._paused_until = 0.0
+        self._decreased_at = 0.0
+        self._condition = threading.Condition()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    @contextlib.contextmanager
+    def slot(self):
+        """İstek hakkı ve eşzamanlılık yeri açılana kadar bekler; blok süresince istek sürüyor sayılır"""
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self._paused_until:
+                    self._condition.wait(self._paused_until - now)
+                elif self.in_flight >= int(self.limit):
+                    self._condition.wait()
+                elif self._tokens < 1:
+                    self._condition.wait((1 - self._tokens) / self.rate)
+                else:
+                    self._tokens -= 1
+                    self.in_flight += 1
+                    break
+        try:
+            yield
+        finally:
+            with self._condition:
+                self.in_flight -= 1
+                self._condition.notify_all()
+
+    def record(self, latency: float, overloaded: bool, retry_after: float = None):
+        """Yanıtı denetleyiciye bildirir. overloaded: 429/5xx veya bağlantı hatası"""
+        with self._condition:
+            now = time.monotonic()
+            if overloaded or latency > self.latency_target:
+                if now - self._decreased_at >= BACKOFF_COOLDOWN:
+                    self.limit = max(self.min_concurrency, self.limit / 2)
+                    if overloaded:
+                        self.rate = max(self.max_rate / 16, self.rate / 2)
+                    self._decreased_at = now
+                    METRICS.incr("http_backoffs")
+                if retry_after:
+                    self._paused_until = max(self._paused_until, now + retry_after)
+            else:
+                self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+                self.rate = min(self.max_rate, self.rate + self.max_rate / 16)
+            self._condition.notify_all()
+            limit, rate = self.limit, self.rate
+        METRICS.gauge("http.concurrency_limit", round(limit, 2))
+        METRICS.gauge("http.rate_per_second", round(rate, 2))
+
+    def state(self) -> Dict:
+        with self._condition:
+            return {"rate": round(self.rate, 2), "concurrency_limit": round(self.limit, 2), "in_flight": self.in_flight}
+
+# Uygulama genelinde kullanılan istek zamanlayıcısı
+SCHEDULER = RequestScheduler()
+
+def get_retry_after(response: requests.Response) -> float:
+    """Retry-After başlığını saniye olarak okur (tarih biçimi ve geçersiz değerler yok sayılır)"""
+    try:
+        return min(max(float(response.headers.get("Retry-After")), 0.0), 60.0)
+    except (TypeError, ValueError):
+        return None
+
+def http_get(url: str, stage: str, headers: Dict = None) -> requests.Response:
+    """
+    HTTP GET isteğini SCHEDULER üzerinden yapar; süre, istek, indirilen bayt ve hata sayaçlarını ölçer.
+    429/5xx yanıtlarında ve bağlantı/zaman aşımı hatalarında artan beklemeyle MAX_RETRIES kez yeniden dener;
+    son denemenin yanıtı döndürülür (veya hatası fırlatılır).
+    """
+    for attempt in range(MAX_RETRIES + 1):
+        response = None
+        with SCHEDULER.slot(), METRICS.span(stage):
+            started = time.perf_counter()
+            try:
+                response = requests.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                METRICS.incr("http_errors")
+                if attempt == MAX_RETRIES:
+                    SCHEDULER.record(time.perf_counter() - started, True)
+                    raise
+            except requests.exceptions.RequestException:
+                METRICS.incr("http_errors")
+                raise
+            latency = time.perf_counter() - started
+
+        if response is None:
+            SCHEDULER.record(latency, True)
+        else:
+            METRICS.incr("http_requests")
+            METRICS.incr("bytes_downloaded", len(response.content))
+            if response.status_code >= 400:
+                METRICS.incr("http_errors")
+            overloaded = response.status_code in RETRY_STATUSES
+            SCHEDULER.record(latency, overloaded, get_retry_after(response) if overloaded else None)
+            if not overloaded or attempt == MAX_RETRIES:
+                return response
+
+        METRICS.incr("http_retries")
+        time.sleep(RETRY_BACKOFF * 2 ** attempt * random.uniform(0.5, 1.0))
+
+@METRICS.timed("http.get_token")
 def get_token() -> str:
     """Mackolik API için token alır"""
-    token_url = "https://www.mackolik.com/ajax/middleware/token"
+    token_url = TOKEN_URL
     try:
-        token_response = requests.get(token_url)
+        token_response = http_get(token_url, "http.token")
         token_response.raise_for_status()
         return token_response.json().get("data", {}).get("token")
     except requests.exceptions.RequestException as e:
@@ -293,9 +641,9 @@ def get_token() -> str:
 
 def get_match_details(token: str, date: str) -> Dict:
     """Belirli bir tarihteki maçların ilk yarı skorlarını alır"""
-    api_url = f"https://api.mackolikfeeds.com/api/matches/?language=tr&country=tr&add_playing=1&extended_period=1&date={date}&tz=3.0&application=com.kokteyl.mackolik&migration_status=perform"
+    api_url = f"{FEED_BASE_URL}/api/matches/?language=tr&country=tr&add_playing=1&extended_period=1&date={date}&tz=3.0&application=com.kokteyl.mackolik&migration_status=perform"
     api_headers = {
-        "Host": "api.mackolikfeeds.com",
+        "Host": FEED_HOST,
         "User-Agent": "Dalvik/2.1.0 (Linux; U; Android 12; SM-G991B Build/SP1A.210812.016)",
         "Connection": "Keep-Alive",
         "Accept": "*/*",
@@ -304,7 +652,7 @@ def get_match_details(token: str, date: str) -> Dict:
         "X-RequestToken": token,
     }
     try:
-        api_response = requests.get(api_url, headers=api_headers)
+        api_response = http_get(api_url, "http.match_details", api_headers)
         api_response.raise_for_status()
         match_details = {}
         response_data = api_response.json()
@@ -322,10 +670,12 @@ def get_match_details(token: str, date: str) -> Dict:
         print(f"❌ Maç detayları alınırken hata oluştu: {str(e)}")
         return {}
 
-def get_matches_for_date(token: str, date: str) -> List[Dict]:
-    api_url = f"https://api.mackolikfeeds.com/betting-service/bulletin/sport/1?date={date}&tz=3&language=tr&real_country=tr&application=com.kokteyl.mackolik&migration_status=perform"
+@METRICS.timed("fetch.matches_for_date")
+def get_matches_for_date(token: str, date: str, raise_errors: bool = False) -> List[Dict]:
+    """Günün bülten maçları; istek hatasında boş liste döner (raise_errors ile hata fırlatılır)"""
+    api_url = f"{FEED_BASE_URL}/betting-service/bulletin/sport/1?date={date}&tz=3&language=tr&real_country=tr&application=com.kokteyl.mackolik&migration_status=perform"
     api_headers = {
-        "Host": "api.mackolikfeeds.com",
+        "Host": FEED_HOST,
         "User-Agent": "Dalvik/2.1.0 (Linux; U; Android 12; SM-G991B Build/SP1A.210812.016)",
         "Connection": "Keep-Alive",
         "Accept": "*/*",
@@ -338,17 +688,20 @@ def get_matches_for_date(token: str, date: str) -> List[Dict]:
 
     try:
         # İlk API çağrısı - Bahis oranları için
-        api_response = requests.get(api_url, headers=api_headers)
+        api_response = http_get(api_url, "http.bulletin", api_headers)
         api_response.raise_for_status()
-        response_data = api_response.json()
+        with METRICS.span("parse.json"):
+            response_data = api_response.json()
 
         # İkinci API çağrısı - Maç detayları ve skorlar için
-        details_url = f"https://api.mackolikfeeds.com/api/matches/?language=tr&country=tr&add_playing=1&extended_period=1&date={date}&tz=3.0&application=com.kokteyl.mackolik&migration_status=perform"
-        details_response = requests.get(details_url, headers=api_headers)
+        details_url = f"{FEED_BASE_URL}/api/matches/?language=tr&country=tr&add_playing=1&extended_period=1&date={date}&tz=3.0&application=com.kokteyl.mackolik&migration_status=perform"
+        details_response = http_get(details_url, "http.match_details", api_headers)
+        METRICS.incr("days_fetched")
         match_details = {}
 
         if details_response.status_code == 200:
-            details_data = details_response.json()
+            with METRICS.span("parse.json"):
+                details_data = details_response.json()
             
             # Tüm maç detaylarını topla
             for area in details_data.get("data", {}).get("areas", []):
@@ -422,15 +775,126 @@ def get_matches_for_date(token: str, date: str) -> List[Dict]:
                 else:
                     match_data["Saat"] = get_match_time({"time": match.get("time")})
                 
-                matches.append(match_data)
+                matches.append(normalize_match(match_data))
 
         # Maçları lig ve saate göre sırala
         return sorted(matches, key=lambda x: (x.get("Lig", ""), x.get("Saat", "00:00")))
 
     except requests.exceptions.RequestException as e:
+        if raise_errors:
+            raise
         print(f"❌ {date} tarihi için hata: {str(e)}")
         return []
 
+# Bülten önbelleğinin tazelik süresi ve arka planda yenileme aralığı (saniye)
+BULLETIN_TTL = 300
+
+def get_upcoming_dates(days: int = 5) -> List[datetime]:
+    """Bugünden başlayarak analiz menüsünde sunulan günler"""
+    today = datetime.now(timezone.utc)
+    return [today + timedelta(days=i) for i in range(days)]
+
+class BulletinCache:
+    """
+    Analiz günlerinin ayrıştırılmış bültenleri için bellek içi önbellek. Her kayıt çekildiği zamanı taşır;
+    get() kayıt ttl'den tazeyse hemen döner, değilse API'den çeker. prefetch() günleri arka planda çeker,
+    start() bunu belirli aralıklarla tekrarlar. Aynı gün için süren bir çekim varsa ikinci istek onu bekler.
+    """
+
+    def __init__(self, ttl: int = BULLETIN_TTL, on_fetch: Callable[[str, List[Dict]], Any] = None):
+        self.ttl = ttl
+        self.on_fetch = on_fetch
+        self._entries = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._timer = None
+
+    def fetched_at(self, date_str: str) -> float:
+        with self._lock:
+            entry = self._entries.get(date_str)
+        return entry[0] if entry else None
+
+    def is_fresh(self, date_str: str) -> bool:
+        fetched_at = self.fetched_at(date_str)
+        return fetched_at is not None and time.time() - fetched_at < self.ttl
+
+    def fetch(self, date_str: str, token: str = None) -> List[Dict]:
+        """Günün bültenini API'den çeker ve önbelleğe yazar (aynı gün için süren çekim varsa onu bekler)"""
+        with self._lock:
+            done = self._inflight.get(date_str)
+            owner = done is None
+            if owner:
+                done = self._inflight[date_str] = threading.Event()
+        if not owner:
+            done.wait()
+            with self._lock:
+                entry = self._entries.get(date_str)
+            return entry[1] if entry else []
+
+        try:
+            token = token or get_token()
+            if not token:
+                return []
+            matches = get_matches_for_date(token, date_str)
+            # Boş yanıt (API hatası olabilir) önbelleğe yazılmaz, sonraki istek yeniden dener
+            if matches:
+                with self._lock:
+                    self._entries[date_str] = (time.time(), matches)
+            if self.on_fetch is not None:
+                self.on_fetch(date_str, matches)
+            return matches
+        finally:
+            with self._lock:
+                del self._inflight[date_str]
+            done.set()
+
+    def get(self, date_str: str) -> List[Dict]:
+        """Taze önbellek kaydını döndürür; kayıt yoksa veya bayatsa çeker"""
+        with self._lock:
+            entry = self._entries.get(date_str)
+            inflight = date_str in self._inflight
+        if entry and not inflight and time.time() - entry[0] < self.ttl:
+            return entry[1]
+        return self.fetch(date_str)
+
+    def prefetch(self, dates: List[str]) -> threading.Thread:
+        """Günleri tek token ile arka planda sırayla çeker; önbellekte olmayan eski günler atılır"""
+        def run():
+            with self._lock:
+                for date_str in list(self._entries):
+                    if date_str not in dates:
+                        del self._entries[date_str]
+            try:
+                token = get_token()
+                for date_str in dates:
+                    if self._stop.is_set():
+                        break
+                    self.fetch(date_str, token)
+            except Exception as e:
+                print(f"\n⚠️ Bülten ön yükleme hatası: {str(e)}")
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        return thread
+
+    def start(self, get_dates: Callable[[], List[str]], interval: int = None) -> "BulletinCache":
+        """Günleri hemen ve ardından her interval (varsayılan ttl) saniyede bir arka planda yeniler"""
+        interval = interval or self.ttl
+
+        def loop():
+            while not self._stop.is_set():
+                self.prefetch(get_dates()).join()
+                self._stop.wait(interval)
+
+        self._stop.clear()
+        self._timer = threading.Thread(target=loop, daemon=True)
+        self._timer.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
 def get_match_time(match_data: Dict) -> str:
     """Farklı API yanıtlarından saat bilgisini alır ve Türkiye saatine çevirir"""
     match_time = match_data.get("match_time") or match_data.get("time")
@@ -444,43 +908,1052 @@ def get_match_time(match_data: Dict) -> str:
             return "00:00"
     return "00:00"
 
+def normalize_match(match: Dict) -> Dict:
+    """Maç kaydını saklanacak biçime getirir (saat HH:MM, skorlar fts_*/hts_* alanlarından)"""
+    if "Saat" in match:
+        match["Saat"] = match["Saat"][:5] if match["Saat"] else "00:00"
+
+    if match.get("Skor", "- - -") == "- - -":
+        fts_A = match.get("fts_A")
+        fts_B = match.get("fts_B")
+        if fts_A is not None and fts_B is not None:
+            match["Skor"] = f"{fts_A} - {fts_B}"
+
+    if match.get("İlk Yarı Skoru", "- - -") == "- - -":
+        hts_A = match.get("hts_A")
+        hts_B = match.get("hts_B")
+        if hts_A is not None and hts_B is not None:
+            match["İlk Yarı Skoru"] = f"{hts_A} - {hts_B}"
+
+    return match
+
+# Veri klasörüne yazan süreçlerin kilidi en fazla bu kadar beklenir (saniye)
+HISTORY_LOCK_TIMEOUT = float(os.environ.get("ORAN_ANALIZ_LOCK_TIMEOUT", 600))
+
+class HistoryLock:
+    """
+    Geçmiş veri dosyalarına yazan süreçler arası özel kilit (historic_matches.lock).
+    Aynı veri klasörünü kullanan güncelleme, menü ve analiz süreçleri kayıtlarını sırayla yapar.
+    Okuyucular kilit almaz; her dosya atomik olarak yayınlandığı için son yayınlanan sürümü okurlar.
+    """
+
+    def __init__(self, historic_file: str, timeout: float = None):
+        self.path = f"{os.path.splitext(historic_file)[0]}.lock"
+        self.timeout = HISTORY_LOCK_TIMEOUT if timeout is None else timeout
+        self._file = None
+
+    def _try_lock(self) -> bool:
+        try:
+            if platform.system().lower() == "windows":
+                import msvcrt
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            return False
+
+    def _unlock(self):
+        if platform.system().lower() == "windows":
+            import msvcrt
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+
+    def __enter__(self) -> "HistoryLock":
+        self._file = open(self.path, 'a+b')
+        deadline = time.monotonic() + self.timeout
+        waiting = False
+        while not self._try_lock():
+            if time.monotonic() >= deadline:
+                self._file.close()
+                self._file = None
+                raise TimeoutError(f"Veri kilidi {self.timeout:.0f} saniyede alınamadı: {self.path}")
+            if not waiting:
+                waiting = True
+                METRICS.incr("history_lock_waits")
+                print("⏳ Veri dosyaları başka bir işlem tarafından yazılıyor, bekleniyor...")
+            time.sleep(0.05)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self._unlock()
+        finally:
+            self._file.close()
+            self._file = None
+        return False
+
+def replace_file(source: str, target: str, attempts: int = 20):
+    """os.replace; Windows'ta hedef o an başka bir süreçte açıksa kısa aralıklarla yeniden dener"""
+    for attempt in range(attempts):
+        try:
+            os.replace(source, target)
+            return
+        except PermissionError:
+            if attempt == attempts - 1:
+                raise
+            time.sleep(0.05)
+
+def write_json_atomic(path: str, payload: Any, indent: int = None):
+    """
+    JSON dosyasını aynı klasördeki geçici dosyaya yazıp yerine taşır. Okuyan süreç yarım dosya görmez:
+    taşımadan önce açtığı dosyada eski sürümü, sonra açtığında yeni sürümü okur.
+    """
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, ensure_ascii=False, indent=indent, default=str)
+            f.flush()
+            os.fsync(f.fileno())
+        replace_file(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+def get_file_stamp(path: str) -> Tuple[int, int, int]:
+    """Dosyanın yayınlanmış sürümünü tanımlayan (inode, boyut, değişme zamanı); dosya yoksa None"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+class MatchIndex:
+    """
+    Geçmiş maçlar için kalıcı hash indeksi: maç id -> tarih ve (ev, deplasman, tarih) -> maç id.
+    Tekrar kontrolü O(1) yapılır; indeks veri dosyasının yanında ayrı bir dosyada saklanır.
+    """
+
+    KEY_SEPARATOR = "\u001f"
+
+    def __init__(self):
+        self.ids = {}
+        self.keys = {}
+        self.revision = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def match_key(match: Dict) -> Tuple:
+        return tuple(str(match.get(field) or "") for field in ("Ev Sahibi", "Deplasman", "Tarih"))
+
+    def add(self, match: Dict, date_str: str) -> str:
+        """
+        Maçı indekse ekler. Dönüş: "new", "existing" (aynı id), "duplicate" (aynı takımlar ve tarih) veya
+        "invalid" (id'siz maç indekse girmez; id'siz kayıtlar birbirinden ayırt edilemez)
+        """
+        match_id = match.get("id")
+        if match_id is None:
+            return "invalid"
+        key = self.match_key(match)
+        with self._lock:
+            if match_id in self.ids:
+                return "existing"
+            if key in self.keys:
+                return "duplicate"
+            self.ids[match_id] = date_str
+            self.keys[key] = match_id
+            return "new"
+
+    def move(self, match_id: Any, old_key: Tuple, match: Dict, date_str: str):
+        """Başka bir güne alınmış maçın tarihini ve (ev, deplasman, tarih) anahtarını günceller"""
+        with self._lock:
+            self.ids[match_id] = date_str
+            if self.keys.get(old_key) == match_id:
+                del self.keys[old_key]
+            self.keys.setdefault(self.match_key(match), match_id)
+
+    @classmethod
+    def build(cls, historic_data: Dict) -> Tuple["MatchIndex", int]:
+        """
+        Tüm veriden indeksi oluşturur; bu sırada eski kayıtları normalize eder ve aynı gündeki tekrarları
+        çıkarır. id'siz eski kayıtlar ve başka bir günde de bulunan id'ler silinmez, sayıları bildirilir;
+        böyle bir id indekste ilk göründüğü güne bağlı kalır.
+        Dönüş: (indeks, çıkarılan tekrar sayısı)
+        """
+        index = cls()
+        removed = 0
+        without_id = 0
+        collisions = []
+        for date_str in sorted(historic_data.get("matches", {})):
+            unique_matches = []
+            for match in historic_data["matches"][date_str]:
+                normalize_match(match)
+                result = index.add(match, date_str)
+                if result == "invalid":
+                    without_id += 1
+                elif result == "existing" and index.ids[match["id"]] != date_str:
+                    collisions.append(f"{match['id']} ({index.ids[match['id']]}, {date_str})")
+                    index.keys.setdefault(index.match_key(match), match["id"])
+                elif result != "new":
+                    removed += 1
+                    continue
+                unique_matches.append(match)
+            historic_data["matches"][date_str] = unique_matches
+        if without_id:
+            print(f"⚠️ {without_id} id'siz maç kaydı indekslenmedi; güncellemeler bu kayıtlara uygulanmaz.")
+        if collisions:
+            print(f"⚠️ {len(collisions)} maç id'si birden fazla günde bulundu: {', '.join(collisions[:10])}"
+                  + (" ..." if len(collisions) > 10 else ""))
+        return index, removed
+
+    @staticmethod
+    def file_path(historic_file: str) -> str:
+        return f"{os.path.splitext(historic_file)[0]}.index.json"
+
+    def save(self, historic_file: str):
+        payload = {
+            "revision": self.revision,
+            "ids": [[match_id, date_str] for match_id, date_str in self.ids.items()],
+            "keys": {self.KEY_SEPARATOR.join(str(part) for part in key): match_id for key, match_id in self.keys.items()}
+        }
+        write_json_atomic(self.file_path(historic_file), payload)
+
+    @classmethod
+    def load(cls, historic_file: str) -> "MatchIndex":
+        path = cls.file_path(historic_file)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            payload = json.load(f)
+        index = cls()
+        index.revision = payload.get("revision")
+        index.ids = {match_id: date_str for match_id, date_str in payload.get("ids", [])}
+        index.keys = {tuple(key.split(cls.KEY_SEPARATOR)): match_id for key, match_id in payload.get("keys", {}).items()}
+        return index
+
+def get_match_index(historic_data: Dict) -> MatchIndex:
+    """Veriye bağlı indeksi döndürür, yoksa mevcut veriden oluşturur"""
+    index = historic_data.get("_index")
+    if index is None:
+        index, removed = MatchIndex.build(historic_data)
+        if removed:
+            print(f"🧹 {removed} tekrar eden maç kaydı çıkarıldı.")
+        historic_data["_index"] = index
+    return index
+
+class StringDictionary:
+    """
+    Lig, takım, tarih, saat ve skor metinlerini tamsayı kodlara eşleyen paylaşılan sözlük.
+    Sadece ekleme yapılır; bir değerin kodu hiç değişmez. Veri dosyasının yanında saklanır.
+    """
+
+    def __init__(self):
+        self.values = {field: [] for field in sorted(set(CATEGORICAL_COLUMNS.values()))}
+        self.codes = {field: {} for field in self.values}
+        self.revision = None
+        self._categories = {}
+        self._lock = threading.Lock()
+
+    def add(self, field: str, value: Any) -> int:
+        """Değerin kodunu döndürür, yoksa sözlüğe ekler"""
+        code = self.codes[field].get(value)
+        if code is not None:
+            return code
+        with self._lock:
+            code = self.codes[field].get(value)
+            if code is None:
+                code = len(self.values[field])
+                self.values[field].append(value)
+                self.codes[field][value] = code
+                self._categories.pop(field, None)
+            return code
+
+    def add_match(self, match: Dict):
+        for column, field in CATEGORICAL_COLUMNS.items():
+            value = match.get(column)
+            if value is not None:
+                self.add(field, value)
+
+    def categories(self, field: str) -> pd.Index:
+        """Alanın kategorileri (kod sırasıyla); sözlük değişmedikçe aynı Index nesnesi paylaşılır"""
+        categories = self._categories.get(field)
+        if categories is None:
+            with self._lock:
+                categories = self._categories[field] = pd.Index(list(self.values[field]), dtype=object)
+        return categories
+
+    @classmethod
+    def build(cls, historic_data: Dict) -> "StringDictionary":
+        dictionary = cls()
+        for date_str in sorted(historic_data.get("matches", {})):
+            for match in historic_data["matches"][date_str]:
+                dictionary.add_match(match)
+        return dictionary
+
+    @staticmethod
+    def file_path(historic_file: str) -> str:
+        return f"{os.path.splitext(historic_file)[0]}.dict.json"
+
+    def save(self, historic_file: str):
+        write_json_atomic(self.file_path(historic_file), {"revision": self.revision, "values": self.values})
+
+    @classmethod
+    def load(cls, historic_file: str) -> "StringDictionary":
+        path = cls.file_path(historic_file)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            payload = json.load(f)
+        dictionary = cls()
+        dictionary.revision = payload.get("revision")
+        for field, values in payload.get("values", {}).items():
+            dictionary.values[field] = list(values)
+            dictionary.codes[field] = {value: code for code, value in enumerate(values)}
+        return dictionary
+
+def get_string_dictionary(historic_data: Dict) -> StringDictionary:
+    """Veriye bağlı paylaşılan sözlüğü döndürür, yoksa mevcut veriden oluşturur"""
+    dictionary = historic_data.get("_dictionary")
+    if dictionary is None:
+        dictionary = historic_data["_dictionary"] = StringDictionary.build(historic_data)
+    return dictionary
+
+# Oran indeksi dosyaları belleğe eşlenerek açılır. Windows'ta eşlenmiş dosya kaydederken değiştirilemediği
+# için orada dosyalar okunarak yüklenir.
+MAP_ODDS_INDEX = platform.system().lower() != "windows"
+
+class OddsIndex:
+    """
+    Geçmiş maçların oran (tick) satırları ve gerçekleşme bit maskeleri, maç id'sine göre anahtarlı.
+    Satırlar eklenme sırasıyla tutulur; ekleme ve güncelleme maç başına O(1)'dir.
+    Veri dosyasının yanında ikili dosyalar olarak saklanır; kaydetme yeni satırları sona ekler, mevcut satırlar
+    değiştiyse dizileri yeni sürüm dosyalarına yazar.
+    """
+
+    # Dizi adı -> (dtype, satır şekli)
+    ARRAYS = {
+        "ids": (np.int64, ()),
+        "days": (np.int32, ()),
+        "leagues": (np.int32, ()),
+        "odds": (ODDS_DTYPE, (len(ODDS_COLUMNS),)),
+        "settlement": (np.uint32, ())
+    }
+
+    def __init__(self, capacity: int = 1024):
+        self.size = 0
+        self.positions = {}
+        self.revision = None
+        self._arrays = {name: np.zeros((capacity,) + shape, dtype=dtype) for name, (dtype, shape) in self.ARRAYS.items()}
+        self._saved_size = 0
+        self._saved_revision = None
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self.cube = None
+
+    @property
+    def ids(self) -> np.ndarray:
+        return self._arrays["ids"][:self.size]
+
+    @property
+    def days(self) -> np.ndarray:
+        return self._arrays["days"][:self.size]
+
+    @property
+    def leagues(self) -> np.ndarray:
+        return self._arrays["leagues"][:self.size]
+
+    @property
+    def odds(self) -> np.ndarray:
+        return self._arrays["odds"][:self.size]
+
+    @property
+    def settlement(self) -> np.ndarray:
+        return self._arrays["settlement"][:self.size]
+
+    @property
+    def mapped(self) -> bool:
+        """Diziler diskteki dosyalara salt okunur eşlenmiş mi (ilk yazmada belleğe kopyalanır)"""
+        return isinstance(self._arrays["ids"], np.memmap)
+
+    def _reserve(self, size: int):
+        capacity = len(self._arrays["ids"])
+        if size <= capacity and not self.mapped:
+            return
+        capacity = max(size, capacity * 2, 1024) if size > capacity else max(capacity, 1024)
+        for name, array in self._arrays.items():
+            grown = np.zeros((capacity,) + array.shape[1:], dtype=array.dtype)
+            grown[:self.size] = array[:self.size]
+            self._arrays[name] = grown
+
+    def upsert(self, match: Dict, date_str: str, dictionary: StringDictionary = None) -> bool:
+        """
+        Maçın satırını ekler veya id'si varsa yerinde günceller. Lig kodu verilen sözlükten alınır.
+        Bağlı bir OutcomeCube varsa eski satırın katkısı çıkarılıp yenisi eklenir.
+        Dönüş: yeni satır eklendiyse True
+        """
+        match_id = match.get("id")
+        if match_id is None:
+            return False
+        league = match.get("Lig")
+        league_code = dictionary.add("Lig", league) if dictionary is not None and league is not None else -1
+        odds_row = [odds_to_ticks(match.get(column)) for column in ODDS_COLUMNS]
+        settlement = get_realized_outcomes(match.get("Skor", "- - -"), match.get("İlk Yarı Skoru", "- - -"))
+        with self._lock:
+            pos = self.positions.get(match_id)
+            is_new = pos is None
+            self._reserve(self.size + 1 if is_new else self.size)
+            if is_new:
+                pos = self.size
+                self.size += 1
+                self.positions[match_id] = pos
+            else:
+                self._dirty.add(pos)
+                if self.cube is not None:
+                    self.cube.apply(self.days[pos:pos + 1], self.leagues[pos:pos + 1],
+                                    self.odds[pos:pos + 1], self.settlement[pos:pos + 1], sign=-1)
+            self._arrays["ids"][pos] = match_id
+            self._arrays["days"][pos] = np.datetime64(date_str, "D").astype(np.int64)
+            self._arrays["leagues"][pos] = league_code
+            self._arrays["odds"][pos] = odds_row
+            self._arrays["settlement"][pos] = settlement
+            if self.cube is not None:
+                self.cube.apply(self.days[pos:pos + 1], self.leagues[pos:pos + 1],
+                                self.odds[pos:pos + 1], self.settlement[pos:pos + 1])
+        return is_new
+
+    @classmethod
+    def build(cls, historic_data: Dict) -> "OddsIndex":
+        """Tüm veriden indeksi oluşturur (eski dosyalar ve sürümü uyuşmayan indeksler için)"""
+        matches = historic_data.get("matches", {})
+        dictionary = get_string_dictionary(historic_data)
+        index = cls(capacity=max(1024, sum(len(day_matches) for day_matches in matches.values())))
+        for date_str in sorted(matches):
+            for match in matches[date_str]:
+                index.upsert(match, date_str, dictionary)
+        index._dirty.clear()
+        return index
+
+    def attach_cube(self, cube: "OutcomeCube") -> "OutcomeCube":
+        """Küpü mevcut satırlarla doldurur; sonraki upsert'ler küpü artımlı günceller"""
+        with self._lock:
+            cube.apply(self.days, self.leagues, self.odds, self.settlement)
+            self.cube = cube
+        return cube
+
+    def add_league_breakdown(self) -> "OutcomeCube":
+        """Bağlı küpe lig kırılımını mevcut satırlarla ekler (ilk lig bazlı sorguda)"""
+        with self._lock:
+            self.cube.add_leagues(self.days, self.leagues, self.odds, self.settlement)
+        return self.cube
+
+    def lookup(self, ids: Any) -> np.ndarray:
+        """Maç id'lerinin satır konumları (indekste olmayanlar -1)"""
+        return np.fromiter((self.positions.get(match_id, -1) for match_id in ids), dtype=np.int64, count=len(ids))
+
+    def rows_for(self, df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        DataFrame satırlarının oran matrisi ve bit maskeleri; indekste olmayan satırlar yerinde hesaplanır.
+        Dönen diziler indeksin sonraki upsert'lerinden etkilenmez. Satırlar diskten eşlenmiş indekste ardışıksa
+        (gün sırasıyla eklenmiş veri) kopyasız dilim döner: eşlenmiş diziler salt okunurdur ve ilk yazmada
+        belleğe kopyalanır, oranlar taranana kadar diskte kalır. Bellekteki diziler yerinde güncellendiği için
+        dilimleri kopyalanır.
+        """
+        ids = df["id"].tolist() if "id" in df.columns else [None] * len(df)
+        positions = self.lookup(ids)
+        if len(positions) and positions[0] >= 0 and (np.diff(positions) == 1).all():
+            odds = self.odds[positions[0]:positions[-1] + 1]
+            settlement = self.settlement[positions[0]:positions[-1] + 1]
+            return (odds, settlement) if self.mapped else (odds.copy(), settlement.copy())
+        odds = self.odds[positions]
+        settlement = self.settlement[positions]
+        missing = positions < 0
+        if missing.any():
+            missing_df = df[missing]
+            odds[missing] = build_odds_matrix(missing_df)
+            settlement[missing] = build_settlement_masks(missing_df)
+        return odds, settlement
+
+    @staticmethod
+    def file_path(historic_file: str) -> str:
+        return f"{os.path.splitext(historic_file)[0]}.odds"
+
+    @staticmethod
+    def array_file(name: str, version: int = None) -> str:
+        """Dizinin dosya adı; sürümsüz eski indekslerde <ad>.bin"""
+        return f"{name}.bin" if version is None else f"{name}.{version}.bin"
+
+    def save(self, historic_file: str):
+        """
+        Dizileri ikili dosyalara yazar; meta dosyası en son ve atomik olarak değiştirilir.
+        Diskteki sürüm son kaydedilenle aynıysa ve mevcut satırlardan değişen yoksa yeni satırlar dosyaların
+        sonuna eklenir: okuyucular meta dosyasındaki boy kadarını eşlediği için eklemeyi görmez.
+        Aksi halde diziler yeni sürüm numaralı dosyalara yazılır; eski dosyaları eşlemiş okuyucular kendi
+        sürümlerini okumaya devam eder, eski dosyalar meta değiştirildikten sonra silinir.
+        """
+        directory = self.file_path(historic_file)
+        os.makedirs(directory, exist_ok=True)
+        meta_path = os.path.join(directory, "meta.json")
+        with self._lock:
+            disk_meta = None
+            if os.path.exists(meta_path):
+                with open(meta_path, 'r', encoding='utf-8') as f:
+                    disk_meta = json.load(f)
+            version = disk_meta.get("version") if disk_meta is not None else None
+            incremental = (
+                disk_meta is not None and self._saved_revision is not None
+                and disk_meta.get("revision") == self._saved_revision and disk_meta.get("size") == self._saved_size
+                and not any(pos < self._saved_size for pos in self._dirty)
+                and all(os.path.exists(os.path.join(directory, self.array_file(name, version))) for name in self.ARRAYS)
+            )
+            if not incremental:
+                version = (version or 0) + 1
+
+            written = 0
+            for name, array in self._arrays.items():
+                path = os.path.join(directory, self.array_file(name, version))
+                if not incremental:
+                    data = array[:self.size].tobytes()
+                    with open(f"{path}.tmp", 'wb') as f:
+                        f.write(data)
+                    replace_file(f"{path}.tmp", path)
+                    written += len(data)
+                    continue
+                with open(path, 'r+b') as f:
+                    f.seek(self._saved_size * array[0].nbytes)
+                    data = array[self._saved_size:self.size].tobytes()
+                    f.write(data)
+                    f.truncate()
+                    written += len(data)
+
+            meta = {"revision": self.revision, "size": self.size, "version": version, "odds_scale": ODDS_SCALE,
+                    "columns": ODDS_COLUMNS}
+            write_json_atomic(meta_path, meta)
+
+            if not incremental:
+                current = {self.array_file(name, version) for name in self.ARRAYS}
+                for file_name in os.listdir(directory):
+                    if file_name.endswith(".bin") and file_name not in current:
+                        try:
+                            os.remove(os.path.join(directory, file_name))
+                        except OSError:
+                            # Windows'ta o an okunan dosya silinemez; bir sonraki yeni sürümde silinir
+                            pass
+
+            self._saved_size = self.size
+            self._saved_revision = self.revision
+            self._dirty.clear()
+        METRICS.incr("bytes_written", written)
+
+    @classmethod
+    def load(cls, historic_file: str) -> "OddsIndex":
+        directory = cls.file_path(historic_file)
+        meta_path = os.path.join(directory, "meta.json")
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get("odds_scale") != ODDS_SCALE or meta.get("columns") != ODDS_COLUMNS:
+            return None
+
+        size = meta.get("size", 0)
+        index = cls(capacity=0)
+        for name, (dtype, shape) in cls.ARRAYS.items():
+            path = os.path.join(directory, cls.array_file(name, meta.get("version")))
+            row_items = int(np.prod(shape)) if shape else 1
+            # Dosya, yazan bir sürecin sona eklediği satırlar kadar uzun olabilir; meta'daki boy kadarı okunur
+            try:
+                if os.path.getsize(path) < size * row_items * np.dtype(dtype).itemsize:
+                    return None
+                if MAP_ODDS_INDEX and size:
+                    # Sayfalar erişildikçe okunur; pencere taraması sadece kendi bloklarını belleğe alır
+                    index._arrays[name] = np.memmap(path, dtype=dtype, mode='r', shape=(size,) + shape)
+                    METRICS.incr("bytes_mapped", index._arrays[name].nbytes)
+                else:
+                    array = np.fromfile(path, dtype=dtype, count=size * row_items)
+                    index._arrays[name] = array.reshape((size,) + shape)
+                    METRICS.incr("bytes_read", array.nbytes)
+            except OSError:
+                # Okurken yeni bir sürüm yayınlanıp bu sürümün dosyaları silindiyse indeks veriden kurulur
+                return None
+        index.size = size
+        index.positions = dict(zip(index.ids.tolist(), range(size)))
+        index.revision = meta.get("revision")
+        index._saved_size = size
+        index._saved_revision = index.revision
+        return index
+
+# Oran indeksi satırını etkileyen maç alanları
+ODDS_INDEX_FIELDS = set(ODDS_COLUMNS) | {"Skor", "İlk Yarı Skoru"}
+
+def get_odds_index(historic_data: Dict) -> OddsIndex:
+    """Veriye bağlı oran indeksini döndürür, yoksa mevcut veriden oluşturur"""
+    index = historic_data.get("_odds_index")
+    if index is None:
+        index = historic_data["_odds_index"] = OddsIndex.build(historic_data)
+    return index
+
+def get_outcome_cube(historic_data: Dict, by_league: bool = False) -> "OutcomeCube":
+    """Oran indeksine bağlı sonuç küpünü döndürür; yoksa oluşturur, lig kırılımı istenip yoksa ekler"""
+    index = get_odds_index(historic_data)
+    if index.cube is None:
+        index.attach_cube(OutcomeCube(by_league=by_league))
+    elif by_league and not index.cube.by_league:
+        index.add_league_breakdown()
+    return index.cube
+
+class OddsSeries:
+    """
+    Her bülten çekiminde maçların oran anlık görüntülerini saklayan sütunlu zaman serisi.
+    Her kayıt (maç id, zaman, değişen sütun sayısı) ve önceki görüntüye göre değişen sütunların
+    tick farklarından oluşur; oranı değişmeyen maçlar için hiçbir şey yazılmaz. Dosyalar sadece sona eklenir.
+    """
+
+    # Kayıt başına diziler ve değişiklik başına diziler
+    RECORD_ARRAYS = {"ids": np.int64, "times": np.uint32, "counts": np.uint8}
+    CHANGE_ARRAYS = {"columns": np.uint8, "deltas": np.int16}
+    DELTA_LIMIT = np.iinfo(np.int16).max
+
+    def __init__(self, capacity: int = 1024):
+        self.records = 0
+        self.changes = 0
+        self._records = {name: np.zeros(capacity, dtype=dtype) for name, dtype in self.RECORD_ARRAYS.items()}
+        self._changes = {name: np.zeros(capacity * 4, dtype=dtype) for name, dtype in self.CHANGE_ARRAYS.items()}
+        self._last = {}
+        self._pending = []
+        self._saved_records = 0
+        self._saved_changes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _grow(arrays: Dict[str, np.ndarray], used: int, size: int):
+        capacity = len(next(iter(arrays.values())))
+        if size <= capacity:
+            return
+        capacity = max(size, capacity * 2, 1024)
+        for name, array in arrays.items():
+            grown = np.zeros(capacity, dtype=array.dtype)
+            grown[:used] = array[:used]
+            arrays[name] = grown
+
+    def _append(self, match_id: int, timestamp: int, ticks: np.ndarray) -> bool:
+        previous = self._last.get(match_id)
+        diff = ticks - previous if previous is not None else ticks
+        columns = np.flatnonzero(diff)
+        if previous is not None and not len(columns):
+            return False
+
+        # int16'ya sığmayan farklar aynı sütun için birden fazla parçaya bölünür, okurken toplanır
+        change_columns = []
+        change_deltas = []
+        for column in columns.tolist():
+            delta = int(diff[column])
+            while abs(delta) > self.DELTA_LIMIT:
+                step = self.DELTA_LIMIT if delta > 0 else -self.DELTA_LIMIT
+                change_columns.append(column)
+                change_deltas.append(step)
+                delta -= step
+            change_columns.append(column)
+            change_deltas.append(delta)
+
+        self._grow(self._records, self.records, self.records + 1)
+        self._grow(self._changes, self.changes, self.changes + len(change_columns))
+        self._records["ids"][self.records] = match_id
+        self._records["times"][self.records] = timestamp
+        self._records["counts"][self.records] = len(change_columns)
+        self._changes["columns"][self.changes:self.changes + len(change_columns)] = change_columns
+        self._changes["deltas"][self.changes:self.changes + len(change_deltas)] = change_deltas
+        self.records += 1
+        self.changes += len(change_columns)
+        self._last[match_id] = ticks
+        self._pending.append((match_id, timestamp, ticks))
+        return True
+
+    def record(self, match: Dict, timestamp: float = None) -> bool:
+        """Maçın güncel oranlarını ekler. Dönüş: oranlar değiştiyse (veya maç ilk kez görüldüyse) True"""
+        match_id = match.get("id")
+        if match_id is None:
+            return False
+        ticks = np.array([odds_to_ticks(match.get(column)) for column in ODDS_COLUMNS], dtype=np.int32)
+        with self._lock:
+            return self._append(match_id, int(time.time() if timestamp is None else timestamp), ticks)
+
+    def record_many(self, matches: List[Dict], timestamp: float = None) -> int:
+        """Aynı çekimden gelen maçları aynı zaman damgasıyla ekler. Dönüş: yazılan kayıt sayısı"""
+        timestamp = time.time() if timestamp is None else timestamp
+        return sum(self.record(match, timestamp) for match in matches)
+
+    def history(self, match_id: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Maçın kayıt zamanları ve her kayıttaki tüm oranlar (tick, eksik 0)"""
+        with self._lock:
+            ids = self._records["ids"][:self.records]
+            counts = self._records["counts"][:self.records]
+            starts = np.concatenate(([0], np.cumsum(counts, dtype=np.int64)[:-1])) if self.records else np.zeros(0, dtype=np.int64)
+            positions = np.flatnonzero(ids == match_id)
+            times = self._records["times"][positions].copy()
+            matrix = np.zeros((len(positions), len(ODDS_COLUMNS)), dtype=np.int32)
+            current = np.zeros(len(ODDS_COLUMNS), dtype=np.int32)
+            for row, pos in enumerate(positions.tolist()):
+                start = int(starts[pos])
+                end = start + int(counts[pos])
+                np.add.at(current, self._changes["columns"][start:end], self._changes["deltas"][start:end])
+                matrix[row] = current
+        return times, matrix.astype(ODDS_DTYPE)
+
+    def opening_closing(self, match_id: int) -> Dict:
+        """
+        Maçın açılış ve kapanış oranları. Her sütunun açılışı ilk görüldüğü, kapanışı son görüldüğü değerdir.
+        Dönüş: {"opened_at", "closed_at", "snapshots", "odds": {sütun: {"opening", "closing", "change"}}}
+        """
+        times, matrix = self.history(match_id)
+        if not len(times):
+            return {}
+        odds = {}
+        for idx, column in enumerate(ODDS_COLUMNS):
+            seen = matrix[:, idx][matrix[:, idx] != ODDS_MISSING]
+            if not len(seen):
+                continue
+            opening = ticks_to_odds(seen[0])
+            closing = ticks_to_odds(seen[-1])
+            odds[column] = {"opening": opening, "closing": closing, "change": round(closing - opening, 2)}
+        return {
+            "opened_at": datetime.fromtimestamp(int(times[0]), timezone.utc).isoformat(),
+            "closed_at": datetime.fromtimestamp(int(times[-1]), timezone.utc).isoformat(),
+            "snapshots": len(times),
+            "odds": odds
+        }
+
+    @staticmethod
+    def file_path(historic_file: str) -> str:
+        return f"{os.path.splitext(historic_file)[0]}.series"
+
+    def save(self, historic_file: str):
+        """
+        Son kayıttan bu yana eklenen kısmı dosyaların sonuna yazar; meta dosyası en son ve atomik olarak değiştirilir.
+        Disk başka bir işlem tarafından ilerletildiyse diskteki seri yüklenip bekleyen görüntüler onun üzerine eklenir.
+        """
+        directory = self.file_path(historic_file)
+        os.makedirs(directory, exist_ok=True)
+        meta_path = os.path.join(directory, "meta.json")
+        with self._lock:
+            disk_meta = None
+            if os.path.exists(meta_path):
+                with open(meta_path, 'r', encoding='utf-8') as f:
+                    disk_meta = json.load(f)
+            if disk_meta is None:
+                self._saved_records = self._saved_changes = 0
+            elif (disk_meta.get("records"), disk_meta.get("changes")) != (self._saved_records, self._saved_changes):
+                disk = OddsSeries.load(historic_file) or OddsSeries()
+                for match_id, timestamp, ticks in self._pending:
+                    disk._append(match_id, timestamp, ticks)
+                self.records, self.changes = disk.records, disk.changes
+                self._records, self._changes, self._last = disk._records, disk._changes, disk._last
+                self._saved_records, self._saved_changes = disk._saved_records, disk._saved_changes
+
+            written = 0
+            for arrays, saved, used in ((self._records, self._saved_records, self.records),
+                                        (self._changes, self._saved_changes, self.changes)):
+                for name, array in arrays.items():
+                    path = os.path.join(directory, f"{name}.bin")
+                    with open(path, 'r+b' if saved and os.path.exists(path) else 'wb') as f:
+                        f.seek(saved * array.itemsize)
+                        data = array[saved:used].tobytes()
+                        f.write(data)
+                        f.truncate()
+                        written += len(data)
+
+            meta = {"records": self.records, "changes": self.changes, "odds_scale": ODDS_SCALE, "columns": ODDS_COLUMNS}
+            write_json_atomic(meta_path, meta)
+
+            self._saved_records = self.records
+            self._saved_changes = self.changes
+            self._pending = []
+        METRICS.incr("bytes_written", written)
+
+    @classmethod
+    def load(cls, historic_file: str) -> "OddsSeries":
+        directory = cls.file_path(historic_file)
+        meta_path = os.path.join(directory, "meta.json")
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get("odds_scale") != ODDS_SCALE or meta.get("columns") != ODDS_COLUMNS:
+            return None
+
+        series = cls(capacity=0)
+        # Meta dosyası en son yazıldığı için yarım kalmış bir eklemenin fazlası okunmaz
+        for arrays, size in ((series._records, meta.get("records", 0)), (series._changes, meta.get("changes", 0))):
+            for name in arrays:
+                path = os.path.join(directory, f"{name}.bin")
+                if not os.path.exists(path):
+                    return None
+                array = np.fromfile(path, dtype=arrays[name].dtype, count=size)
+                if len(array) != size:
+                    return None
+                arrays[name] = array
+                METRICS.incr("bytes_read", array.nbytes)
+        series.records = meta.get("records", 0)
+        series.changes = meta.get("changes", 0)
+        if int(series._records["counts"].sum(dtype=np.int64)) != series.changes:
+            return None
+
+        # Son oranlar tüm farkların maç ve sütun bazında toplamıdır
+        match_ids, inverse = np.unique(series._records["ids"], return_inverse=True)
+        last = np.zeros((len(match_ids), len(ODDS_COLUMNS)), dtype=np.int32)
+        change_rows = np.repeat(inverse, series._records["counts"])
+        np.add.at(last, (change_rows, series._changes["columns"]), series._changes["deltas"])
+        series._last = dict(zip(match_ids.tolist(), last))
+        series._saved_records = series.records
+        series._saved_changes = series.changes
+        return series
+
+def get_odds_series(historic_data: Dict) -> OddsSeries:
+    """Veriye bağlı oran zaman serisini döndürür, yoksa boş bir seri oluşturur"""
+    series = historic_data.get("_odds_series")
+    if series is None:
+        series = historic_data["_odds_series"] = OddsSeries()
+    return series
+
+def record_bulletin(historic_data: Dict, historic_file: str, matches: List[Dict]) -> List[Dict]:
+    """Çekilen bültenin oranlarını zaman serisine ekler ve sadece seriyi kaydeder. Dönüş: aynı maç listesi"""
+    series = get_odds_series(historic_data)
+    if series.record_many(matches):
+        with HistoryLock(historic_file):
+            series.save(historic_file)
+    return matches
+
+def encode_categoricals(df: pd.DataFrame, dictionary: StringDictionary = None) -> pd.DataFrame:
+    """
+    Tekrarlayan metin sütunlarını tamsayı kodlu kategorik sütunlara çevirir.
+    Sözlük verilirse kodlar kalıcı sözlükten gelir; ev sahibi ve deplasman aynı takım kodlarını paylaşır.
+    """
+    for column, field in CATEGORICAL_COLUMNS.items():
+        if column not in df.columns:
+            continue
+        if dictionary is None:
+            df[column] = df[column].astype("category")
+            continue
+        values = df[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            values = values.astype(object)
+        for value in values.dropna().unique():
+            dictionary.add(field, value)
+        categories = dictionary.categories(field)
+        df[column] = pd.Categorical.from_codes(categories.get_indexer(values), dtype=pd.CategoricalDtype(categories))
+    return df
+
+def align_categoricals(df: pd.DataFrame, dictionary: StringDictionary) -> pd.DataFrame:
+    """Kategorik sütunlara sözlüğe sonradan eklenen değerleri ekler (mevcut kodlar değişmez)"""
+    for column, field in CATEGORICAL_COLUMNS.items():
+        if column in df.columns and isinstance(df[column].dtype, pd.CategoricalDtype):
+            categories = dictionary.categories(field)
+            if len(df[column].cat.categories) != len(categories):
+                df[column] = pd.Categorical.from_codes(df[column].cat.codes, dtype=pd.CategoricalDtype(categories))
+    return df
+
+def get_category_codes(values: pd.Series) -> Tuple[np.ndarray, pd.Index]:
+    """Sütunun tamsayı kodlarını ve kategorilerini döndürür (kategorik değilse yerinde kodlanır)"""
+    if not isinstance(values.dtype, pd.CategoricalDtype):
+        values = values.astype("category")
+    return values.cat.codes.to_numpy(), values.cat.categories
+
+def ingest_matches(historic_data: Dict, date_str: str, matches: List[Dict], record_series: bool = True) -> Tuple[int, int]:
+    """
+    Normalize edilmiş maçları geçmiş veriye işler: yeni maçlar eklenir, aynı id'li maçlar güncellenir (başka
+    bir günde kayıtlıysa bu güne taşınır), aynı takımlar ve tarihle gelen farklı id'li kayıtlar ve id'siz
+    maçlar reddedilir. Eklenen ve güncellenen maçların id'leri
+    kayıtta başka süreçlerin yayınladığı sürümle birleştirirken korunmak üzere işaretlenir.
+    record_series: False ise oranlar zaman serisine eklenmez (zaten kaydedilmiş maçlar birleştirilirken)
+    Dönüş: (yeni maç sayısı, güncellenen maç sayısı)
+    """
+    index = get_match_index(historic_data)
+    dictionary = get_string_dictionary(historic_data)
+    odds_index = get_odds_index(historic_data)
+    if record_series:
+        get_odds_series(historic_data).record_many(matches)
+    changed_ids = historic_data.setdefault("_changed_ids", set())
+    day_matches = historic_data["matches"].setdefault(date_str, [])
+    existing_by_id = None
+    new_count = 0
+    updated_count = 0
+    without_id = 0
+
+    for match in matches:
+        result = index.add(match, date_str)
+        if result == "invalid":
+            without_id += 1
+        elif result == "new":
+            match["hash"] = match_content_hash(get_update_values(match))
+            day_matches.append(match)
+            dictionary.add_match(match)
+            odds_index.upsert(match, date_str, dictionary)
+            changed_ids.add(match.get("id"))
+            new_count += 1
+        elif result == "existing":
+            stored_date = index.ids[match.get("id")]
+            if stored_date != date_str:
+                stored_matches = {m.get("id"): m for m in historic_data["matches"].get(stored_date, [])}
+            else:
+                if existing_by_id is None:
+                    existing_by_id = {m.get("id"): m for m in day_matches}
+                stored_matches = existing_by_id
+            stored_match = stored_matches.get(match.get("id"))
+            if stored_match is None:
+                continue
+            old_key = index.match_key(stored_match)
+            changed = update_match_fields(stored_match, match)
+            if stored_date != date_str:
+                # Başka bir güne alınmış (ertelenmiş) maç yeni gününün listesine taşınır ve yeniden anahtarlanır
+                historic_data["matches"][stored_date] = [m for m in historic_data["matches"][stored_date]
+                                                         if m is not stored_match]
+                stored_match["Tarih"] = date_str
+                day_matches.append(stored_match)
+                if existing_by_id is not None:
+                    existing_by_id[match.get("id")] = stored_match
+                index.move(match.get("id"), old_key, stored_match, date_str)
+                changed.add("Tarih")
+            if changed:
+                # Oran indeksi sadece oran, skor veya gün değiştiyse yenilenir (durum/saat değişimi satırı etkilemez)
+                if not changed.isdisjoint(CATEGORICAL_COLUMNS):
+                    dictionary.add_match(stored_match)
+                if not changed.isdisjoint(ODDS_INDEX_FIELDS) or stored_date != date_str:
+                    odds_index.upsert(stored_match, date_str, dictionary)
+                changed_ids.add(match.get("id"))
+                updated_count += 1
+
+    if without_id:
+        print(f"⚠️ {date_str}: {without_id} id'siz maç atlandı.")
+
+    # Bellekteki sıralı geçmiş dizileri bu sayaç değişince yeniden oluşturulur
+    if new_count or updated_count:
+        historic_data["_generation"] = historic_data.get("_generation", 0) + 1
+    return new_count, updated_count
+
+@METRICS.timed("io.migrate_odds")
+def migrate_odds_to_ticks(data: Dict):
+    """Eski dosyalardaki ondalık oranları ("1.85" veya 1.85) yerinde tick'e çevirir, geçersiz oranları siler"""
+    for matches in data["matches"].values():
+        for match in matches:
+            for column in ODDS_COLUMNS:
+                if column in match:
+                    ticks = decimal_odds_to_ticks(match[column])
+                    if ticks != ODDS_MISSING:
+                        match[column] = ticks
+                    else:
+                        del match[column]
+    data["odds_scale"] = ODDS_SCALE
+
+@METRICS.timed("io.load_history")
 def load_historic_data(file_path: str) -> Dict:
     try:
         if os.path.exists(file_path):
+            # Dosya atomik olarak değiştirildiği için açılan sürüm sonuna kadar okunur; damgası kayıtta
+            # başka bir sürecin araya girip girmediğini anlamak için saklanır
             with open(file_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
+                stat = os.fstat(f.fileno())
+                data = json.load(f)
+            METRICS.incr("bytes_read", stat.st_size)
+            data["_stamp"] = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+            if "matches" not in data:
+                data["matches"] = {}
+
+            # İndeks bu veri sürümüne aitse kullan, değilse (eski dosya) bir kez normalize edip yeniden oluştur
+            # Ondalık oranlı eski dosyalar bir kez tick'e çevrilir, kayıtlar değiştiği için indeks yeniden oluşturulur
+            migrated = data.get("odds_scale") != ODDS_SCALE
+            if migrated:
+                migrate_odds_to_ticks(data)
+
+            index = MatchIndex.load(file_path)
+            if migrated or index is None or index.revision != data.get("revision"):
+                index, removed = MatchIndex.build(data)
+                if removed:
+                    print(f"🧹 {removed} tekrar eden maç kaydı çıkarıldı.")
+            data["_index"] = index
+
+            dictionary = StringDictionary.load(file_path)
+            dictionary_rebuilt = dictionary is None or dictionary.revision != data.get("revision")
+            if dictionary_rebuilt:
+                dictionary = StringDictionary.build(data)
+            data["_dictionary"] = dictionary
+
+            # Lig kodları sözlükten geldiği için sözlük yeniden oluşturulduysa oran indeksi de yenilenir
+            odds_index = OddsIndex.load(file_path)
+            if migrated or dictionary_rebuilt or odds_index is None or odds_index.revision != data.get("revision"):
+                odds_index = OddsIndex.build(data)
+            data["_odds_index"] = odds_index
+
+            # Oran zaman serisi sadece sona eklendiği için veri sürümüne bağlı değildir
+            data["_odds_series"] = OddsSeries.load(file_path) or OddsSeries()
+            return data
         return {"matches": {}}
     except Exception as e:
         print(f"❌ Veri yükleme hatası: {str(e)}")
         return {"matches": {}}
 
-def save_historic_data(data: Dict, file_path: str):
+def merge_published_history(data: Dict, file_path: str) -> int:
+    """
+    Bu süreç veriyi yükledikten sonra başka bir sürecin yayınladığı sürümü bellekteki veriyle birleştirir.
+    Bu süreçte eklenen veya güncellenen maçlar korunur; diskteki diğer yeni ve güncellenmiş maçlar işlenir.
+    Dönüş: birleştirilen (yeni veya güncellenen) maç sayısı
+    """
+    with open(file_path, 'r', encoding='utf-8') as f:
+        published = json.load(f)
+    published.setdefault("matches", {})
+    if published.get("odds_scale") != ODDS_SCALE:
+        migrate_odds_to_ticks(published)
+
+    changed_ids = set(data.get("_changed_ids", ()))
+    merged = 0
+    for date_str, matches in published["matches"].items():
+        incoming = [match for match in matches if match.get("id") not in changed_ids]
+        new_count, updated_count = ingest_matches(data, date_str, incoming, record_series=False)
+        merged += new_count + updated_count
+
+    data["revision"] = max(data.get("revision") or 0, published.get("revision") or 0)
+    if (published.get("last_update") or "") > (data.get("last_update") or ""):
+        data["last_update"] = published["last_update"]
+    return merged
+
+@METRICS.timed("io.save_history")
+def save_historic_data(data: Dict, file_path: str) -> bool:
+    """
+    Veriyi ve yan dosyalarını yazar. Kayıt HistoryLock altında yapılır; veri yüklendikten sonra başka bir
+    süreç yeni bir sürüm yayınladıysa önce onunla birleştirilir, böylece paralel güncellemeler birbirinin
+    günlerini silmez. Her dosya geçici dosyadan atomik olarak taşınır; okuyucular kilit beklemez.
+    Dönüş: kayıt başarılıysa True
+    """
     try:
-        if "matches" in data:
-            for date in data["matches"]:
-                for match in data["matches"][date]:
-                    # Saat bilgisini düzeltme (veri tutarlılığı için)
-                    if "Saat" in match:
-                        match["Saat"] = match["Saat"][:5] if match["Saat"] else "00:00"
-                    
-                    # Eğer fts_* değerleri varsa, bunlardan skor oluştur (son kontrol)
-                    if "Skor" in match and match["Skor"] == "- - -":
-                        fts_A = match.get("fts_A")
-                        fts_B = match.get("fts_B")
-                        if fts_A is not None and fts_B is not None:
-                            match["Skor"] = f"{fts_A} - {fts_B}"
-                    
-                    # Eğer hts_* değerleri varsa, bunlardan ilk yarı skoru oluştur
-                    if "İlk Yarı Skoru" in match and match["İlk Yarı Skoru"] == "- - -":
-                        hts_A = match.get("hts_A")
-                        hts_B = match.get("hts_B")
-                        if hts_A is not None and hts_B is not None:
-                            match["İlk Yarı Skoru"] = f"{hts_A} - {hts_B}"
-
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=4)
+        # Normalizasyon ve tekrar kontrolü veri eklenirken yapıldığı için burada sadece yazılır
+        index = get_match_index(data)
+        dictionary = get_string_dictionary(data)
+        odds_index = get_odds_index(data)
+
+        with HistoryLock(file_path):
+            stamp = get_file_stamp(file_path)
+            if stamp is not None and stamp != data.get("_stamp"):
+                try:
+                    merged = merge_published_history(data, file_path)
+                    METRICS.incr("history_merges")
+                    if merged:
+                        print(f"🔀 Başka bir işlemin kaydettiği {merged} maç birleştirildi.")
+                except (OSError, ValueError) as e:
+                    print(f"⚠️ Kayıtlı veri okunamadı, birleştirilmeden yazılıyor: {str(e)}")
+
+            data["revision"] = data.get("revision", 0) + 1
+            data["odds_scale"] = ODDS_SCALE
+            index.revision = data["revision"]
+            dictionary.revision = data["revision"]
+            odds_index.revision = data["revision"]
+
+            # Yan dosyalar önce yazılır; veri dosyası sürümü yayınlar. Arada okuyan süreç sürümleri uyuşmayan
+            # yan dosyaları veriden yeniden kurar.
+            index.save(file_path)
+            dictionary.save(file_path)
+            odds_index.save(file_path)
+            get_odds_series(data).save(file_path)
+            write_json_atomic(file_path, {key: value for key, value in data.items() if not key.startswith("_")}, indent=4)
+            data["_stamp"] = get_file_stamp(file_path)
+            data["_changed_ids"] = set()
+        METRICS.incr("bytes_written", data["_stamp"][1])
+        return True
     except Exception as e:
         print(f"❌ Veri kaydetme hatası: {str(e)}")
+        return False
 
 def get_date_range(start_date: str, end_date: str) -> List[str]:
     try:
@@ -526,7 +1999,7 @@ def select_single_match(matches_df: pd.DataFrame) -> pd.DataFrame:
         print("❌ Aktif maç bulunamadı!")
         return pd.DataFrame()
 
-    grouped_matches = active_matches.groupby('Lig', sort=True)
+    grouped_matches = active_matches.groupby('Lig', sort=True, observed=True)
     match_index = 1
     match_indices = {}
 
@@ -559,10 +2032,11 @@ def select_single_match(matches_df: pd.DataFrame) -> pd.DataFrame:
             if choice.startswith('L'):
                 try:
                     lig_num = int(choice[1:])
-                    lig_names = sorted(active_matches['Lig'].unique())
+                    league_codes, league_categories = get_category_codes(active_matches['Lig'])
+                    lig_names = sorted(league_categories[np.unique(league_codes[league_codes >= 0])])
                     if 1 <= lig_num <= len(lig_names):
                         selected_lig = lig_names[lig_num - 1]
-                        selected_matches = active_matches[active_matches['Lig'] == selected_lig]
+                        selected_matches = active_matches[league_codes == league_categories.get_loc(selected_lig)]
                         print(f"\n✅ {selected_lig} ligi maçları seçildi ({len(selected_matches)} maç)")
                         return selected_matches
                     else:
@@ -585,7 +2059,7 @@ def select_single_match(matches_df: pd.DataFrame) -> pd.DataFrame:
                 selected_matches = active_matches.loc[valid_selections]
                 print(f"\n✅ Seçilen maçlar ({len(selected_matches)} maç):")
 
-                for lig_name, lig_group in selected_matches.groupby('Lig'):
+                for lig_name, lig_group in selected_matches.groupby('Lig', observed=True):
                     print(f"\n🏆 {lig_name}")
                     print("─" * 80)
                     for _, match_data in lig_group.sort_values('Saat').iterrows():
@@ -611,13 +2085,16 @@ def select_league(matches_df: pd.DataFrame) -> pd.DataFrame:
         print("❌ Aktif maç bulunamadı!")
         return pd.DataFrame()
 
-    available_leagues = sorted(active_matches["Lig"].unique())
+    # Lig filtreleri metin karşılaştırması yerine tamsayı kodlar üzerinden yapılır
+    league_codes, league_categories = get_category_codes(active_matches["Lig"])
+    league_counts = np.bincount(league_codes[league_codes >= 0], minlength=len(league_categories))
+    available_leagues = sorted(league_categories[league_counts > 0])
 
     print("\n📅 Mevcut Ligler:")
     print("─" * 50)
 
     for idx, league in enumerate(available_leagues, 1):
-        match_count = len(active_matches[active_matches["Lig"] == league])
+        match_count = league_counts[league_categories.get_loc(league)]
         print(f"{idx}. {league} ({match_count} maç)")
 
     print("─" * 50)
@@ -644,10 +2121,12 @@ def select_league(matches_df: pd.DataFrame) -> pd.DataFrame:
                     print(f"❌ Geçersiz seçim: {sel}")
 
             if valid_selections:
-                selected_matches = active_matches[active_matches["Lig"].isin(selected_leagues)]
+                selected_codes = [league_categories.get_loc(league) for league in selected_leagues]
+                selected_matches = active_matches[np.isin(league_codes, selected_codes)]
+                selected_league_codes = league_codes[np.isin(league_codes, selected_codes)]
                 print(f"\n✅ Seçilen ligler ({len(selected_leagues)} lig):")
-                for league in selected_leagues:
-                    league_matches = selected_matches[selected_matches["Lig"] == league]
+                for league, league_code in zip(selected_leagues, selected_codes):
+                    league_matches = selected_matches[selected_league_codes == league_code]
                     print(f"\n🏆 {league} ({len(league_matches)} maç):")
                     for _, match in league_matches.iterrows():
                         print(f"   • {match['Ev Sahibi']} vs {match['Deplasman']}")
@@ -685,158 +2164,842 @@ def get_date_range_choice(analysis_date: datetime) -> tuple[datetime, datetime]:
             return start_date, end_date
         print("❌ Geçersiz seçim!")
 
-def find_similar_matches(historical_df: pd.DataFrame, today_df: pd.DataFrame, threshold: float = 0.05) -> List[Dict]:
-    similar_matches = []
-    historical_df = historical_df.drop_duplicates(subset=["Ev Sahibi", "Deplasman", "Tarih"])
-    today_df = today_df.drop_duplicates(subset=["Ev Sahibi", "Deplasman"])
+@METRICS.timed("dataframe.odds_matrix")
+def build_odds_matrix(df: pd.DataFrame) -> np.ndarray:
+    """Oran sütunlarını (maç x ODDS_COLUMNS) uint16 tick matrisine çevirir, eksik oranlar ODDS_MISSING olur"""
+    odds_matrix = np.full((len(df), len(ODDS_COLUMNS)), ODDS_MISSING, dtype=ODDS_DTYPE)
+    for col_idx, column in enumerate(ODDS_COLUMNS):
+        if column not in df.columns:
+            continue
+        values = df[column]
+        if pd.api.types.is_numeric_dtype(values):
+            ticks = values.to_numpy(dtype=float)
+        else:
+            # Normalize edilmemiş metin oranlar ("1.85") tek tek çevrilir
+            ticks = np.fromiter((odds_to_ticks(value) for value in values), dtype=float, count=len(values))
+        ticks = np.rint(np.nan_to_num(ticks, nan=ODDS_MISSING))
+        ticks[(ticks < 0) | (ticks > ODDS_MAX_TICKS)] = ODDS_MISSING
+        odds_matrix[:, col_idx] = ticks.astype(ODDS_DTYPE)
+    return odds_matrix
+
+def prepare_historical_data(historical_matches: List[Dict], dictionary: StringDictionary = None) -> Tuple[pd.DataFrame, np.ndarray]:
+    """Geçmiş maçlardan DataFrame (metin sütunları kategorik kodlu) ve oran matrisini bir kez oluşturur"""
+    # Tekrar eden kayıtlar veri eklenirken MatchIndex ile reddedildiği için burada ayıklama yapılmaz
+    with METRICS.span("dataframe.build"):
+        historical_df = encode_categoricals(pd.DataFrame(historical_matches), dictionary)
+    return historical_df, build_odds_matrix(historical_df)
+
+class HistoryArrays:
+    """
+    Geçmiş maçların tarihe göre sıralı, bitişik dizileri (DataFrame, oran matrisi ve gün dizisi).
+    Analiz penceresi iki ikili arama ile bulunur ve kopyasız bir dilim olarak döner;
+    pencere uzunluğu ek veri oluşturma maliyeti getirmez.
+    """
 
-    ht_required_markets = ["İlk Yarı", "IY 1.5", "IY/MS"]
-    non_ht_markets = ["Maç Sonucu", "Karşılıklı Gol", "A/U 2.5", "Toplam Gol", "EV 1.5", "DEP 1.5"]
+    def __init__(self, df: pd.DataFrame, odds: np.ndarray, settlement: np.ndarray = None, generation: int = None):
+        self.dates = self.date_values(df)
+        if len(self.dates) > 1 and not (self.dates[1:] >= self.dates[:-1]).all():
+            # Aynı gündeki maçların kayıt sırası korunur (kararlı sıralama)
+            order = np.argsort(self.dates, kind="stable")
+            df = df.take(order)
+            odds = odds[order]
+            settlement = settlement[order] if settlement is not None else None
+            self.dates = self.dates[order]
+        self.df = df.reset_index(drop=True)
+        self.odds = np.ascontiguousarray(odds)
+        self.settlement = settlement
+        self.generation = generation
+
+    @staticmethod
+    def date_values(df: pd.DataFrame) -> np.ndarray:
+        """Tarih sütununu datetime64[D] dizisine çevirir (kategorik sütunda sadece kategoriler ayrıştırılır)"""
+        if df.empty or "Tarih" not in df.columns:
+            return np.array([], dtype="datetime64[D]")
+        codes, categories = get_category_codes(df["Tarih"])
+        category_dates = pd.to_datetime(pd.Series(categories, dtype=object), format="%Y-%m-%d", errors="coerce")
+        category_dates = category_dates.to_numpy(dtype="datetime64[D]")
+        return np.where(codes >= 0, category_dates[codes], np.datetime64("NaT"))
+
+    @classmethod
+    def build(cls, historic_data: Dict) -> "HistoryArrays":
+        """Tüm geçmiş veriden gün sırasıyla dizileri oluşturur"""
+        matches = [match for date in sorted(historic_data.get("matches", {}))
+                   for match in historic_data["matches"][date]]
+        with METRICS.span("dataframe.build"):
+            history_df = encode_categoricals(pd.DataFrame(matches), get_string_dictionary(historic_data))
+        # Oran satırları ve bit maskeleri yeniden hesaplanmaz, kalıcı oran indeksinden alınır
+        history_odds, settlement = get_odds_index(historic_data).rows_for(history_df)
+        return cls(history_df, history_odds, settlement, generation=historic_data.get("_generation", 0))
+
+    def bounds(self, start_date: str, end_date: str) -> Tuple[int, int]:
+        """[start_date, end_date] günlerinin (dahil) dizideki yarı açık aralığı"""
+        start = np.searchsorted(self.dates, np.datetime64(start_date, "D"), side="left")
+        end = np.searchsorted(self.dates, np.datetime64(end_date, "D"), side="right")
+        return int(start), int(max(start, end))
+
+    def window(self, start_date: str, end_date: str) -> Tuple[pd.DataFrame, np.ndarray]:
+        """Pencerenin DataFrame ve oran matrisi dilimlerini döndürür (find_similar_matches'e doğrudan verilebilir)"""
+        start, end = self.bounds(start_date, end_date)
+        return self.df.iloc[start:end], self.odds[start:end]
+
+def get_history_arrays(historic_data: Dict) -> HistoryArrays:
+    """Veriye bağlı sıralı geçmiş dizilerini döndürür; veri değiştiyse yeniden oluşturur"""
+    history = historic_data.get("_history")
+    if history is None or history.generation != historic_data.get("_generation", 0):
+        history = historic_data["_history"] = HistoryArrays.build(historic_data)
+    return history
+
+def get_history_flags(historical_df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+    """Geçmiş maçların bitmiş (Status 3) ve ilk yarı skoru olan maç bayrakları"""
+    hist_finished = (historical_df["Status"] == 3).to_numpy() if "Status" in historical_df.columns else np.zeros(len(historical_df), dtype=bool)
+    if "İlk Yarı Skoru" in historical_df.columns:
+        hist_has_ht = (historical_df["İlk Yarı Skoru"] != "- - -").to_numpy()
+    else:
+        hist_has_ht = np.ones(len(historical_df), dtype=bool)
+    return hist_finished, hist_has_ht
+
+# Market -> oran matrisindeki sütunları
+MARKET_COLUMNS = {
+    market_type: [ODDS_COLUMN_INDEX[f"{market_type}_{outcome}"] for outcome in outcomes]
+    for market_type, outcomes in MARKET_OUTCOMES.items()
+}
+
+# Benzerlik taramasının çalışma belleği bütçesi (MB); geçmiş bu bütçeye sığan bloklar halinde taranır
+SCAN_MEMORY_BUDGET = int(float(os.environ.get("ORAN_ANALIZ_SCAN_MEMORY_MB", 64)) * 1024 * 1024)
+SCAN_MIN_BLOCK_ROWS = 1024
+# Bir bugünkü maç taranırken geçmiş satır başına ayrılan bellek: oran satırı, eşik karşılaştırmalarının
+# üç bool matrisi, market maskeleri ve kategori sayacı
+SCAN_BYTES_PER_ROW = (len(ODDS_COLUMNS) * (np.dtype(ODDS_DTYPE).itemsize + 3)
+                      + 2 * len(MARKET_COLUMNS) + 2)
+
+def scan_block_rows(memory_budget: int = None) -> int:
+    """Bellek bütçesine sığan geçmiş blok satır sayısı (en az SCAN_MIN_BLOCK_ROWS)"""
+    budget = SCAN_MEMORY_BUDGET if memory_budget is None else memory_budget
+    return max(SCAN_MIN_BLOCK_ROWS, int(budget // SCAN_BYTES_PER_ROW))
+
+class MarketSelectivity:
+    """
+    Marketlerin ölçülen seçiciliği: değerlendirilen satırlardan eşleşenlerin oranı.
+    Tarama çekirdeği marketleri en seçiciden başlayarak değerlendirir; eşleşmeyen satırlar erken
+    biriktiği için kategori alt sınırına ulaşamayacak satırlar daha erken elenir.
+    """
 
-    min_categories = 3
-    min_flexible_matches = 3
+    def __init__(self):
+        self.passed = dict.fromkeys(MARKET_COLUMNS, 0)
+        self.evaluated = dict.fromkeys(MARKET_COLUMNS, 0)
 
-    print(f"\n📊 Seçilen tarihteki maçların sayısı: {len(today_df)}")
-    print(f"📊 Geçmiş maçların sayısı: {len(historical_df)}")
+    def record(self, market_type: str, passed: int, evaluated: int):
+        self.passed[market_type] += passed
+        self.evaluated[market_type] += evaluated
 
-    if len(today_df) == 0 or len(historical_df) == 0:
-        return []
+    def rate(self, market_type: str) -> float:
+        return (self.passed[market_type] + 1) / (self.evaluated[market_type] + 2)
 
-    for _, today_match in today_df.iterrows():
-        if today_match["Status"] != 1:
-            continue
+    def order(self, market_types: List[str]) -> List[str]:
+        return sorted(market_types, key=self.rate)
+
+# Süreç genelinde biriken seçicilik ölçümleri (sıra sadece hızı etkiler, sonuçları değil)
+MARKET_SELECTIVITY = MarketSelectivity()
 
-        for _, hist_match in historical_df.iterrows():
-            if hist_match["Status"] != 3:
+def market_matches_mask(within_threshold: np.ndarray, market_type: str, min_flexible_matches: int = 3) -> np.ndarray:
+    """Eşik içi matrisin (satır x marketin sütunları) market kuralına göre eşleşen satırları"""
+    if market_type == "IY/MS":
+        return within_threshold.sum(axis=1) >= min_flexible_matches
+    return within_threshold.all(axis=1)
+
+def scan_similar_candidates(historical_odds: np.ndarray, hist_finished: np.ndarray, hist_has_ht: np.ndarray,
+                            today_odds: np.ndarray, today_active: np.ndarray, threshold: float = 0.05,
+                            min_categories: int = 3, min_flexible_matches: int = 3, today_columns: np.ndarray = None):
+    """
+    Benzerlik taramasının vektörel çekirdeği. Her aktif bugünkü maç için
+    (bugünkü konum, aday geçmiş konumları, {market: (sütunlar, market_ok)}, eşik içi matris, eşleşen kategori sayıları)
+    üretir; market_ok, eşik içi matris ve kategori sayıları adaylarla aynı sırada hizalıdır.
+    find_similar_matches ve geriye dönük test aynı çekirdeği kullanır.
+
+    Sadece bitmiş maçlar taranır. Marketler MARKET_SELECTIVITY sırasıyla değerlendirilir; kalan marketlerin
+    hepsi eşleşse bile min_categories'e ulaşamayacak satırlar elenir ve sonraki marketlere girmez. İlk yarı
+    skoru olmayan satırlar ilk yarı marketlerinde hiç karşılaştırılmaz ve bu marketler ulaşılabilir sayıya
+    katılmaz. Adaylar için ayrıntılar kurallar değişmeden yeniden hesaplanır.
+
+    today_columns: bugünkü tabloda sütunu bulunan seçenekler (ODDS_COLUMNS sırasıyla bool, varsayılan hepsi).
+    Marketin seçenekleri bu sütunlardan alınır; sütunu olup bugünkü maçta oranı eksik olan seçenek
+    karşılaştırmada sayılır ve eşleşmez: IY/MS dışındaki market eşleşemez, IY/MS'te sadece eşleşen seçenek
+    sayısını artırmaz.
+    """
+    threshold_ticks = threshold_to_ticks(threshold)
+    n_history = len(historical_odds)
+    finished_rows = np.flatnonzero(hist_finished)
+    finished_has_ht = hist_has_ht[finished_rows]
+    # Bitmiş maçların oranları bir kez sütun düzenine çevrilir: her seçeneğin kontrolü bitişik bir vektör
+    # üzerinde yapılır; eleme başladıktan sonra sütunlardan sadece kalan satırlar okunur
+    finished_odds = np.ascontiguousarray(historical_odds[finished_rows].T)
+    all_finished = np.arange(len(finished_rows))
+    if today_columns is None:
+        today_columns = np.ones(len(ODDS_COLUMNS), dtype=bool)
+
+    for today_pos in np.flatnonzero(today_active):
+        today_row = today_odds[today_pos]
+        # Eşik kontrolü tamsayı aralık karşılaştırmasıdır: |geçmiş - bugün| <= eşik tick.
+        # Alt sınır en az 1 olduğu için eksik geçmiş oranlar (0) otomatik olarak başarısız sayılır;
+        # bugün eksik olan seçenekler için aralık boş bırakılır (alt > üst).
+        today_ticks = today_row.astype(np.int32)
+        today_present = today_row != ODDS_MISSING
+        lower = np.where(today_present, np.maximum(today_ticks - threshold_ticks, 1), 1).astype(ODDS_DTYPE)
+        upper = np.where(today_present, np.minimum(today_ticks + threshold_ticks, ODDS_MAX_TICKS), 0).astype(ODDS_DTYPE)
+        # Mevcut seçeneklerde aralık kontrolü tek karşılaştırmadır: (geçmiş - alt) işaretsiz taşmayla
+        # sadece [alt, üst] aralığındaki değerler için (üst - alt)'tan küçük veya eşit kalır
+        width = upper - lower
+
+        # Marketin seçenekleri bugünkü tablonun sütunlarıdır. Seçeneklerinden birinin oranı bugün eksikse
+        # IY/MS dışındaki market hiçbir satırda eşleşemez ve taranmaz; IY/MS'te eksik seçenek hiç eşleşmeyeceği
+        # için sadece mevcut seçenekler karşılaştırılır
+        market_columns = {}
+        for market_type in NON_HT_MARKETS + HT_REQUIRED_MARKETS:
+            columns = [col for col in MARKET_COLUMNS[market_type] if today_columns[col]]
+            if market_type != "IY/MS" and not all(today_present[col] for col in columns):
                 continue
+            columns = [col for col in columns if today_present[col]]
+            if columns:
+                market_columns[market_type] = columns
+
+        # Erken eleme: satırlar kalan marketlerle ulaşabilecekleri en yüksek kategori sayısına göre budanır
+        # alive: bitmiş satırlar içinde hâlâ aday olabilenlerin konumları (None: hepsi)
+        alive, has_ht = None, finished_has_ht
+        matched = np.zeros(len(finished_rows), dtype=np.int8)
+        ht_left = sum(1 for market_type in market_columns if market_type in HT_REQUIRED_MARKETS)
+        full_left = len(market_columns) - ht_left
+        rejected = 0
+        for market_type in MARKET_SELECTIVITY.order(list(market_columns)):
+            # İlk yarı skoru olmayan satırlar sadece tam maç marketlerine güvenebilir; en kötü satır bile
+            # sınıra ulaşabiliyorsa kontrol atlanır
+            if full_left < min_categories:
+                keep = matched + full_left + np.where(has_ht, ht_left, 0) >= min_categories
+                kept = int(np.count_nonzero(keep))
+                if kept < len(keep):
+                    rejected += len(keep) - kept
+                    alive = all_finished[keep] if alive is None else alive[keep]
+                    has_ht, matched = has_ht[keep], matched[keep]
+                if kept == 0:
+                    break
 
-            odds_comparison = {}
-            matched_categories = 0
+            columns = market_columns[market_type]
+            tests = (((finished_odds[col] if alive is None else finished_odds[col][alive]) - lower[col]) <= width[col]
+                     for col in columns)
+            if market_type == "IY/MS":
+                hits = np.zeros(len(matched), dtype=np.int8)
+                for test in tests:
+                    hits += test
+                market_ok = hits >= min_flexible_matches
+            else:
+                market_ok = next(tests)
+                for test in tests:
+                    market_ok &= test
+
+            if market_type in HT_REQUIRED_MARKETS:
+                # İlk yarı skoru "- - -" olan satırlar bu markette sayılmaz
+                ht_left -= 1
+                evaluated = int(np.count_nonzero(has_ht))
+                METRICS.incr("ht_pairs_skipped", len(matched) - evaluated)
+                market_ok &= has_ht
+            else:
+                full_left -= 1
+                evaluated = len(matched)
+            MARKET_SELECTIVITY.record(market_type, int(np.count_nonzero(market_ok)), evaluated)
+            matched += market_ok
+
+        rows = finished_rows if alive is None else finished_rows[alive]
+        candidates = rows[matched >= min_categories]
+
+        # Adayların ayrıntıları (market sırası raporlardaki sırayı belirler)
+        candidate_odds = historical_odds[candidates]
+        within_threshold = (candidate_odds >= lower) & (candidate_odds <= upper)
+        candidate_has_ht = hist_has_ht[candidates]
+        matched_categories = np.zeros(len(candidates), dtype=np.int8)
+        market_matches = {}
+        for market_type, columns in market_columns.items():
+            market_ok = market_matches_mask(within_threshold[:, columns], market_type, min_flexible_matches)
+            if market_type in HT_REQUIRED_MARKETS:
+                market_ok &= candidate_has_ht
+            market_matches[market_type] = (columns, market_ok)
+            matched_categories += market_ok
+
+        METRICS.incr("pairs_compared", n_history)
+        METRICS.incr("pairs_unfinished_skipped", n_history - len(finished_rows))
+        METRICS.incr("pairs_rejected_early", rejected)
+        METRICS.incr("candidates_pruned", n_history - len(candidates))
+        yield int(today_pos), candidates, market_matches, within_threshold, matched_categories
+
+@METRICS.timed("similarity.scan")
+def find_similar_matches(historical_df: pd.DataFrame, today_df: pd.DataFrame, threshold: float = 0.05,
+                         historical_odds: np.ndarray = None, verbose: bool = True, memory_budget: int = None) -> List[Dict]:
+    """
+    Bugünkü maçların oranlarını geçmiş maçlarla karşılaştırır.
+    historical_odds verilirse historical_df'in prepare_historical_data ile hazırlandığı kabul edilir
+    ve oran matrisi yeniden oluşturulmaz (toplu analizde günler arasında paylaşılır).
+    memory_budget: tarama çalışma belleği, bayt (varsayılan SCAN_MEMORY_BUDGET)
+    """
+    if historical_odds is None:
+        historical_df = historical_df.reset_index(drop=True)
+        historical_odds = build_odds_matrix(historical_df)
+    today_df = today_df.drop_duplicates(subset=["Ev Sahibi", "Deplasman"])
 
-            for market_type in non_ht_markets:
-                market_outcomes = [col for col in today_match.index if col.startswith(market_type)]
-                if not market_outcomes:
-                    continue
+    if verbose:
+        print(f"\n📊 Seçilen tarihteki maçların sayısı: {len(today_df)}")
+        print(f"📊 Geçmiş maçların sayısı: {len(historical_df)}")
+
+    # Bloklardan gelen sonuçlar biriktirilir; sıra kategori sayısı (azalan), bugünkü maç ve geçmiş maç konumudur
+    results = list(iter_similar_matches(historical_df, historical_odds, today_df, threshold,
+                                        block_rows=scan_block_rows(memory_budget)))
+    results.sort(key=lambda item: (-item[2]["Eşleşen Kategori Sayısı"], item[0], item[1]))
+    return [match_info for _, _, match_info in results]
 
-                market_odds = []
-                valid_outcomes_count = 0
-                total_outcomes_count = 0
-
-                for outcome in market_outcomes:
-                    today_odd = today_match.get(outcome, "-")
-                    hist_odd = hist_match.get(outcome, "-")
-
-                    try:
-                        today_odd = float(today_odd) if today_odd != "-" else None
-                        hist_odd = float(hist_odd) if hist_odd != "-" else None
-
-                        if today_odd is not None and hist_odd is not None:
-                            total_outcomes_count += 1
-                            difference = abs(today_odd - hist_odd)
-
-                            if difference <= threshold:
-                                valid_outcomes_count += 1
-                                outcome_name = outcome.split('_')[-1]
-                                market_odds.append({
-                                    'outcome': outcome_name,
-                                    'today': today_odd,
-                                    'historical': hist_odd,
-                                    'difference': round(difference, 2)
-                                })
-
-                    except ValueError:
+def iter_similar_matches(historical_df: pd.DataFrame, historical_odds: np.ndarray, today_df: pd.DataFrame,
+                         threshold: float = 0.05, block_rows: int = None):
+    """
+    Benzer maçları sıralanmadan, (bugünkü maç konumu, geçmiş maç konumu, sonuç) olarak üretir.
+    Geçmiş block_rows satırlık bloklar halinde taranır (varsayılan: SCAN_MEMORY_BUDGET'a göre); her blok
+    bir kez okunup tüm bugünkü maçlarla karşılaştırılır, çalışma belleği pencere uzunluğuna bağlı değildir.
+    Oran matrisi diskten eşlenmişse sadece taranan bloğun sayfaları okunur.
+    Sıra blok, bugünkü maç, sonra geçmiş maç konumudur; parçalı analizde konumlar birleştirmede kullanılır.
+    """
+    if len(today_df) == 0 or len(historical_df) == 0:
+        return
+
+    today_odds = build_odds_matrix(today_df)
+    today_columns = np.array([column in today_df.columns for column in ODDS_COLUMNS])
+    today_active = (today_df["Status"] == 1).to_numpy()
+    today_home = today_df["Ev Sahibi"].to_numpy()
+    today_away = today_df["Deplasman"].to_numpy()
+    block_rows = block_rows or scan_block_rows()
+
+    for block_start in range(0, len(historical_df), block_rows):
+        block_end = min(block_start + block_rows, len(historical_df))
+        block_df = historical_df.iloc[block_start:block_end]
+        block_odds = historical_odds[block_start:block_end]
+        METRICS.incr("scan_blocks")
+
+        # Bloğun sabit bilgileri (her bugünkü maç için yeniden okunmaz)
+        hist_finished, hist_has_ht = get_history_flags(block_df)
+        hist_home = block_df["Ev Sahibi"].to_numpy()
+        hist_away = block_df["Deplasman"].to_numpy()
+        hist_dates = block_df["Tarih"].to_numpy()
+        hist_leagues = block_df["Lig"].to_numpy() if "Lig" in block_df.columns else np.full(len(block_df), "-", dtype=object)
+        hist_ht_scores = block_df["İlk Yarı Skoru"].to_numpy() if "İlk Yarı Skoru" in block_df.columns else np.full(len(block_df), "-", dtype=object)
+        hist_scores = block_df["Skor"].to_numpy()
+        hist_ids = block_df["id"].to_numpy() if "id" in block_df.columns else np.full(len(block_df), None, dtype=object)
+
+        for today_pos, candidates, market_matches, within_threshold, matched_categories in scan_similar_candidates(
+                block_odds, hist_finished, hist_has_ht, today_odds, today_active, threshold,
+                today_columns=today_columns):
+            today_row = today_odds[today_pos]
+            for candidate, hist_pos in enumerate(candidates):
+                odds_comparison = {}
+                for market_type, (columns, market_ok) in market_matches.items():
+                    if not market_ok[candidate]:
                         continue
+                    odds_comparison[market_type] = [
+                        {
+                            'outcome': ODDS_COLUMNS[col].split('_')[-1],
+                            'today': ticks_to_odds(today_row[col]),
+                            'historical': ticks_to_odds(block_odds[hist_pos, col]),
+                            'difference': ticks_to_odds(abs(int(block_odds[hist_pos, col]) - int(today_row[col])))
+                        }
+                        for col in columns if within_threshold[candidate, col]
+                    ]
 
-                if total_outcomes_count > 0:
-                    if valid_outcomes_count == total_outcomes_count:
-                        odds_comparison[market_type] = market_odds
-                        matched_categories += 1
+                match_info = {
+                    "Bugünkü Maç": f"{today_home[today_pos]} vs {today_away[today_pos]}",
+                    "Benzer Geçmiş Maç": f"{hist_home[hist_pos]} vs {hist_away[hist_pos]}",
+                    "Geçmiş Maç Tarihi": hist_dates[hist_pos],
+                    "Geçmiş Maç Ligi": hist_leagues[hist_pos],
+                    "İlk Yarı Skoru": hist_ht_scores[hist_pos],
+                    "Geçmiş Maç Skoru": hist_scores[hist_pos],
+                    "Geçmiş Maç ID": hist_ids[hist_pos].item() if isinstance(hist_ids[hist_pos], np.generic) else hist_ids[hist_pos],
+                    "Oranlar": odds_comparison,
+                    "Eşleşen Kategori Sayısı": int(matched_categories[candidate])
+                }
+                yield today_pos, block_start + int(hist_pos), match_info
+
+def convert_score_to_result(home: int, away: int) -> str:
+    """Skorları IY/MS formatına çevirir (1, X, 2)"""
+    if home > away:
+        return "1"
+    elif home == away:
+        return "X"
+    else:
+        return "2"
 
-            if hist_match.get("İlk Yarı Skoru", "-") != "- - -":
-                for market_type in ht_required_markets:
-                    market_outcomes = [col for col in today_match.index if col.startswith(market_type)]
-                    if not market_outcomes:
-                        continue
+def parse_score(score_str: str) -> Tuple[int, int]:
+    """Skor string'ini parse eder ve (ev sahibi, deplasman) gollerini döner"""
+    if not isinstance(score_str, str) or score_str == "- - -" or "None" in score_str:
+        return None, None
+    try:
+        parts = score_str.replace(" ", "").split("-")
+        if len(parts) != 2:
+            return None, None
+        home = int(parts[0].strip())
+        away = int(parts[1].strip())
+        return home, away
+    except (ValueError, IndexError):
+        return None, None
 
-                    market_odds = []
-                    valid_outcomes_count = 0
-                    total_outcomes_count = 0
+def get_realized_outcomes(score: str, ht_score: str) -> int:
+    """
+    Maç skorlarına göre gerçekleşen seçeneklerin bit maskesini döndürür (bit i -> ODDS_COLUMNS[i]).
+    Tam skor yoksa hiçbir seçenek, ilk yarı skoru yoksa ilk yarı marketleri gerçekleşmiş sayılmaz.
+    """
+    home, away = parse_score(score)
+    if home is None or away is None:
+        return 0
+
+    total_goals = home + away
+    if total_goals <= 1:
+        total_goals_outcome = "0-1"
+    elif total_goals <= 3:
+        total_goals_outcome = "2-3"
+    elif total_goals <= 5:
+        total_goals_outcome = "4-5"
+    else:
+        total_goals_outcome = "6+"
+
+    realized = [
+        f"Maç Sonucu_{convert_score_to_result(home, away)}",
+        "Karşılıklı Gol_Var" if home > 0 and away > 0 else "Karşılıklı Gol_Yok",
+        "A/U 2.5_Üst" if total_goals > 2.5 else "A/U 2.5_Alt",
+        f"Toplam Gol_{total_goals_outcome}",
+        "EV 1.5_Üst" if home > 1.5 else "EV 1.5_Alt",
+        "DEP 1.5_Üst" if away > 1.5 else "DEP 1.5_Alt"
+    ]
+
+    ht_home, ht_away = parse_score(ht_score)
+    if ht_home is not None and ht_away is not None:
+        ht_result = convert_score_to_result(ht_home, ht_away)
+        realized += [
+            f"İlk Yarı_{ht_result}",
+            "IY 1.5_Üst" if ht_home + ht_away > 1.5 else "IY 1.5_Alt",
+            f"IY/MS_{ht_result}/{convert_score_to_result(home, away)}"
+        ]
+
+    mask = 0
+    for column in realized:
+        mask |= 1 << ODDS_COLUMN_INDEX[column]
+    return mask
+
+def build_settlement_masks(df: pd.DataFrame) -> np.ndarray:
+    """Her geçmiş maç için gerçekleşen seçenek bit maskesini (uint32) hesaplar"""
+    if df.empty or "Skor" not in df.columns:
+        return np.zeros(len(df), dtype=np.uint32)
+    ht_scores = df["İlk Yarı Skoru"] if "İlk Yarı Skoru" in df.columns else ["- - -"] * len(df)
+    return np.array([get_realized_outcomes(score, ht_score) for score, ht_score in zip(df["Skor"], ht_scores)], dtype=np.uint32)
+
+# Bit maskesinde maç sonucu (tam skor var) ve ilk yarı (ilk yarı skoru var) seçeneklerinin bitleri
+FULL_TIME_MASK = sum(1 << ODDS_COLUMN_INDEX[f"Maç Sonucu_{outcome}"] for outcome in MARKET_OUTCOMES["Maç Sonucu"])
+HALF_TIME_MASK = sum(1 << ODDS_COLUMN_INDEX[f"İlk Yarı_{outcome}"] for outcome in MARKET_OUTCOMES["İlk Yarı"])
+HT_COLUMN_POSITIONS = [ODDS_COLUMN_INDEX[f"{market}_{outcome}"] for market in HT_REQUIRED_MARKETS for outcome in MARKET_OUTCOMES[market]]
+
+class SparseCubeCells:
+    """
+    Bir ligin (gün, seçenek, kova) hücre sayıları; sadece dokunulan hücreler saklanır.
+    Hücre anahtarı gün * hücre sayısı + seçenek * kova sayısı + kova olarak sıralı tutulur, böylece bir gün
+    aralığı anahtar dizisinde ardışık bir dilimdir. Yeni katkılar bekleyen listeye eklenir ve sıralı kısımla
+    toplu birleştirilir; sıfıra inen hücreler birleştirmede atılır.
+    """
 
-                    for outcome in market_outcomes:
-                        today_odd = today_match.get(outcome, "-")
-                        hist_odd = hist_match.get(outcome, "-")
+    def __init__(self, n_cells: int):
+        self.n_cells = n_cells
+        self.keys = np.zeros(0, dtype=np.int64)
+        self.totals = np.zeros(0, dtype=np.int32)
+        self.realized = np.zeros(0, dtype=np.int32)
+        self._pending = []
+        self._pending_size = 0
+
+    def add(self, keys: np.ndarray, totals: np.ndarray, realized: np.ndarray):
+        self._pending.append((keys, totals, realized))
+        self._pending_size += len(keys)
+        if self._pending_size > max(4096, len(self.keys)):
+            self._merge()
+
+    def _merge(self):
+        if not self._pending:
+            return
+        keys, inverse = np.unique(np.concatenate([self.keys] + [part[0] for part in self._pending]), return_inverse=True)
+        totals = np.zeros(len(keys), dtype=np.int64)
+        realized = np.zeros(len(keys), dtype=np.int64)
+        np.add.at(totals, inverse, np.concatenate([self.totals] + [part[1] for part in self._pending]))
+        np.add.at(realized, inverse, np.concatenate([self.realized] + [part[2] for part in self._pending]))
+        kept = (totals != 0) | (realized != 0)
+        self.keys, self.totals, self.realized = keys[kept], totals[kept].astype(np.int32), realized[kept].astype(np.int32)
+        self._pending = []
+        self._pending_size = 0
+
+    def window(self, start_day: int, end_day: int) -> Tuple[np.ndarray, np.ndarray]:
+        """[start_day, end_day] gün aralığının hücre bazında toplam ve gerçekleşen sayıları"""
+        self._merge()
+        lo = np.searchsorted(self.keys, start_day * self.n_cells, side="left")
+        hi = np.searchsorted(self.keys, (end_day + 1) * self.n_cells, side="left")
+        cells = self.keys[lo:hi] % self.n_cells
+        return (np.bincount(cells, weights=self.totals[lo:hi], minlength=self.n_cells).astype(np.int64),
+                np.bincount(cells, weights=self.realized[lo:hi], minlength=self.n_cells).astype(np.int64))
+
+    @property
+    def nbytes(self) -> int:
+        return (self.keys.nbytes + self.totals.nbytes + self.realized.nbytes
+                + sum(array.nbytes for part in self._pending for array in part))
+
+class OutcomeCube:
+    """
+    Seçenek gerçekleşme sayılarının gün x seçenek x oran kovası küpü (by_league ile lig bazında da).
+    Satırlar eklendikçe/güncellendikçe artımlı tutulur. Tüm ligler için günler yoğun dizilerdir ve pencere
+    toplamları gün ekseninde önek toplamlarıyla pencere uzunluğundan bağımsız sürede bulunur. Lig kırılımı
+    seyrek tutulur (SparseCubeCells): bir ligin sadece maçı olan günlerinin dokunulan hücreleri saklanır,
+    pencere toplamı o ligin penceredeki hücreleri üzerinden hesaplanır. Benzerlik tek seçenek oranı
+    üzerinden kova komşuluğuyla ölçülür (market bazlı tam eşleşme listesi için find_similar_matches taraması gerekir).
+    """
 
-                        try:
-                            today_odd = float(today_odd) if today_odd != "-" else None
-                            hist_odd = float(hist_odd) if hist_odd != "-" else None
-
-                            if today_odd is not None and hist_odd is not None:
-                                total_outcomes_count += 1
-                                difference = abs(today_odd - hist_odd)
-
-                                if difference <= threshold:
-                                    valid_outcomes_count += 1
-                                    outcome_name = outcome.split('_')[-1]
-                                    market_odds.append({
-                                        'outcome': outcome_name,
-                                        'today': today_odd,
-                                        'historical': hist_odd,
-                                        'difference': round(difference, 2)
-                                    })
-
-                        except ValueError:
-                            continue
-
-                    if total_outcomes_count > 0:
-                        if market_type == "IY/MS":
-                            if valid_outcomes_count >= min_flexible_matches:
-                                odds_comparison[market_type] = market_odds
-                                matched_categories += 1
-                        else:
-                            if valid_outcomes_count == total_outcomes_count:
-                                odds_comparison[market_type] = market_odds
-                                matched_categories += 1
-
-            if matched_categories >= min_categories and odds_comparison:
-                match_info = {
-                    "Bugünkü Maç": f"{today_match['Ev Sahibi']} vs {today_match['Deplasman']}",
-                    "Benzer Geçmiş Maç": f"{hist_match['Ev Sahibi']} vs {hist_match['Deplasman']}",
-                    "Geçmiş Maç Tarihi": hist_match["Tarih"],
-                    "Geçmiş Maç Ligi": hist_match.get("Lig", "-"),
-                    "İlk Yarı Skoru": hist_match.get("İlk Yarı Skoru", "-"),
-                    "Geçmiş Maç Skoru": hist_match["Skor"],
-                    "Oranlar": odds_comparison,
-                    "Eşleşen Kategori Sayısı": matched_categories
+    def __init__(self, bucket_ticks: int = 5, max_ticks: int = 2000, by_league: bool = False):
+        self.bucket_ticks = bucket_ticks
+        self.n_buckets = max_ticks // bucket_ticks + 1  # Son kova üst sınırı aşan oranları toplar
+        self.by_league = by_league
+        self._cells = {}     # gün -> (toplam, gerçekleşen), tüm ligler
+        self._leagues = {}   # lig kodu -> SparseCubeCells
+        self._prefix = None  # (sıralı günler, toplam önek, gerçekleşen önek), sadece tüm ligler için
+        self._lock = threading.Lock()
+
+    def _contributions(self, odds: np.ndarray, settlement: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Satırların sayılan ve gerçekleşen hücre maskeleri ile kovaları; skoru olmayan maçlar sayılmaz"""
+        settlement = settlement.astype(np.int64)
+        settled = (settlement & FULL_TIME_MASK) != 0
+        counted = (odds != ODDS_MISSING) & settled[:, None]
+        counted[:, HT_COLUMN_POSITIONS] &= ((settlement & HALF_TIME_MASK) != 0)[:, None]
+        realized = counted & (((settlement[:, None] >> np.arange(len(ODDS_COLUMNS))) & 1) == 1)
+        buckets = np.minimum(odds // self.bucket_ticks, self.n_buckets - 1)
+        return counted, realized, buckets
+
+    def apply(self, days: np.ndarray, leagues: np.ndarray, odds: np.ndarray, settlement: np.ndarray, sign: int = 1):
+        """Satırların katkısını ekler (sign=1) veya çıkarır (sign=-1)"""
+        if len(days) == 0:
+            return
+        counted, realized, buckets = self._contributions(odds, settlement)
+        with self._lock:
+            self._accumulate(days, counted, realized, buckets, sign)
+            if self.by_league:
+                self._accumulate_leagues(days, leagues, counted, realized, buckets, sign)
+
+    def add_leagues(self, days: np.ndarray, leagues: np.ndarray, odds: np.ndarray, settlement: np.ndarray):
+        """Lig kırılımını mevcut satırlarla doldurur; sonraki apply çağrıları onu da günceller"""
+        counted, realized, buckets = self._contributions(odds, settlement)
+        with self._lock:
+            if not self.by_league:
+                self._accumulate_leagues(days, leagues, counted, realized, buckets, 1)
+                self.by_league = True
+
+    def _accumulate(self, days: np.ndarray, counted: np.ndarray, realized: np.ndarray, buckets: np.ndarray, sign: int):
+        cells = self._cells
+        order = np.argsort(days, kind="stable")
+        sorted_days = days[order]
+        starts = np.flatnonzero(np.r_[True, sorted_days[1:] != sorted_days[:-1]])
+        ends = np.r_[starts[1:], len(order)]
+        for start, end in zip(starts, ends):
+            day = int(sorted_days[start])
+            if day not in cells:
+                cells[day] = (np.zeros((len(ODDS_COLUMNS), self.n_buckets), dtype=np.int32),
+                              np.zeros((len(ODDS_COLUMNS), self.n_buckets), dtype=np.int32))
+            totals, realized_cells = cells[day]
+            rows = order[start:end]
+            row_buckets = buckets[rows]
+            hit_rows, hit_cols = np.nonzero(counted[rows])
+            np.add.at(totals, (hit_cols, row_buckets[hit_rows, hit_cols]), sign)
+            hit_rows, hit_cols = np.nonzero(realized[rows])
+            np.add.at(realized_cells, (hit_cols, row_buckets[hit_rows, hit_cols]), sign)
+        self._prefix = None
+
+    def _accumulate_leagues(self, days: np.ndarray, leagues: np.ndarray, counted: np.ndarray, realized: np.ndarray,
+                            buckets: np.ndarray, sign: int):
+        n_cells = len(ODDS_COLUMNS) * self.n_buckets
+        rows, cols = np.nonzero(counted)
+        keys = days[rows].astype(np.int64) * n_cells + cols * self.n_buckets + buckets[rows, cols]
+        hits = np.where(realized[rows, cols], sign, 0).astype(np.int32)
+        row_leagues = leagues[rows]
+        order = np.argsort(row_leagues, kind="stable")
+        sorted_leagues = row_leagues[order]
+        starts = np.flatnonzero(np.r_[True, sorted_leagues[1:] != sorted_leagues[:-1]]) if len(order) else []
+        ends = np.r_[starts[1:], len(order)] if len(order) else []
+        for start, end in zip(starts, ends):
+            league = int(sorted_leagues[start])
+            if league not in self._leagues:
+                self._leagues[league] = SparseCubeCells(n_cells)
+            part = order[start:end]
+            self._leagues[league].add(keys[part], np.full(len(part), sign, dtype=np.int32), hits[part])
+
+    def _prefix_for(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        with self._lock:
+            if self._prefix is None:
+                days = np.array(sorted(self._cells), dtype=np.int64)
+                shape = (len(days) + 1, len(ODDS_COLUMNS), self.n_buckets)
+                totals = np.zeros(shape, dtype=np.int32)
+                realized = np.zeros(shape, dtype=np.int32)
+                for pos, day in enumerate(days):
+                    totals[pos + 1], realized[pos + 1] = self._cells[int(day)]
+                self._prefix = (days, np.cumsum(totals, axis=0, out=totals), np.cumsum(realized, axis=0, out=realized))
+            return self._prefix
+
+    def window_counts(self, start_date: str, end_date: str, league: int = None) -> Tuple[np.ndarray, np.ndarray]:
+        """[start_date, end_date] penceresinin seçenek x kova toplam ve gerçekleşen sayıları"""
+        if league is not None and not self.by_league:
+            raise ValueError("Lig bazında sorgu için küp by_league=True ile oluşturulmalı")
+        start_day = int(np.datetime64(start_date, "D").astype(np.int64))
+        end_day = int(np.datetime64(end_date, "D").astype(np.int64))
+        if league is not None:
+            shape = (len(ODDS_COLUMNS), self.n_buckets)
+            with self._lock:
+                cells = self._leagues.get(league)
+                if cells is None:
+                    return np.zeros(shape, dtype=np.int64), np.zeros(shape, dtype=np.int64)
+                totals, realized = cells.window(start_day, end_day)
+            return totals.reshape(shape), realized.reshape(shape)
+        days, totals, realized = self._prefix_for()
+        start = np.searchsorted(days, start_day, side="left")
+        end = max(start, np.searchsorted(days, end_day, side="right"))
+        return totals[end] - totals[start], realized[end] - realized[start]
+
+    @property
+    def nbytes(self) -> int:
+        """Küpün hücre ve önek dizilerinin bellekteki boyutu"""
+        with self._lock:
+            total = sum(totals.nbytes + realized.nbytes for totals, realized in self._cells.values())
+            total += sum(cells.nbytes for cells in self._leagues.values())
+            if self._prefix is not None:
+                total += sum(array.nbytes for array in self._prefix)
+            return total
+
+    def summarize(self, odds_row: np.ndarray, start_date: str, end_date: str, threshold: float = 0.05,
+                  league: int = None) -> Dict[str, Dict[str, Dict]]:
+        """
+        Bugünkü maçın her seçeneği için, pencerede aynı seçeneğin oranı eşik komşuluğundaki kovalara düşen
+        maçların sayısını ve seçeneğin gerçekleşme oranını döndürür (summarize_outcomes ile aynı biçim)
+        """
+        totals, realized = self.window_counts(start_date, end_date, league)
+        threshold_ticks = threshold_to_ticks(threshold)
+        stats = {}
+        for market_type, outcomes in MARKET_OUTCOMES.items():
+            for outcome in outcomes:
+                col = ODDS_COLUMN_INDEX[f"{market_type}_{outcome}"]
+                ticks = int(odds_row[col])
+                if ticks == ODDS_MISSING:
+                    continue
+                low = max(ticks - threshold_ticks, 1) // self.bucket_ticks
+                high = min((ticks + threshold_ticks) // self.bucket_ticks, self.n_buckets - 1)
+                total = int(totals[col, low:high + 1].sum())
+                realized_count = int(realized[col, low:high + 1].sum())
+                stats.setdefault(market_type, {})[outcome] = {
+                    "odds": ticks_to_odds(ticks),
+                    "total": total,
+                    "realized": realized_count,
+                    "rate": round(realized_count / total * 100, 1) if total else None
                 }
-                similar_matches.append(match_info)
+        return stats
 
-    similar_matches.sort(key=lambda x: x["Eşleşen Kategori Sayısı"], reverse=True)
-    return similar_matches
+@METRICS.timed("cube.summary")
+def summarize_with_cube(cube: OutcomeCube, today_df: pd.DataFrame, start_date: str, end_date: str,
+                        threshold: float = 0.05, dictionary: StringDictionary = None) -> List[Dict]:
+    """
+    Bugünkü maçlar için pencere özetini küpten üretir (geçmiş maçlar tek tek taranmaz).
+    dictionary verilirse ve küp lig bazındaysa her maç kendi liginin geçmişiyle özetlenir.
+    """
+    if today_df.empty:
+        return []
+    today_odds = build_odds_matrix(today_df)
+    summaries = []
+    for today_pos, (_, today_match) in enumerate(today_df.iterrows()):
+        if today_match.get("Status") != 1:
+            continue
+        league = None
+        if dictionary is not None and cube.by_league:
+            league = dictionary.codes["Lig"].get(today_match.get("Lig"), -1)
+        summaries.append({
+            "match": f"{today_match['Ev Sahibi']} vs {today_match['Deplasman']}",
+            "league": today_match.get("Lig"),
+            "by_league": league is not None,
+            "outcomes": cube.summarize(today_odds[today_pos], start_date, end_date, threshold, league)
+        })
+    return summaries
+
+class TodayMatchIndex:
+    """
+    Bugünkü maç satırlarına "Ev vs Deplasman" etiketiyle O(1) erişim.
+    Rapor yazılırken her analiz edilen maç için bugünkü DataFrame yeniden filtrelenmez.
+    """
 
-def save_results_to_file(similar_matches: List[Dict], base_path: str, is_single_match: bool, selected_teams: str = None, today_df: pd.DataFrame = None):
-    def convert_score_to_result(home: int, away: int) -> str:
-        """Skorları IY/MS formatına çevirir (1, X, 2)"""
-        if home > away:
-            return "1"
-        elif home == away:
-            return "X"
-        else:
-            return "2"
+    def __init__(self, today_df: pd.DataFrame = None):
+        self.by_label = {}
+        if today_df is None or today_df.empty:
+            return
+        for row in today_df.to_dict("records"):
+            label = f"{row.get('Ev Sahibi')} vs {row.get('Deplasman')}"
+            # Aynı takımlar birden fazla satırdaysa ilk satır kullanılır
+            self.by_label.setdefault(label, row)
+
+    def get(self, label: str) -> Dict:
+        if len(label.split(" vs ")) != 2:
+            return None
+        return self.by_label.get(label)
+
+# Raporda gösterilen bugünkü maç oranları (market, seçenekler)
+REPORT_TODAY_ODDS = [
+    ("Maç Sonucu", ["1", "X", "2"]),
+    ("İlk Yarı", ["1", "X", "2"]),
+    ("EV 1.5", ["Alt", "Üst"]),
+    ("DEP 1.5", ["Alt", "Üst"])
+]
+
+# Rapor satır şablonları
+REPORT_RULE_50 = "─" * 50 + "\n"
+REPORT_RULE_40 = "─" * 40 + "\n"
+REPORT_ODDS_HEADER = "{:<10} {:>10} {:>10} {:>10}\n".format("Seçenek", "Bugün", "Geçmiş", "Fark")
+REPORT_ODDS_ROW = "{:<10} {:>10.2f} {:>10.2f} {:>10.2f}\n".format
+
+# Aynı skor çiftleri raporlarda çok kez geçer; bit maskesi bir kez hesaplanır
+cached_realized_outcomes = functools.lru_cache(maxsize=4096)(get_realized_outcomes)
+
+@functools.lru_cache(maxsize=4096)
+def format_report_date(raw_date: Any) -> str:
+    """Geçmiş maç tarihini raporda gösterilecek biçime çevirir (2025-01-31 -> 31.01.2025)"""
+    if raw_date == "-":
+        return "-"
+    try:
+        return datetime.strptime(raw_date, "%Y-%m-%d").strftime("%d.%m.%Y")
+    except (TypeError, ValueError):
+        return raw_date
 
-    def parse_score(score_str: str) -> Tuple[int, int]:
-        """Skor string'ini parse eder ve (ev sahibi, deplasman) gollerini döner"""
-        if not score_str or score_str == "- - -" or "None" in score_str:
-            return None, None
-        try:
-            parts = score_str.replace(" ", "").split("-")
-            if len(parts) != 2:
-                return None, None
-            home = int(parts[0].strip())
-            away = int(parts[1].strip())
-            return home, away
-        except (ValueError, IndexError):
-            return None, None
+def is_missing_value(value: Any) -> bool:
+    return value is None or value != value
+
+def count_report_outcomes(matches: List[Dict]) -> Tuple[Dict[str, int], Dict[str, Dict[str, Dict]]]:
+    """
+    Benzer maçlarda market başına eşleşme sayısı ve seçenek başına toplam/gerçekleşen sayıları.
+    Dönüş: ({market: eşleşen maç sayısı}, {market: {seçenek: {"total", "realized"}}}), ilk görülme sırasıyla
+    """
+    market_totals = {}
+    outcome_stats = {}
+    for match in matches:
+        realized_mask = cached_realized_outcomes(match.get('Geçmiş Maç Skoru', '- - -'), match.get('İlk Yarı Skoru', '- - -'))
+        for market_type, odds in match.get('Oranlar', {}).items():
+            market_totals[market_type] = market_totals.get(market_type, 0) + 1
+            market_outcomes = outcome_stats.setdefault(market_type, {})
+            for odd in odds:
+                stat = market_outcomes.setdefault(odd['outcome'], {'total': 0, 'realized': 0})
+                stat['total'] += 1
+                if realized_mask >> ODDS_COLUMN_INDEX[f"{market_type}_{odd['outcome']}"] & 1:
+                    stat['realized'] += 1
+    return market_totals, outcome_stats
+
+def render_match_report(today_match: str, matches: List[Dict], today_row: Dict = None) -> str:
+    """Bir bugünkü maçın metin raporunu tek bir metin olarak üretir (dosyaya tek seferde yazılır)"""
+    out = [REPORT_RULE_50, f"🏟️ Analiz Edilen Maç: {today_match}\n", REPORT_RULE_50]
+
+    # Bugünkü maçın oranları
+    if today_row is not None:
+        out.append("\n📊 Bugünkü Maçın Oranları:\n")
+        out.append(REPORT_RULE_40)
+        for market_type, outcomes in REPORT_TODAY_ODDS:
+            out.append(f"📌 {market_type}\n")
+            for outcome in outcomes:
+                out.append(f"{outcome}  {format_odds(today_row.get(f'{market_type}_{outcome}'))}\n")
+            out.append("\n")
+        out.append(REPORT_RULE_40)
+
+    # İstatistikler (marketler eşleşme sayısına, seçenekler gerçekleşme yüzdesine göre sıralı)
+    market_totals, outcome_stats = count_report_outcomes(matches)
+    out.append(f"\n📊 Bulunan Benzer Oranlı Maç Sayısı: {len(matches)}\n\n")
+    for market_type, total in sorted(market_totals.items(), key=lambda x: x[1], reverse=True):
+        out.append(f"\n📈 {market_type} İstatistikleri:\n")
+        out.append(REPORT_RULE_50)
+        out.append(f"Toplam Eşleşme: {total} maç\n")
+        outcomes = [(outcome, stat, stat['realized'] / stat['total'] * 100)
+                    for outcome, stat in outcome_stats[market_type].items() if stat['total'] > 0]
+        for outcome, stat, percentage in sorted(outcomes, key=lambda x: x[2], reverse=True):
+            out.append(f"{outcome}: {stat['realized']}/{stat['total']} (%{percentage:.1f})\n")
+        out.append("\n")
+
+    # Geçmiş maçların detayları
+    out.append("\n📋 Geçmiş Maçların Detayları\n")
+    out.append(REPORT_RULE_50)
+    for match in matches:
+        out.append(f"\n🔄 Geçmiş Maç: {match.get('Benzer Geçmiş Maç', '-')}\n"
+                   f"🏆 Lig: {match.get('Geçmiş Maç Ligi', '-')}\n"
+                   f"📅 Tarih: {format_report_date(match.get('Geçmiş Maç Tarihi', '-'))}\n"
+                   f"📊 Skor: {match.get('Geçmiş Maç Skoru', '-')}\n"
+                   f"⚽ İlk Yarı: {match.get('İlk Yarı Skoru', '-')}\n\n")
+        for market_type, odds in match.get('Oranlar', {}).items():
+            if odds:
+                out.append(f"📈 {market_type} Oranları:\n")
+                out.append(REPORT_ODDS_HEADER)
+                out.append(REPORT_RULE_40)
+                for odd in odds:
+                    if not is_missing_value(odd['today']) and not is_missing_value(odd['historical']):
+                        out.append(REPORT_ODDS_ROW(odd['outcome'], odd['today'], odd['historical'], odd['difference']))
+                out.append("\n")
+        out.append(REPORT_RULE_50)
+    return "".join(out)
+
+def group_by_today_match(similar_matches: List[Dict]) -> Dict[str, List[Dict]]:
+    """Benzer maçları bugünkü maça göre gruplar (ilk görülme sırası korunur)"""
+    grouped = {}
+    for match in similar_matches:
+        grouped.setdefault(match.get('Bugünkü Maç'), []).append(match)
+    return grouped
+
+def render_match_json(today_match: str, matches: List[Dict], today_row: Dict = None) -> Dict:
+    """Bir bugünkü maçın raporunu makine tarafından okunabilir sözlük olarak üretir"""
+    today_odds = {}
+    if today_row is not None:
+        for column in ODDS_COLUMNS:
+            ticks = odds_to_ticks(today_row.get(column))
+            if ticks != ODDS_MISSING:
+                today_odds[column] = ticks_to_odds(ticks)
+    market_totals, outcome_stats = count_report_outcomes(matches)
+    for market_outcomes in outcome_stats.values():
+        for stat in market_outcomes.values():
+            stat['rate'] = round(stat['realized'] / stat['total'] * 100, 1) if stat['total'] else None
+    return {
+        "match": today_match,
+        "match_id": today_row.get("id") if today_row is not None else None,
+        "today_odds": today_odds,
+        "similar_count": len(matches),
+        "market_totals": market_totals,
+        "stats": outcome_stats,
+        "similar_matches": matches
+    }
 
+# CSV raporunda benzer maç başına her eşleşen seçenek bir satırdır
+REPORT_CSV_COLUMNS = ["Bugünkü Maç", "Geçmiş Maç ID", "Benzer Geçmiş Maç", "Geçmiş Maç Ligi", "Geçmiş Maç Tarihi",
+                      "Geçmiş Maç Skoru", "İlk Yarı Skoru", "Eşleşen Kategori Sayısı", "Market", "Seçenek",
+                      "Bugün", "Geçmiş", "Fark"]
+
+def render_csv_rows(similar_matches: List[Dict]) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(REPORT_CSV_COLUMNS)
+    for match in similar_matches:
+        fixed = [match.get(column) for column in REPORT_CSV_COLUMNS[:8]]
+        for market_type, odds in match.get('Oranlar', {}).items():
+            for odd in odds:
+                writer.writerow(fixed + [market_type, odd['outcome'], odd['today'], odd['historical'], odd['difference']])
+    return buffer.getvalue()
+
+def report_file_path(base_path: str, filename: str) -> str:
+    # Dosya adındaki özel karakterleri temizle
+    return os.path.join(base_path, filename.replace(':', '.').replace('/', '_').replace('\\', '_'))
+
+def write_report_file(filepath: str, content: str, newline: str = None) -> str:
+    """Raporu tek bir yazma ile kaydeder"""
+    with open(filepath, 'w', encoding='utf-8', newline=newline) as f:
+        f.write(content)
+    METRICS.incr("bytes_written", len(content.encode('utf-8')))
+    return filepath
+
+@METRICS.timed("report.write_text")
+def save_results_to_file(similar_matches: List[Dict], base_path: str, is_single_match: bool, selected_teams: str = None, today_df: pd.DataFrame = None, filename: str = None, add_timestamp: bool = True):
     try:
         if not os.path.exists(base_path):
             os.makedirs(base_path)
@@ -844,7 +3007,9 @@ def save_results_to_file(similar_matches: List[Dict], base_path: str, is_single_
         current_datetime = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
         
         # Dosya adını belirle
-        if is_single_match and selected_teams:
+        if filename:
+            filename = f"{filename}_{current_datetime}.txt" if add_timestamp else f"{filename}.txt"
+        elif is_single_match and selected_teams:
             teams = selected_teams.replace(' vs ', '_').replace(' ', '_')
             filename = f"Analiz_{teams}_{current_datetime}.txt"
         elif selected_teams and selected_teams.startswith('Lig_'):
@@ -853,280 +3018,928 @@ def save_results_to_file(similar_matches: List[Dict], base_path: str, is_single_
         else:
             match_count = len(set(match.get('Bugünkü Maç') for match in similar_matches))
             filename = f"Coklu_Analiz_{match_count}mac_{current_datetime}.txt"
+        filepath = report_file_path(base_path, filename)
+
+        # Bugünkü maç satırları etiket indeksinden alınır, rapor bellekte üretilip tek seferde yazılır
+        today_index = TodayMatchIndex(today_df) if today_df is not None else None
+        content = "".join(
+            render_match_report(today_match, matches, today_index.get(today_match) if today_index is not None else None)
+            for today_match, matches in group_by_today_match(similar_matches).items()
+        )
+        write_report_file(filepath, content)
+        print(f"\n✅ Sonuçlar kaydedildi: {filepath}")
 
-        # Dosya adındaki özel karakterleri temizle
-        filename = filename.replace(':', '.').replace('/', '_').replace('\\', '_')
-        filepath = os.path.join(base_path, filename)
+    except Exception as e:
+        print(f"\n❌ Dosya kaydetme hatası: {str(e)}")
 
-        with open(filepath, 'w', encoding='utf-8') as f:
-            today_matches = {}
-            # Maçları grupla
-            for match in similar_matches:
-                today_match = match.get('Bugünkü Maç')
-                if today_match not in today_matches:
-                    today_matches[today_match] = []
-                today_matches[today_match].append(match)
-
-            # Her maç için analiz
-            for today_match, matches in today_matches.items():
-                f.write("─" * 50 + "\n")
-                f.write(f"🏟️ Analiz Edilen Maç: {today_match}\n")
-                f.write("─" * 50 + "\n")
-                
-                # Bugünkü maçın oranlarını göster
-                if today_df is not None:
-                    # Ev sahibi ve deplasman takım isimlerini ayıkla
-                    teams = today_match.split(' vs ')
-                    if len(teams) == 2:
-                        home_team, away_team = teams
-                        match_rows = today_df[(today_df['Ev Sahibi'] == home_team) & (today_df['Deplasman'] == away_team)]
-                        
-                        if not match_rows.empty:
-                            match_row = match_rows.iloc[0]
-                            f.write("\n📊 Bugünkü Maçın Oranları:\n")
-                            f.write("─" * 40 + "\n")
-                            
-                            # Maç Sonucu oranlarını göster
-                            ms_1 = match_row.get('Maç Sonucu_1', '-')
-                            ms_x = match_row.get('Maç Sonucu_X', '-')
-                            ms_2 = match_row.get('Maç Sonucu_2', '-')
-                            
-                            f.write("📌 Maç Sonucu\n")
-                            f.write(f"1  {ms_1}\n")
-                            f.write(f"X  {ms_x}\n")
-                            f.write(f"2  {ms_2}\n")
-                            f.write("\n")
-                            
-                            # İlk Yarı oranlarını göster
-                            iy_1 = match_row.get('İlk Yarı_1', '-')
-                            iy_x = match_row.get('İlk Yarı_X', '-')
-                            iy_2 = match_row.get('İlk Yarı_2', '-')
-                            
-                            f.write("📌 İlk Yarı\n")
-                            f.write(f"1  {iy_1}\n")
-                            f.write(f"X  {iy_x}\n")
-                            f.write(f"2  {iy_2}\n")
-                            f.write("\n")
-                            
-                            # EV 1.5 ve DEP 1.5 oranlarını göster
-                            ev_alt = match_row.get('EV 1.5_Alt', '-')
-                            ev_ust = match_row.get('EV 1.5_Üst', '-')
-                            
-                            f.write("📌 EV 1.5\n")
-                            f.write(f"Alt  {ev_alt}\n")
-                            f.write(f"Üst  {ev_ust}\n")
-                            f.write("\n")
-                            
-                            dep_alt = match_row.get('DEP 1.5_Alt', '-')
-                            dep_ust = match_row.get('DEP 1.5_Üst', '-')
-                            
-                            f.write("📌 DEP 1.5\n")
-                            f.write(f"Alt  {dep_alt}\n")
-                            f.write(f"Üst  {dep_ust}\n")
-                            f.write("\n")
-                            
-                            f.write("─" * 40 + "\n")
+@METRICS.timed("report.write_json")
+def save_results_to_json(similar_matches: List[Dict], base_path: str, filename: str) -> str:
+    """Benzer maç sonuçlarını makine tarafından okunabilir JSON dosyasına yazar"""
+    try:
+        if not os.path.exists(base_path):
+            os.makedirs(base_path)
 
-                # Bulunan benzer maçların sayısını yaz
-                market_stats = {}
-                outcome_stats = {}
-                total_matches = len(matches)
+        current_datetime = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        filepath = report_file_path(base_path, f"{filename}_{current_datetime}.json")
+        write_report_file(filepath, json.dumps({"generated_at": current_datetime, "matches": similar_matches},
+                                               ensure_ascii=False, indent=4, default=str))
+        print(f"\n✅ Sonuçlar kaydedildi: {filepath}")
+        return filepath
+    except Exception as e:
+        print(f"\n❌ Dosya kaydetme hatası: {str(e)}")
+        return None
 
-                for match in matches:
-                    match_score = match.get('Geçmiş Maç Skoru', '- - -')
-                    match_ht_score = match.get('İlk Yarı Skoru', '- - -')
-                    
-                    for market_type, odds in match.get('Oranlar', {}).items():
-                        if market_type not in market_stats:
-                            market_stats[market_type] = {'total': 0}
-                            outcome_stats[market_type] = {}
-
-                        market_stats[market_type]['total'] += 1
-
-                        for odd in odds:
-                            outcome = odd['outcome']
-                            if outcome not in outcome_stats[market_type]:
-                                outcome_stats[market_type][outcome] = {
-                                    'total': 0,
-                                    'realized': 0
-                                }
-                            outcome_stats[market_type][outcome]['total'] += 1
-
-                            try:
-                                # Skorları parse et
-                                home_goals, away_goals = parse_score(match_score)
-                                ht_home, ht_away = parse_score(match_ht_score)
-
-                                # Eğer tam skor geçersizse devam et
-                                if home_goals is None or away_goals is None:
-                                    continue
-
-                                total_goals = home_goals + away_goals
-
-                                # Market tipine göre işle
-                                if market_type in ["İlk Yarı", "IY 1.5", "IY/MS"]:
-                                    if ht_home is None or ht_away is None:
-                                        continue
-                                    ht_total_goals = ht_home + ht_away
-
-                                    if market_type == "İlk Yarı":
-                                        ht_result = convert_score_to_result(ht_home, ht_away)
-                                        if outcome == ht_result:
-                                            outcome_stats[market_type][outcome]['realized'] += 1
-
-                                    elif market_type == "IY 1.5":
-                                        if (outcome == "Üst" and ht_total_goals > 1.5) or \
-                                           (outcome == "Alt" and ht_total_goals < 1.5):
-                                            outcome_stats[market_type][outcome]['realized'] += 1
-
-                                    elif market_type == "IY/MS":
-                                        ht_result = convert_score_to_result(ht_home, ht_away)
-                                        ft_result = convert_score_to_result(home_goals, away_goals)
-                                        actual_result = f"{ht_result}/{ft_result}"
-                                        if actual_result == outcome:
-                                            outcome_stats[market_type][outcome]['realized'] += 1
-
-                                else:  # İlk yarı skoru gerektirmeyen marketler
-                                    if market_type == "Karşılıklı Gol":
-                                        both_scored = home_goals > 0 and away_goals > 0
-                                        if (outcome == "Var" and both_scored) or \
-                                           (outcome == "Yok" and not both_scored):
-                                            outcome_stats[market_type][outcome]['realized'] += 1
-
-                                    elif market_type == "A/U 2.5":
-                                        if (outcome == "Üst" and total_goals > 2.5) or \
-                                           (outcome == "Alt" and total_goals < 2.5):
-                                            outcome_stats[market_type][outcome]['realized'] += 1
-
-                                    elif market_type == "Toplam Gol":
-                                        if (outcome == "0-1" and total_goals <= 1) or \
-                                           (outcome == "2-3" and (total_goals == 2 or total_goals == 3)) or \
-                                           (outcome == "4-5" and (total_goals == 4 or total_goals == 5)) or \
-                                           (outcome == "6+" and total_goals >= 6):
-                                            outcome_stats[market_type][outcome]['realized'] += 1
-
-                                    elif market_type == "EV 1.5":
-                                        if (outcome == "Üst" and home_goals > 1.5) or \
-                                           (outcome == "Alt" and home_goals < 1.5):
-                                            outcome_stats[market_type][outcome]['realized'] += 1
-
-                                    elif market_type == "DEP 1.5":
-                                        if (outcome == "Üst" and away_goals > 1.5) or \
-                                           (outcome == "Alt" and away_goals < 1.5):
-                                            outcome_stats[market_type][outcome]['realized'] += 1
-
-                                    elif market_type == "Maç Sonucu":
-                                        ms_result = convert_score_to_result(home_goals, away_goals)
-                                        if outcome == ms_result:
-                                            outcome_stats[market_type][outcome]['realized'] += 1
-
-                            except Exception as e:
-                                continue
-
-                # İstatistikleri yaz
-                f.write(f"\n📊 Bulunan Benzer Oranlı Maç Sayısı: {total_matches}\n\n")
-
-                # Marketleri sırala ve yaz
-                sorted_markets = sorted(market_stats.items(), key=lambda x: x[1]['total'], reverse=True)
-
-                for market_type, stats in sorted_markets:
-                    f.write(f"\n📈 {market_type} İstatistikleri:\n")
-                    f.write("─" * 50 + "\n")
-                    f.write(f"Toplam Eşleşme: {stats['total']} maç\n")
-
-                    if market_type in outcome_stats:
-                        outcomes = []
-                        for outcome, stat in outcome_stats[market_type].items():
-                            if stat['total'] > 0:
-                                percentage = (stat['realized'] / stat['total'] * 100)
-                                outcomes.append((outcome, stat, percentage))
-
-                        # Yüzdelere göre sırala
-                        sorted_outcomes = sorted(outcomes, key=lambda x: x[2], reverse=True)
-
-                        for outcome, stat, percentage in sorted_outcomes:
-                            f.write(f"{outcome}: {stat['realized']}/{stat['total']} (%{percentage:.1f})\n")
-                    f.write("\n")
-
-                # Geçmiş maçların detaylarını yaz
-                f.write("\n📋 Geçmiş Maçların Detayları\n")
-                f.write("─" * 50 + "\n")
-                
-                for match in matches:
-                    raw_date = match.get('Geçmiş Maç Tarihi', '-')
-                    formatted_date = "-"
-                    if raw_date != "-":
-                        try:
-                            date_obj = datetime.strptime(raw_date, "%Y-%m-%d")
-                            formatted_date = date_obj.strftime("%d.%m.%Y")
-                        except:
-                            formatted_date = raw_date
-
-                    f.write(f"\n🔄 Geçmiş Maç: {match.get('Benzer Geçmiş Maç', '-')}\n")
-                    f.write(f"🏆 Lig: {match.get('Geçmiş Maç Ligi', '-')}\n")
-                    f.write(f"📅 Tarih: {formatted_date}\n")
-                    f.write(f"📊 Skor: {match.get('Geçmiş Maç Skoru', '-')}\n")
-                    f.write(f"⚽ İlk Yarı: {match.get('İlk Yarı Skoru', '-')}\n\n")
-
-                    # Oran detaylarını yaz
-                    for market_type, odds in match.get('Oranlar', {}).items():
-                        if odds:
-                            f.write(f"📈 {market_type} Oranları:\n")
-                            f.write("{:<10} {:>10} {:>10} {:>10}\n".format(
-                                "Seçenek", "Bugün", "Geçmiş", "Fark"))
-                            f.write("─" * 40 + "\n")
-
-                            for odd in odds:
-                                if not pd.isna(odd['today']) and not pd.isna(odd['historical']):
-                                    f.write("{:<10} {:>10.2f} {:>10.2f} {:>10.2f}\n".format(
-                                        odd['outcome'],
-                                        odd['today'],
-                                        odd['historical'],
-                                        odd['difference']
-                                    ))
-                            f.write("\n")
-                    f.write("─" * 50 + "\n")
+@METRICS.timed("report.write_csv")
+def save_results_to_csv(similar_matches: List[Dict], base_path: str, filename: str) -> str:
+    """Benzer maç sonuçlarını her eşleşen seçenek bir satır olacak şekilde CSV dosyasına yazar"""
+    try:
+        if not os.path.exists(base_path):
+            os.makedirs(base_path)
 
+        current_datetime = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        filepath = report_file_path(base_path, f"{filename}_{current_datetime}.csv")
+        write_report_file(filepath, render_csv_rows(similar_matches), newline='')
         print(f"\n✅ Sonuçlar kaydedildi: {filepath}")
-
+        return filepath
     except Exception as e:
         print(f"\n❌ Dosya kaydetme hatası: {str(e)}")
+        return None
+
+# Analiz sonuçlarının sorgulanabilir deposu (Analizler klasöründe)
+RESULT_STORE_FILE = "analizler.db"
+
+# Türkçe büyük/küçük harf katlaması: str.lower() "İ" harfini "i̇" (noktalı birleşik karakter) yapar ve
+# "I" ile "ı" ayrımını bilmez; kullanıcılar da çoğunlukla noktasız yazar. Dördü de "i" olur.
+TURKISH_FOLD_TABLE = str.maketrans({"İ": "i", "I": "i", "ı": "i"})
+
+def fold_text(value) -> str:
+    """Lig ve takım adlarının büyük/küçük harf ve i/ı duyarsız arama anahtarı"""
+    if not isinstance(value, str):
+        return ""
+    return " ".join(value.translate(TURKISH_FOLD_TABLE).lower().split())
+
+RESULT_STORE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    created_at TEXT NOT NULL,
+    analysis_date TEXT,
+    window_days INTEGER,
+    threshold REAL,
+    source TEXT
+);
+CREATE TABLE IF NOT EXISTS today_matches (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    match_id INTEGER,
+    match_date TEXT,
+    league TEXT,
+    home TEXT,
+    away TEXT,
+    league_key TEXT,
+    home_key TEXT,
+    away_key TEXT,
+    similar_count INTEGER,
+    today_odds TEXT,
+    score TEXT,
+    ht_score TEXT,
+    settled_at TEXT
+);
+CREATE TABLE IF NOT EXISTS similar_matches (
+    today_id INTEGER NOT NULL REFERENCES today_matches(id) ON DELETE CASCADE,
+    history_id INTEGER,
+    categories INTEGER
+);
+CREATE TABLE IF NOT EXISTS market_stats (
+    today_id INTEGER NOT NULL REFERENCES today_matches(id) ON DELETE CASCADE,
+    market TEXT NOT NULL,
+    outcome TEXT NOT NULL,
+    today_odds REAL,
+    market_matches INTEGER,
+    total INTEGER,
+    realized INTEGER,
+    rate REAL,
+    hit INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_today_date ON today_matches(match_date);
+CREATE INDEX IF NOT EXISTS idx_today_home_key ON today_matches(home_key);
+CREATE INDEX IF NOT EXISTS idx_today_away_key ON today_matches(away_key);
+CREATE INDEX IF NOT EXISTS idx_today_unsettled ON today_matches(match_date) WHERE settled_at IS NULL;
+CREATE INDEX IF NOT EXISTS idx_similar_today ON similar_matches(today_id);
+CREATE INDEX IF NOT EXISTS idx_similar_history ON similar_matches(history_id);
+CREATE INDEX IF NOT EXISTS idx_stats_today ON market_stats(today_id);
+CREATE INDEX IF NOT EXISTS idx_stats_market ON market_stats(market, outcome);
+"""
+
+class ResultStore:
+    """
+    Analiz çalıştırmalarının SQLite deposu: çalıştırma bilgisi, analiz edilen bugünkü maçlar, benzer geçmiş
+    maç id'leri ve market/seçenek istatistikleri. Maçlar oynandıktan sonra settle() her seçenek tahmininin
+    gerçekleşip gerçekleşmediğini (hit) yazar; sorgular tarih, lig, takım ve markete göre süzülür.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self._add_key_columns()
+        self.conn.executescript(RESULT_STORE_SCHEMA)
+
+    def _add_key_columns(self):
+        """Arama anahtarı sütunları olmayan eski depoya sütunları ekler ve mevcut maçlar için doldurur"""
+        columns = {row["name"] for row in self.conn.execute("PRAGMA table_info(today_matches)")}
+        if not columns or "league_key" in columns:
+            return
+        with self.conn:
+            for column in ("league_key", "home_key", "away_key"):
+                self.conn.execute(f"ALTER TABLE today_matches ADD COLUMN {column} TEXT")
+            rows = self.conn.execute("SELECT id, league, home, away FROM today_matches").fetchall()
+            self.conn.executemany(
+                "UPDATE today_matches SET league_key = ?, home_key = ?, away_key = ? WHERE id = ?",
+                [(fold_text(row["league"]), fold_text(row["home"]), fold_text(row["away"]), row["id"]) for row in rows]
+            )
+            for index in ("idx_today_league", "idx_today_home", "idx_today_away"):
+                self.conn.execute(f"DROP INDEX IF EXISTS {index}")
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self) -> "ResultStore":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    @METRICS.timed("store.record_run")
+    def record_run(self, similar_matches: List[Dict], today_df: pd.DataFrame = None, analysis_date: str = None,
+                   window_days: int = None, threshold: float = None, source: str = None) -> int:
+        """Bir analiz çalıştırmasının sonuçlarını tek işlemde yazar. Dönüş: çalıştırma id'si"""
+        today_index = TodayMatchIndex(today_df)
+        with self.conn:
+            run_id = self.conn.execute(
+                "INSERT INTO runs (created_at, analysis_date, window_days, threshold, source) VALUES (?, ?, ?, ?, ?)",
+                (datetime.now().strftime("%Y-%m-%d %H:%M:%S"), analysis_date, window_days, threshold, source)
+            ).lastrowid
+            for today_match, matches in group_by_today_match(similar_matches).items():
+                today_row = today_index.get(today_match) or {}
+                home, _, away = today_match.partition(" vs ")
+                today_odds = {}
+                for column in ODDS_COLUMNS:
+                    ticks = odds_to_ticks(today_row.get(column))
+                    if ticks != ODDS_MISSING:
+                        today_odds[column] = ticks_to_odds(ticks)
+                match_id = today_row.get("id")
+                today_id = self.conn.execute(
+                    "INSERT INTO today_matches (run_id, match_id, match_date, league, home, away, league_key, home_key,"
+                    " away_key, similar_count, today_odds) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (run_id, None if is_missing_value(match_id) else int(match_id), today_row.get("Tarih") or analysis_date,
+                     today_row.get("Lig"), home, away, fold_text(today_row.get("Lig")), fold_text(home), fold_text(away),
+                     len(matches), json.dumps(today_odds, ensure_ascii=False))
+                ).lastrowid
+                self.conn.executemany(
+                    "INSERT INTO similar_matches (today_id, history_id, categories) VALUES (?, ?, ?)",
+                    [(today_id, match.get("Geçmiş Maç ID"), match.get("Eşleşen Kategori Sayısı")) for match in matches]
+                )
+                market_totals, outcome_stats = count_report_outcomes(matches)
+                self.conn.executemany(
+                    "INSERT INTO market_stats (today_id, market, outcome, today_odds, market_matches, total, realized, rate)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(today_id, market_type, outcome, today_odds.get(f"{market_type}_{outcome}"), market_totals[market_type],
+                      stat["total"], stat["realized"], round(stat["realized"] / stat["total"] * 100, 1) if stat["total"] else None)
+                     for market_type, market_outcomes in outcome_stats.items() for outcome, stat in market_outcomes.items()]
+                )
+        return run_id
+
+    @METRICS.timed("store.settle")
+    def settle(self, historic_data: Dict) -> int:
+        """
+        Oynanmış bugünkü maçların skorlarını geçmiş veriden alır ve her seçenek istatistiğine gerçekleşip
+        gerçekleşmediğini yazar. İlk yarı skoru yoksa ilk yarı marketleri belirsiz (NULL) kalır.
+        Dönüş: sonuçlanan maç sayısı
+        """
+        pending = self.conn.execute(
+            "SELECT id, match_id, match_date FROM today_matches WHERE settled_at IS NULL AND match_id IS NOT NULL"
+        ).fetchall()
+        finished_by_date = {}
+        settled = 0
+        with self.conn:
+            for row in pending:
+                if row["match_date"] not in finished_by_date:
+                    finished_by_date[row["match_date"]] = {
+                        match.get("id"): match for match in historic_data.get("matches", {}).get(row["match_date"], [])
+                        if match.get("Status") == 3
+                    }
+                match = finished_by_date[row["match_date"]].get(row["match_id"])
+                if match is None:
+                    continue
+                score, ht_score = match.get("Skor", "- - -"), match.get("İlk Yarı Skoru", "- - -")
+                realized_mask = cached_realized_outcomes(score, ht_score)
+                if not realized_mask & FULL_TIME_MASK:
+                    continue
+                ht_known = bool(realized_mask & HALF_TIME_MASK)
+                stats = self.conn.execute("SELECT rowid, market, outcome FROM market_stats WHERE today_id = ?",
+                                          (row["id"],)).fetchall()
+                self.conn.executemany("UPDATE market_stats SET hit = ? WHERE rowid = ?", [
+                    (None if stat["market"] in HT_REQUIRED_MARKETS and not ht_known
+                     else realized_mask >> ODDS_COLUMN_INDEX[f"{stat['market']}_{stat['outcome']}"] & 1, stat["rowid"])
+                    for stat in stats
+                ])
+                self.conn.execute("UPDATE today_matches SET score = ?, ht_score = ?, settled_at = ? WHERE id = ?",
+                                  (score, ht_score, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), row["id"]))
+                settled += 1
+        return settled
+
+    @METRICS.timed("store.query")
+    def query(self, start_date: str = None, end_date: str = None, leagues: List[str] = None, teams: List[str] = None,
+              market: str = None, settled_only: bool = False) -> List[Dict]:
+        """
+        Market/seçenek istatistiklerini bugünkü maç ve çalıştırma bilgisiyle döndürür.
+        Lig ve takım filtreleri filter_matches gibi kısmi eşleşmedir; kayıtta katlanmış anahtar sütunlarında
+        aranır, büyük/küçük harf ve i/ı farkı gözetilmez ("premier lig" -> "İngiltere Premier Lig").
+        "Ev Sahibi vs Deplasman" filtresi takım anahtarlarının indeksiyle tam eşleşir.
+        """
+        conditions, params = [], []
+        if start_date:
+            conditions.append("t.match_date >= ?")
+            params.append(start_date)
+        if end_date:
+            conditions.append("t.match_date <= ?")
+            params.append(end_date)
+        if leagues:
+            conditions.append("(" + " OR ".join("instr(t.league_key, ?) > 0" for _ in leagues) + ")")
+            params.extend(fold_text(league) for league in leagues)
+        if teams:
+            team_conditions = []
+            for team in teams:
+                if " vs " in team:
+                    home, away = [fold_text(part) for part in team.split(" vs ", 1)]
+                    team_conditions.append("(t.home_key = ? AND t.away_key = ?)")
+                    params.extend([home, away])
+                else:
+                    team_conditions.append("(instr(t.home_key, ?) > 0 OR instr(t.away_key, ?) > 0)")
+                    params.extend([fold_text(team)] * 2)
+            conditions.append("(" + " OR ".join(team_conditions) + ")")
+        if market:
+            conditions.append("s.market = ?")
+            params.append(market)
+        if settled_only:
+            conditions.append("t.settled_at IS NOT NULL")
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        rows = self.conn.execute(
+            "SELECT r.id AS run_id, r.created_at, r.window_days, t.match_id, t.match_date, t.league, t.home, t.away,"
+            " t.similar_count, t.score, t.ht_score, s.market, s.outcome, s.today_odds, s.market_matches, s.total,"
+            " s.realized, s.rate, s.hit"
+            " FROM market_stats s JOIN today_matches t ON t.id = s.today_id JOIN runs r ON r.id = t.run_id"
+            f" {where} ORDER BY t.match_date, t.home, s.market, s.outcome, r.id",
+            params
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+def summarize_store_results(rows: List[Dict]) -> Dict[str, Dict]:
+    """
+    Sonuçlanmış seçenek istatistiklerinden market bazında başarı özeti. Aynı maç birden fazla kez analiz
+    edildiyse en son çalıştırma sayılır. En yüksek gerçekleşme oranlı seçenek o marketin tahminidir.
+    Dönüş: {market: {"matches", "picks_hit", "outcomes": {seçenek: {"predictions", "hits", "mean_rate"}}}}
+    """
+    latest = {}
+    for row in rows:
+        if row["hit"] is None:
+            continue
+        key = (row["match_id"] if row["match_id"] is not None else (row["home"], row["away"], row["match_date"]),
+               row["market"], row["outcome"])
+        if key not in latest or row["run_id"] > latest[key]["run_id"]:
+            latest[key] = row
+
+    summary = {}
+    picks = {}
+    for (match_key, market_type, outcome), row in latest.items():
+        market = summary.setdefault(market_type, {"matches": 0, "picks_hit": 0, "outcomes": {}})
+        stat = market["outcomes"].setdefault(outcome, {"predictions": 0, "hits": 0, "rate_sum": 0.0})
+        stat["predictions"] += 1
+        stat["hits"] += row["hit"]
+        stat["rate_sum"] += row["rate"] or 0.0
+        best = picks.get((match_key, market_type))
+        if best is None or (row["rate"] or 0.0) > (best["rate"] or 0.0):
+            picks[(match_key, market_type)] = row
+    for (_, market_type), row in picks.items():
+        summary[market_type]["matches"] += 1
+        summary[market_type]["picks_hit"] += row["hit"]
+    for market in summary.values():
+        for stat in market["outcomes"].values():
+            stat["mean_rate"] = round(stat.pop("rate_sum") / stat["predictions"], 1)
+    return summary
+
+def format_store_summary(summary: Dict[str, Dict]) -> str:
+    lines = ["", "🗃️ Kayıtlı Analizlerin Sonuçları", "─" * 62]
+    if not summary:
+        lines.append("Sonuçlanmış analiz bulunamadı.")
+        return "\n".join(lines)
+    for market_type, market in sorted(summary.items(), key=lambda item: item[1]["matches"], reverse=True):
+        lines.append(f"\n📈 {market_type}: en yüksek oranlı seçenek {market['picks_hit']}/{market['matches']} "
+                     f"(%{market['picks_hit'] / market['matches'] * 100:.1f})")
+        lines.append(f"{'Seçenek':<10} {'Tahmin':>8} {'Gerçekleşen':>12} {'Oran':>8} {'Ort. Benzer %':>14}")
+        for outcome, stat in sorted(market["outcomes"].items(), key=lambda item: item[1]["mean_rate"], reverse=True):
+            lines.append(f"{outcome:<10} {stat['predictions']:>8} {stat['hits']:>12} "
+                         f"{stat['hits'] / stat['predictions'] * 100:>7.1f}% {stat['mean_rate']:>13.1f}%")
+    return "\n".join(lines)
+
+def record_analysis(analysis_dir: str, similar_matches: List[Dict], today_df: pd.DataFrame = None,
+                    analysis_date: str = None, window_days: int = None, threshold: float = None,
+                    source: str = None) -> int:
+    """Analiz sonuçlarını Analizler/analizler.db deposuna ekler; depo hatası analizi durdurmaz"""
+    if not similar_matches:
+        return None
+    try:
+        with ResultStore(os.path.join(analysis_dir, RESULT_STORE_FILE)) as store:
+            return store.record_run(similar_matches, today_df, analysis_date, window_days, threshold, source)
+    except sqlite3.Error as e:
+        print(f"⚠️ Sonuç deposuna yazılamadı: {str(e)}")
+        return None
+
 
-def analyze_matches():
+# --format değerlerinin yazdığı rapor biçimleri
+OUTPUT_FORMATS = {
+    "text": ("text",),
+    "json": ("json",),
+    "csv": ("csv",),
+    "both": ("text", "json"),
+    "all": ("text", "json", "csv")
+}
+
+@METRICS.timed("report.write_per_match")
+def write_match_reports(similar_matches: List[Dict], base_path: str, today_df: pd.DataFrame = None,
+                        formats: Tuple[str, ...] = ("text",), workers: int = None) -> Dict[str, List[str]]:
+    """
+    Her bugünkü maç için ayrı rapor dosyaları (Analiz_<id>_<ev>_<deplasman>.txt/.json/.csv) yazar.
+    Raporlar bellekte üretilip tek yazmayla kaydedilir; maçlar iş parçacıklarına dağıtılır.
+    Dönüş: {bugünkü maç: [yazılan dosyalar]}
+    """
+    os.makedirs(base_path, exist_ok=True)
+    today_index = TodayMatchIndex(today_df)
+    grouped = group_by_today_match(similar_matches)
+
+    def write_one(item: Tuple[str, List[Dict]]) -> Tuple[str, List[str]]:
+        today_match, matches = item
+        today_row = today_index.get(today_match)
+        match_id = today_row.get("id") if today_row is not None else None
+        name = f"Analiz_{today_match.replace(' vs ', '_').replace(' ', '_')}"
+        if match_id is not None:
+            name = f"Analiz_{match_id}_{today_match.replace(' vs ', '_').replace(' ', '_')}"
+        paths = []
+        if "text" in formats:
+            paths.append(write_report_file(report_file_path(base_path, f"{name}.txt"),
+                                           render_match_report(today_match, matches, today_row)))
+        if "json" in formats:
+            paths.append(write_report_file(report_file_path(base_path, f"{name}.json"),
+                                           json.dumps(render_match_json(today_match, matches, today_row),
+                                                      ensure_ascii=False, indent=4, default=str)))
+        if "csv" in formats:
+            paths.append(write_report_file(report_file_path(base_path, f"{name}.csv"), render_csv_rows(matches), newline=''))
+        return today_match, paths
+
+    workers = workers or min(8, os.cpu_count() or 1)
+    if workers <= 1 or len(grouped) <= 1:
+        written = dict(map(write_one, grouped.items()))
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            written = dict(executor.map(write_one, grouped.items()))
+    print(f"\n✅ {len(written)} maçın raporu kaydedildi: {base_path}")
+    return written
+
+def fill_missing_days(historic_data: Dict, start_date: datetime, end_date: datetime, token: str) -> int:
+    """Tarih aralığında veride olmayan günleri API'den tamamlar. Dönüş: eklenen maç sayısı"""
+    added = 0
+    if not token:
+        return added
+    for date in get_date_range(start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d")):
+        if date not in historic_data["matches"]:
+            daily_matches = get_matches_for_date(token, date)
+            if daily_matches:
+                added += ingest_matches(historic_data, date, daily_matches)[0]
+    return added
+
+def load_history_window(historic_data: Dict, start_date: datetime, end_date: datetime,
+                        token: str) -> Tuple[pd.DataFrame, np.ndarray]:
+    """Eksik günleri tamamlar ve pencereyi sıralı geçmiş dizilerinden kopyasız dilim olarak döndürür"""
+    fill_missing_days(historic_data, start_date, end_date, token)
+    return get_history_arrays(historic_data).window(start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d"))
+
+def analyze_multiple_days(analysis_dates: List[datetime], window_days: int, token: str, historic_data: Dict,
+                          historic_file: str, analysis_dir: str, threshold: float = 0.05,
+                          select_matches: Callable[[pd.DataFrame], pd.DataFrame] = None,
+                          output_format: str = "text", per_match: bool = False,
+                          bulletin_cache: BulletinCache = None) -> Dict[str, List[Dict]]:
+    """
+    Birden fazla analiz gününü tek seferde analiz eder.
+    Tüm günlerin geçmiş pencerelerinin birleşimi bir kez yüklenir; DataFrame ve oran matrisi
+    günler arasında paylaşılır, her gün için sadece kendi penceresi seçilir.
+    select_matches verilirse her günün maçları analizden önce bu fonksiyonla filtrelenir.
+    output_format: OUTPUT_FORMATS anahtarlarından biri ("text", "json", "csv", "both", "all")
+    per_match: True ise ayrıca her maç için Toplu_Analiz_<tarih> klasörüne ayrı raporlar yazılır
+    bulletin_cache verilirse günlerin bültenleri önbellekten (bayatsa API'den) alınır
+    """
+    formats = OUTPUT_FORMATS[output_format]
+    results = {}
+    if not analysis_dates:
+        return results
+
+    union_start = min(analysis_dates) - timedelta(days=1) - timedelta(days=window_days)
+    union_end = max(analysis_dates) - timedelta(days=1)
+
+    print(f"\n📊 {union_start.strftime('%d.%m.%Y')} - {union_end.strftime('%d.%m.%Y')} arası geçmiş maçlar bir kez yükleniyor...")
+    fill_missing_days(historic_data, union_start, union_end, token)
+    save_historic_data(historic_data, historic_file)
+    history = get_history_arrays(historic_data)
+
+    for analysis_date in sorted(analysis_dates):
+        date_str = analysis_date.strftime("%Y-%m-%d")
+        end_date = analysis_date - timedelta(days=1)
+        start_date = end_date - timedelta(days=window_days)
+
+        print(f"\n⚽ {analysis_date.strftime('%d.%m.%Y')} maçları alınıyor...")
+        day_matches = bulletin_cache.get(date_str) if bulletin_cache is not None else get_matches_for_date(token, date_str)
+        analysis_df = pd.DataFrame(record_bulletin(historic_data, historic_file, day_matches))
+        if select_matches is not None and not analysis_df.empty:
+            analysis_df = select_matches(analysis_df)
+        if analysis_df.empty:
+            print(f"❌ {analysis_date.strftime('%d.%m.%Y')} için maç bulunamadı.")
+            results[date_str] = []
+            continue
+
+        # Günün penceresi sıralı dizilerden iki ikili arama ile seçilir
+        window_df, window_odds = history.window(start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d"))
+
+        print(f"🔍 {analysis_date.strftime('%d.%m.%Y')}: {start_date.strftime('%d.%m.%Y')} - {end_date.strftime('%d.%m.%Y')} penceresi analiz ediliyor...")
+        similar_matches = find_similar_matches(window_df, analysis_df, threshold, historical_odds=window_odds)
+        results[date_str] = similar_matches
+        record_analysis(analysis_dir, similar_matches, analysis_df, date_str, window_days, threshold, "toplu")
+
+        if similar_matches:
+            match_count = len(set(match.get('Bugünkü Maç') for match in similar_matches))
+            filename = f"Toplu_Analiz_{date_str}_{match_count}mac"
+            if "text" in formats:
+                save_results_to_file(similar_matches, analysis_dir, False, None, analysis_df, filename=filename)
+            if "json" in formats:
+                save_results_to_json(similar_matches, analysis_dir, filename)
+            if "csv" in formats:
+                save_results_to_csv(similar_matches, analysis_dir, filename)
+            if per_match:
+                write_match_reports(similar_matches, os.path.join(analysis_dir, f"Toplu_Analiz_{date_str}"),
+                                    analysis_df, formats)
+        else:
+            print(f"\n❌ {analysis_date.strftime('%d.%m.%Y')} için Benzer Maç Bulunamadı!")
+
+    return results
+
+def summarize_multiple_days(analysis_dates: List[datetime], window_days: int, token: str, historic_data: Dict,
+                            historic_file: str, analysis_dir: str, threshold: float = 0.05,
+                            select_matches: Callable[[pd.DataFrame], pd.DataFrame] = None,
+                            by_league: bool = False) -> Dict[str, List[Dict]]:
+    """
+    Analiz günleri için seçenek gerçekleşme özetlerini sonuç küpünden üretir ve Ozet_<tarih>.json olarak yazar.
+    Pencere uzunluğu maliyeti etkilemez; benzer geçmiş maçların listesi için analyze_multiple_days kullanılır.
+    """
+    results = {}
+    if not analysis_dates:
+        return results
+
+    union_start = min(analysis_dates) - timedelta(days=1) - timedelta(days=window_days)
+    union_end = max(analysis_dates) - timedelta(days=1)
+    fill_missing_days(historic_data, union_start, union_end, token)
+    save_historic_data(historic_data, historic_file)
+    cube = get_outcome_cube(historic_data, by_league=by_league)
+    dictionary = get_string_dictionary(historic_data) if by_league else None
+
+    for analysis_date in sorted(analysis_dates):
+        date_str = analysis_date.strftime("%Y-%m-%d")
+        end_date = (analysis_date - timedelta(days=1)).strftime("%Y-%m-%d")
+        start_date = (analysis_date - timedelta(days=1 + window_days)).strftime("%Y-%m-%d")
+
+        analysis_df = pd.DataFrame(record_bulletin(historic_data, historic_file, get_matches_for_date(token, date_str)))
+        if select_matches is not None and not analysis_df.empty:
+            analysis_df = select_matches(analysis_df)
+        summaries = summarize_with_cube(cube, analysis_df, start_date, end_date, threshold, dictionary)
+        results[date_str] = summaries
+        if not summaries:
+            print(f"❌ {analysis_date.strftime('%d.%m.%Y')} için maç bulunamadı.")
+            continue
+
+        file_path = os.path.join(analysis_dir, f"Ozet_{date_str}_{window_days}gun.json")
+        payload = {"date": date_str, "window": window_days, "threshold": threshold,
+                   "history_window": [start_date, end_date], "matches": summaries}
+        with open(file_path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, ensure_ascii=False, indent=2)
+        print(f"✅ {len(summaries)} maçın özeti kaydedildi: {file_path}")
+
+    return results
+
+# Backtest işçi süreçlerinin paylaştığı durum (her işçiye başlangıçta bir kez aktarılır)
+_BACKTEST_STATE = {}
+
+def _init_backtest_worker(history: HistoryArrays, window_days: int, threshold: float):
+    hist_finished, hist_has_ht = get_history_flags(history.df)
+    settlement = history.settlement.astype(np.int64)
+    _BACKTEST_STATE.update(
+        history=history,
+        window_days=window_days,
+        threshold=threshold,
+        finished=hist_finished,
+        has_ht=hist_has_ht,
+        columns=np.array([column in history.df.columns for column in ODDS_COLUMNS]),
+        settled=(settlement & FULL_TIME_MASK) != 0,
+        # Satır x seçenek: seçenek gerçekleşti mi
+        realized=((settlement[:, None] >> np.arange(len(ODDS_COLUMNS))) & 1).astype(bool)
+    )
+
+def backtest_day(date_str: str) -> Dict:
+    """
+    Geçmiş bir günü "bugün" gibi kendi önceki penceresiyle analiz eder ve her seçenek için
+    benzer maçlardaki gerçekleşme oranını (tahmin) günün gerçek sonucuyla karşılaştırır.
+    Benzer maç sözlükleri oluşturulmaz; sayımlar tarama çekirdeğinin maskelerinden yapılır.
+    """
+    state = _BACKTEST_STATE
+    history = state["history"]
+    day = np.datetime64(date_str, "D")
+    today_start, today_end = history.bounds(date_str, date_str)
+    window_start, window_end = history.bounds(str(day - 1 - state["window_days"]), str(day - 1))
+    result = {"date": date_str, "matches": 0, "predictions": [], "picks": []}
+
+    today_active = state["finished"][today_start:today_end] & state["settled"][today_start:today_end]
+    result["matches"] = int(today_active.sum())
+    if not today_active.any() or window_end == window_start:
+        return result
+
+    window_realized = state["realized"][window_start:window_end]
+    today_realized = state["realized"][today_start:today_end]
+    for today_pos, candidates, market_matches, within_threshold, _ in scan_similar_candidates(
+            history.odds[window_start:window_end], state["finished"][window_start:window_end],
+            state["has_ht"][window_start:window_end], history.odds[today_start:today_end], today_active,
+            state["threshold"], today_columns=state["columns"]):
+        if len(candidates) == 0:
+            continue
+        actual = today_realized[today_pos]
+        today_has_ht = state["has_ht"][today_start + today_pos]
+        for market_type, (columns, market_ok) in market_matches.items():
+            if market_type in HT_REQUIRED_MARKETS and not today_has_ht:
+                continue
+            if not market_ok.any():
+                continue
+            best = None
+            for col in columns:
+                outcome_mask = market_ok & within_threshold[:, col]
+                total = int(outcome_mask.sum())
+                if total == 0:
+                    continue
+                predicted = int((outcome_mask & window_realized[candidates, col]).sum()) / total
+                result["predictions"].append((market_type, ODDS_COLUMNS[col].split('_')[-1], predicted, bool(actual[col])))
+                if best is None or predicted > best[0]:
+                    best = (predicted, col)
+            if best is not None:
+                result["picks"].append((market_type, bool(actual[best[1]])))
+    return result
+
+def summarize_backtest(day_results: List[Dict], calibration_bins: int = 10) -> Dict:
+    """Gün sonuçlarından market bazında isabet oranı, Brier skoru ve kalibrasyon tablosu üretir"""
+    markets = {}
+    overall = []
+    for day_result in day_results:
+        for market_type, hit in day_result["picks"]:
+            market = markets.setdefault(market_type, {"picks": 0, "hits": 0, "predictions": []})
+            market["picks"] += 1
+            market["hits"] += int(hit)
+        for market_type, outcome, predicted, realized in day_result["predictions"]:
+            markets.setdefault(market_type, {"picks": 0, "hits": 0, "predictions": []})["predictions"].append((predicted, realized))
+            overall.append((predicted, realized))
+
+    def calibration(predictions: List[Tuple[float, bool]]) -> List[Dict]:
+        if not predictions:
+            return []
+        predicted = np.array([p for p, _ in predictions])
+        realized = np.array([r for _, r in predictions], dtype=float)
+        bins = np.minimum((predicted * calibration_bins).astype(int), calibration_bins - 1)
+        table = []
+        for b in range(calibration_bins):
+            in_bin = bins == b
+            count = int(in_bin.sum())
+            table.append({
+                "bin": f"{b * 100 // calibration_bins}-{(b + 1) * 100 // calibration_bins}",
+                "count": count,
+                "mean_predicted": round(float(predicted[in_bin].mean()) * 100, 1) if count else None,
+                "observed": round(float(realized[in_bin].mean()) * 100, 1) if count else None
+            })
+        return table
+
+    def brier(predictions: List[Tuple[float, bool]]) -> float:
+        if not predictions:
+            return None
+        return round(float(np.mean([(p - float(r)) ** 2 for p, r in predictions])), 4)
+
+    return {
+        "days": len(day_results),
+        "matches": sum(day_result["matches"] for day_result in day_results),
+        "markets": {
+            market_type: {
+                "picks": market["picks"],
+                "hits": market["hits"],
+                "hit_rate": round(market["hits"] / market["picks"] * 100, 1) if market["picks"] else None,
+                "predictions": len(market["predictions"]),
+                "brier": brier(market["predictions"]),
+                "calibration": calibration(market["predictions"])
+            }
+            for market_type, market in markets.items()
+        },
+        "overall": {"predictions": len(overall), "brier": brier(overall), "calibration": calibration(overall)}
+    }
+
+@METRICS.timed("backtest.run")
+def run_backtest(historic_data: Dict, start_date: datetime, days: int, window_days: int, analysis_dir: str,
+                 threshold: float = 0.05, workers: int = None) -> Dict:
+    """
+    Geçmiş günleri sırayla "bugün" kabul edip kendi önceki pencereleriyle analiz eder (walk-forward).
+    Sıralı geçmiş dizileri bir kez oluşturulur, her gün sadece pencere dilimi alınır; günler
+    workers > 1 ise ayrı süreçlerde paralel çalışır. Sonuç JSON ve metin raporu olarak yazılır.
+    """
+    history = get_history_arrays(historic_data)
+    dates = [(start_date + timedelta(days=i)).strftime("%Y-%m-%d") for i in range(days)]
+    workers = workers or os.cpu_count() or 1
+
+    print(f"\n🧪 {dates[0]} - {dates[-1]} arası {len(dates)} gün geriye dönük test ediliyor "
+          f"(pencere {window_days} gün, {workers} işçi)...")
+    if workers > 1 and len(dates) > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_backtest_worker,
+                                 initargs=(history, window_days, threshold)) as executor:
+            day_results = list(executor.map(backtest_day, dates, chunksize=max(1, len(dates) // (workers * 4))))
+    else:
+        _init_backtest_worker(history, window_days, threshold)
+        day_results = [backtest_day(date_str) for date_str in dates]
+        _BACKTEST_STATE.clear()
+
+    summary = summarize_backtest(day_results)
+    summary.update(start=dates[0], end=dates[-1], window=window_days, threshold=threshold)
+
+    filename = f"Backtest_{dates[0]}_{dates[-1]}_{window_days}gun"
+    with open(os.path.join(analysis_dir, f"{filename}.json"), 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    with open(os.path.join(analysis_dir, f"{filename}.txt"), 'w', encoding='utf-8') as f:
+        f.write(f"🧪 Geriye Dönük Test: {dates[0]} - {dates[-1]} (pencere {window_days} gün, eşik {threshold})\n")
+        f.write(f"📊 {summary['days']} gün, {summary['matches']} maç\n\n")
+        for market_type, market in summary["markets"].items():
+            f.write(f"📈 {market_type}\n")
+            f.write("─" * 50 + "\n")
+            hit_rate = f"%{market['hit_rate']}" if market["hit_rate"] is not None else "-"
+            f.write(f"En yüksek oranlı seçenek isabeti: {market['hits']}/{market['picks']} ({hit_rate})\n")
+            f.write(f"Brier skoru: {market['brier']} ({market['predictions']} tahmin)\n")
+            f.write(f"{'Tahmin %':<10} {'Adet':>8} {'Ort. Tahmin':>12} {'Gerçekleşen':>12}\n")
+            for row in market["calibration"]:
+                if row["count"]:
+                    f.write(f"{row['bin']:<10} {row['count']:>8} {row['mean_predicted']:>11}% {row['observed']:>11}%\n")
+            f.write("\n")
+    print(f"✅ Geriye dönük test raporu kaydedildi: {os.path.join(analysis_dir, filename)}.txt/.json")
+    return summary
+
+# Parçalı analiz dosyaları (parça klasöründe)
+SHARD_MANIFEST = "manifest.json"
+SHARD_SELECTION = "secim.json"
+
+def get_shard_dir(analysis_dir: str, date_str: str, window_days: int) -> str:
+    return os.path.join(analysis_dir, f"Parcali_{date_str}_{window_days}gun")
+
+def plan_shards(history: HistoryArrays, start_date: str, end_date: str, shards: int,
+                partition: str = "date") -> List[Dict]:
+    """
+    Geçmiş pencereyi maç sayısı dengeli parçalara böler.
+    partition="date": ardışık gün aralıkları; partition="league": ligler en az yüklü parçaya dağıtılır.
+    Boş parçalar plana alınmaz.
+    """
+    lo, hi = history.bounds(start_date, end_date)
+    plan = []
+    if partition == "league":
+        leagues = history.df["Lig"].iloc[lo:hi].astype(object)
+        counts = leagues.where(leagues.notna(), None).value_counts(dropna=False)
+        loads = [[0, []] for _ in range(shards)]
+        for league, count in sorted(counts.items(), key=lambda item: (-item[1], str(item[0]))):
+            target = min(loads, key=lambda load: load[0])
+            target[0] += int(count)
+            target[1].append(None if league is None or league != league else league)
+        for count, shard_leagues in loads:
+            if shard_leagues:
+                plan.append({"index": len(plan), "leagues": shard_leagues, "matches": count})
+        return plan
+
+    days, counts = np.unique(history.dates[lo:hi], return_counts=True)
+    if not len(days):
+        return [{"index": 0, "days": [start_date, end_date], "matches": 0}]
+    # Her gün, kendisinden önceki maç sayısına göre bir parçaya düşer (parçalar ardışık kalır)
+    before = np.cumsum(counts) - counts
+    owners = np.minimum(before * shards // int(counts.sum()), shards - 1)
+    for owner in np.unique(owners):
+        selected = owners == owner
+        shard_days = days[selected]
+        plan.append({"index": len(plan), "days": [str(shard_days[0]), str(shard_days[-1])],
+                     "matches": int(counts[selected].sum())})
+    return plan
+
+def create_shard_plan(historic_data: Dict, bulletin: List[Dict], analysis_date: datetime, window_days: int,
+                      shard_dir: str, shards: int, partition: str = "date", threshold: float = 0.05,
+                      select_matches: Callable[[pd.DataFrame], pd.DataFrame] = None) -> Dict:
+    """
+    Parçalı analizi planlar: bugünkü maç seçimini dondurur (secim.json) ve parçaları manifest.json'a yazar.
+    İşçiler seçimi yeniden çekmez; tüm parçalar aynı bugünkü maçlarla çalışır.
+    """
+    os.makedirs(shard_dir, exist_ok=True)
+    date_str = analysis_date.strftime("%Y-%m-%d")
+    end_date = (analysis_date - timedelta(days=1)).strftime("%Y-%m-%d")
+    start_date = (analysis_date - timedelta(days=1 + window_days)).strftime("%Y-%m-%d")
+
+    # Seçim, filtreden geçen ham maç kayıtlarıdır (işçiler tek düğümdeki DataFrame'in aynısını kurar)
+    bulletin_df = pd.DataFrame(bulletin)
+    if select_matches is not None and not bulletin_df.empty:
+        bulletin_df = select_matches(bulletin_df)
+    selection = [bulletin[pos] for pos in bulletin_df.index]
+    write_json_atomic(os.path.join(shard_dir, SHARD_SELECTION), selection)
+
+    plan = plan_shards(get_history_arrays(historic_data), start_date, end_date, shards, partition)
+    manifest = {
+        "date": date_str,
+        "window": window_days,
+        "threshold": threshold,
+        "history_window": [start_date, end_date],
+        "history_revision": historic_data.get("revision"),
+        "partition": partition,
+        "selection": SHARD_SELECTION,
+        "selected_matches": len(selection),
+        "shards": plan,
+        "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    }
+    manifest["plan_id"] = hashlib.blake2b(json.dumps([manifest, [m.get("id") for m in selection]], ensure_ascii=False,
+                                                     default=str).encode("utf-8"), digest_size=8).hexdigest()
+    write_json_atomic(os.path.join(shard_dir, SHARD_MANIFEST), manifest)
+    print(f"🗂️ {len(plan)} parça planlandı ({partition}, {len(selection)} bugünkü maç): {shard_dir}")
+    for shard in plan:
+        scope = " - ".join(shard["days"]) if "days" in shard else f"{len(shard['leagues'])} lig"
+        print(f"   {shard['index']}: {scope} ({shard['matches']} maç)")
+    return manifest
+
+def load_shard_manifest(shard_dir: str) -> Tuple[Dict, pd.DataFrame]:
+    """Manifest ile dondurulmuş bugünkü maç seçimini yükler"""
+    manifest_path = os.path.join(shard_dir, SHARD_MANIFEST)
+    if not os.path.exists(manifest_path):
+        raise ValueError(f"Parça planı bulunamadı: {manifest_path}")
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    with open(os.path.join(shard_dir, manifest["selection"]), 'r', encoding='utf-8') as f:
+        today_df = pd.DataFrame(json.load(f))
+    return manifest, today_df
+
+def run_shard(historic_data: Dict, shard_dir: str, shard_index: int) -> int:
+    """
+    Tek bir parçanın benzerlik taramasını yapar ve parca_<n>.json olarak yazar. Her sonuç bugünkü maçın
+    ve geçmiş maçın pencere içindeki konumuyla saklanır; birleştirme bu konumlarla tek düğüm sırasını kurar.
+    Geçmiş veri sürümü veya parçanın maç sayısı planla uyuşmazsa sonuç yazılmaz (ValueError).
+    Dönüş: bulunan benzer maç sayısı
+    """
+    manifest, today_df = load_shard_manifest(shard_dir)
+    if not 0 <= shard_index < len(manifest["shards"]):
+        raise ValueError(f"Parça {shard_index} planda yok (0-{len(manifest['shards']) - 1})")
+    shard = manifest["shards"][shard_index]
+    if historic_data.get("revision") != manifest["history_revision"]:
+        raise ValueError(f"Parça {shard_index}: geçmiş veri sürümü {historic_data.get('revision')}, plan "
+                         f"{manifest['history_revision']} sürümüyle yapıldı; işçiler planın Veriler dosyalarıyla çalışmalı")
+
+    history = get_history_arrays(historic_data)
+    start_date, end_date = manifest["history_window"]
+    lo, hi = history.bounds(start_date, end_date)
+    window_df, window_odds = history.window(start_date, end_date)
+    if "days" in shard:
+        dates = history.dates[lo:hi]
+        mask = (dates >= np.datetime64(shard["days"][0], "D")) & (dates <= np.datetime64(shard["days"][1], "D"))
+    else:
+        leagues = window_df["Lig"].astype(object)
+        mask = leagues.isin([league for league in shard["leagues"] if league is not None]).to_numpy()
+        if None in shard["leagues"]:
+            mask |= leagues.isna().to_numpy()
+    positions = np.flatnonzero(mask)
+    if len(positions) != shard["matches"]:
+        raise ValueError(f"Parça {shard_index}: planda {shard['matches']}, bu düğümde {len(positions)} geçmiş maç var")
+
+    shard_df = window_df.iloc[positions].reset_index(drop=True)
+    today_df = today_df.drop_duplicates(subset=["Ev Sahibi", "Deplasman"]) if not today_df.empty else today_df
+    print(f"🔍 Parça {shard_index}: {len(today_df)} bugünkü maç x {len(shard_df)} geçmiş maç taranıyor...")
+    results = [[today_pos, int(positions[hist_pos]), match_info]
+               for today_pos, hist_pos, match_info in iter_similar_matches(shard_df, window_odds[positions], today_df,
+                                                                           manifest["threshold"])]
+    write_json_atomic(os.path.join(shard_dir, f"parca_{shard_index}.json"), {
+        "plan_id": manifest["plan_id"],
+        "shard": shard_index,
+        "history_rows": len(positions),
+        "history_revision": historic_data.get("revision"),
+        "results": results
+    })
+    print(f"✅ Parça {shard_index}: {len(results)} benzer maç yazıldı.")
+    return len(results)
+
+def merge_shards(shard_dir: str, analysis_dir: str, output_format: str = "text") -> List[Dict]:
+    """
+    Parça sonuçlarını birleştirir: sonuçlar (bugünkü maç, pencere konumu) sırasına konup kategori sayısına
+    göre kararlı sıralanır, bu tek düğümde find_similar_matches'in verdiği sıranın aynısıdır.
+    Raporlar analyze_multiple_days ile aynı adlarla yazılır.
+    """
+    manifest, today_df = load_shard_manifest(shard_dir)
+    rows = []
+    missing = []
+    for shard in manifest["shards"]:
+        path = os.path.join(shard_dir, f"parca_{shard['index']}.json")
+        if not os.path.exists(path):
+            missing.append(shard["index"])
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            partial = json.load(f)
+        if partial.get("plan_id") != manifest["plan_id"]:
+            raise ValueError(f"Parça {shard['index']} başka bir plana ait")
+        if partial.get("history_revision") != manifest["history_revision"] or partial.get("history_rows") != shard["matches"]:
+            raise ValueError(f"Parça {shard['index']} planın geçmiş verisiyle taranmamış (sürüm "
+                             f"{partial.get('history_revision')}, {partial.get('history_rows')} maç)")
+        rows.extend(partial["results"])
+    if missing:
+        raise ValueError(f"Eksik parça sonuçları: {', '.join(map(str, missing))}")
+
+    rows.sort(key=lambda row: (row[0], row[1]))
+    similar_matches = [match_info for _, _, match_info in rows]
+    similar_matches.sort(key=lambda x: x["Eşleşen Kategori Sayısı"], reverse=True)
+
+    date_str = manifest["date"]
+    if similar_matches:
+        record_analysis(analysis_dir, similar_matches, today_df, date_str, manifest["window"],
+                        manifest["threshold"], "parcali")
+        formats = OUTPUT_FORMATS[output_format]
+        match_count = len(set(match.get('Bugünkü Maç') for match in similar_matches))
+        filename = f"Toplu_Analiz_{date_str}_{match_count}mac"
+        if "text" in formats:
+            save_results_to_file(similar_matches, analysis_dir, False, None, today_df, filename=filename)
+        if "json" in formats:
+            save_results_to_json(similar_matches, analysis_dir, filename)
+        if "csv" in formats:
+            save_results_to_csv(similar_matches, analysis_dir, filename)
+        print(f"✅ {len(manifest['shards'])} parça birleştirildi: {len(similar_matches)} benzer maç.")
+    else:
+        print(f"\n❌ {date_str} için Benzer Maç Bulunamadı!")
+    return similar_matches
+
+def analyze_matches(bulletin_cache: BulletinCache = None, historic_data: Dict = None):
+    """
+    Etkileşimli analiz. bulletin_cache verilirse günlerin bültenleri arka planda önceden çekilmiş
+    önbellekten alınır; seçilen günün kaydı tazeyse menü beklemeden açılır.
+    historic_data verilirse (önbelleğin çekimleri de aynı veriye kaydediliyorsa) yeniden yüklenmez; süreçte
+    oran zaman serisi dosyalarına tek bir seri nesnesi yazar.
+    """
     base_dir, data_dir, analysis_dir = initialize_directories()
     historic_file = os.path.join(data_dir, "historic_matches.json")
-    historic_data = load_historic_data(historic_file)
+    if historic_data is None:
+        historic_data = load_historic_data(historic_file)
+    if bulletin_cache is None:
+        bulletin_cache = BulletinCache()
 
-    # datetime.UTC yerine timezone.utc kullanın
-    today = datetime.now(timezone.utc)
     print("\n📅 Analiz edilecek günü seçin:")
     print("─" * 30)
-    dates = []
-    for i in range(5):
-        future_date = today + timedelta(days=i)
+    dates = get_upcoming_dates()
+    for i, future_date in enumerate(dates):
         if i == 0:
             print(f"{i+1}. Bugün ({future_date.strftime('%d.%m.%Y')})")
         elif i == 1:
             print(f"{i+1}. Yarın ({future_date.strftime('%d.%m.%Y')})")
         else:
             print(f"{i+1}. {future_date.strftime('%d.%m.%Y')}")
-        dates.append(future_date)
+    print("6. Tüm günler (toplu analiz)")
     print("─" * 30)
 
     while True:
         try:
-            choice = int(input("Seçiminiz (1-5): "))
-            if 1 <= choice <= 5:
-                analysis_date = dates[choice-1]
+            choice = int(input("Seçiminiz (1-6): "))
+            if 1 <= choice <= 6:
                 break
-            print("❌ Lütfen 1-5 arasında bir sayı girin.")
+            print("❌ Lütfen 1-6 arasında bir sayı girin.")
         except ValueError:
             print("❌ Lütfen geçerli bir sayı girin.")
 
-    print("\n⚽ Analiz edilecek günün maçları alınıyor...")
-    token = get_token()
-    if token:
-        analysis_matches = get_matches_for_date(token, analysis_date.strftime("%Y-%m-%d"))
+    if choice == 6:
+        print("\n⚽ Toplu analiz için token alınıyor...")
+        token = get_token()
+        if not token:
+            print("❌ Token alınamadı! Analiz yapılamıyor.")
+            return
+        start_date, end_date = get_date_range_choice(dates[0])
+        analyze_multiple_days(dates, (end_date - start_date).days, token, historic_data, historic_file, analysis_dir,
+                              bulletin_cache=bulletin_cache)
+        return
+
+    analysis_date = dates[choice-1]
+    date_str = analysis_date.strftime("%Y-%m-%d")
+
+    if not bulletin_cache.is_fresh(date_str):
+        print("\n⚽ Analiz edilecek günün maçları alınıyor...")
+    analysis_matches = record_bulletin(historic_data, historic_file, bulletin_cache.get(date_str))
+    if analysis_matches:
         analysis_df = pd.DataFrame(analysis_matches)
 
         if not analysis_df.empty:
@@ -1150,25 +3963,18 @@ def analyze_matches():
             start_date, end_date = get_date_range_choice(analysis_date)
 
             print(f"\n📊 {start_date.strftime('%d.%m.%Y')} - {end_date.strftime('%d.%m.%Y')} tarihleri arasındaki maçlar analiz ediliyor...")
-            historical_matches = []
-
-            for date in get_date_range(start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d")):
-                if date in historic_data["matches"]:
-                    historical_matches.extend(historic_data["matches"][date])
-                else:
-                    daily_matches = get_matches_for_date(token, date)
-                    if daily_matches:
-                        historic_data["matches"][date] = daily_matches
-                        historical_matches.extend(daily_matches)
-
+            # Token sadece geçmiş pencerenin eksik günleri için, seçim menülerinden sonra istenir
+            token = get_token()
+            historical_df, historical_odds = load_history_window(historic_data, start_date, end_date, token)
             save_historic_data(historic_data, historic_file)
-            historical_df = pd.DataFrame(historical_matches)
 
             print("\n🔍 Benzer maçlar analiz ediliyor...")
-    similar_matches = find_similar_matches(historical_df, analysis_df)
+    similar_matches = find_similar_matches(historical_df, analysis_df, historical_odds=historical_odds)
 
     if similar_matches:
         save_results_to_file(similar_matches, analysis_dir, is_single_match, selected_teams,analysis_df)
+        record_analysis(analysis_dir, similar_matches, analysis_df, date_str, (end_date - start_date).days,
+                        source="menu")
     else:
         print("\n❌ Benzer Maç Bulunamadı!")
 
@@ -1188,12 +3994,14 @@ def get_base_directory():
         home = os.path.expanduser("~")
         return os.path.join(home, "Oran Analiz")
 
-def initialize_directories() -> tuple:
-    """Gerekli dizinleri oluşturur ve dizin yollarını döndürür"""
+def initialize_directories(base_dir: str = None) -> tuple:
+    """Gerekli dizinleri oluşturur ve dizin yollarını döndürür (base_dir verilirse o kullanılır)"""
     try:
-        base_dir = get_base_directory()
+        custom_base_dir = base_dir is not None
+        if not custom_base_dir:
+            base_dir = get_base_directory()
 
-        if platform.system().lower() == "linux" and "/storage/emulated/0" not in base_dir:
+        if not custom_base_dir and platform.system().lower() == "linux" and "/storage/emulated/0" not in base_dir:
             if os.path.exists("/storage/emulated/0"):
                 base_dir = "/storage/emulated/0/Oran Analiz"
 
@@ -1226,15 +4034,864 @@ def initialize_directories() -> tuple:
     except Exception as e:
         print(f"❌ Dizin oluşturma hatası: {str(e)}")
 
+def get_changed_match_ids(previous_odds: Dict[Any, np.ndarray], match_ids: List[Any], odds_matrix: np.ndarray,
+                          tolerance: float) -> List[Any]:
+    """Oran vektörü önceki yoklamaya göre tolerans üzerinde değişen (veya yeni gelen) maçların id'lerini döndürür"""
+    changed_ids = []
+    tolerance_ticks = threshold_to_ticks(tolerance)
+    for match_id, odds_row in zip(match_ids, odds_matrix):
+        previous = previous_odds.get(match_id)
+        if previous is None:
+            changed_ids.append(match_id)
+            continue
+        # Oranın eklenmesi/kaldırılması da değişiklik sayılır
+        if not np.array_equal(previous == ODDS_MISSING, odds_row == ODDS_MISSING):
+            changed_ids.append(match_id)
+            continue
+        if np.abs(previous.astype(np.int32) - odds_row.astype(np.int32)).max(initial=0) > tolerance_ticks:
+            changed_ids.append(match_id)
+    return changed_ids
+
+def watch_matches(analysis_date: datetime, window_days: int, historic_data: Dict, historic_file: str, analysis_dir: str,
+                  threshold: float = 0.05, interval: int = 300, tolerance: float = 0.0,
+                  select_matches: Callable[[pd.DataFrame], pd.DataFrame] = None, max_polls: int = None) -> int:
+    """
+    Analiz gününün bültenini belirli aralıklarla yoklar ve sadece oranı değişen maçları yeniden analiz eder.
+    Her maçın raporu İzleme klasöründe sabit isimli dosyada yerinde güncellenir.
+    Dönüş: yapılan yoklama sayısı
+    """
+    date_str = analysis_date.strftime("%Y-%m-%d")
+    end_date = analysis_date - timedelta(days=1)
+    start_date = end_date - timedelta(days=window_days)
+    watch_dir = os.path.join(analysis_dir, f"Izleme_{date_str}")
+
+    token = get_token()
+    print(f"\n📊 {start_date.strftime('%d.%m.%Y')} - {end_date.strftime('%d.%m.%Y')} arası geçmiş maçlar yükleniyor...")
+    historical_df, historical_odds = load_history_window(historic_data, start_date, end_date, token)
+    save_historic_data(historic_data, historic_file)
+
+    previous_odds = {}
+    report_files = {}
+    polls = 0
+
+    print(f"\n👀 {analysis_date.strftime('%d.%m.%Y')} bülteni {interval} saniyede bir izleniyor (Ctrl+C ile çıkış)...")
+    try:
+        while max_polls is None or polls < max_polls:
+            if polls > 0:
+                time.sleep(interval)
+            polls += 1
+
+            token = get_token()
+            if not token:
+                print("❌ Token alınamadı! Bir sonraki yoklamada tekrar denenecek.")
+                continue
+
+            # Her yoklama oran zaman serisine eklenir (değişmeyen maçlar yer kaplamaz)
+            bulletin_df = pd.DataFrame(record_bulletin(historic_data, historic_file, get_matches_for_date(token, date_str)))
+            if not bulletin_df.empty:
+                bulletin_df = bulletin_df[bulletin_df["Status"] == 1]
+            if select_matches is not None and not bulletin_df.empty:
+                bulletin_df = select_matches(bulletin_df)
+            if bulletin_df.empty:
+                print(f"ℹ️ {datetime.now().strftime('%H:%M:%S')}: İzlenecek aktif maç yok.")
+                continue
+
+            bulletin_df = bulletin_df.drop_duplicates(subset=["id"]).reset_index(drop=True)
+            match_ids = bulletin_df["id"].tolist()
+            bulletin_odds = build_odds_matrix(bulletin_df)
+            changed_ids = set(get_changed_match_ids(previous_odds, match_ids, bulletin_odds, tolerance))
+
+            # Oran değişimi tolerans altındaysa karşılaştırma tabanı eski oranlarda kalır (yavaş kaymalar birikir)
+            for match_id, odds_row in zip(match_ids, bulletin_odds):
+                if match_id in changed_ids:
+                    previous_odds[match_id] = odds_row
+
+            # Bültenden çıkan (başlayan/iptal olan) maçlar izlemeden çıkarılır
+            active_ids = set(match_ids)
+            for match_id in list(previous_odds):
+                if match_id not in active_ids:
+                    del previous_odds[match_id]
+
+            print(f"🔁 {datetime.now().strftime('%H:%M:%S')}: {len(changed_ids)}/{len(match_ids)} maçta oran değişti.")
+            if not changed_ids:
+                continue
+
+            changed_df = bulletin_df[bulletin_df["id"].isin(changed_ids)]
+            similar_matches = find_similar_matches(historical_df, changed_df, threshold,
+                                                   historical_odds=historical_odds, verbose=False)
+            grouped = {}
+            for match in similar_matches:
+                grouped.setdefault(match["Bugünkü Maç"], []).append(match)
+
+            for _, match_row in changed_df.iterrows():
+                match_name = f"{match_row['Ev Sahibi']} vs {match_row['Deplasman']}"
+                report_name = f"Analiz_{match_row['id']}_{match_name.replace(' vs ', '_').replace(' ', '_')}"
+                matches = grouped.get(match_name)
+                if matches:
+                    save_results_to_file(matches, watch_dir, True, match_name, changed_df,
+                                         filename=report_name, add_timestamp=False)
+                    report_files[match_row["id"]] = report_name
+                elif match_row["id"] in report_files:
+                    # Artık benzer maçı olmayan maçın eski raporu kaldırılır
+                    stale_path = os.path.join(watch_dir, f"{report_files.pop(match_row['id'])}.txt")
+                    if os.path.exists(stale_path):
+                        os.remove(stale_path)
+
+    except KeyboardInterrupt:
+        print("\n👋 İzleme durduruldu.")
+
+    return polls
+
+def summarize_outcomes(similar_matches: List[Dict], settlement_by_id: Dict[Any, int]) -> Dict[str, Dict[str, Dict]]:
+    """Benzer maçlarda eşleşen her seçeneğin kaç kez gerçekleştiğini bit maskeleriyle hesaplar"""
+    stats = {}
+    for match in similar_matches:
+        realized_mask = settlement_by_id.get(match.get("Geçmiş Maç ID"), 0)
+        for market_type, odds in match.get("Oranlar", {}).items():
+            market_stats = stats.setdefault(market_type, {})
+            for odd in odds:
+                outcome_stats = market_stats.setdefault(odd["outcome"], {"total": 0, "realized": 0})
+                outcome_stats["total"] += 1
+                if realized_mask >> ODDS_COLUMN_INDEX[f"{market_type}_{odd['outcome']}"] & 1:
+                    outcome_stats["realized"] += 1
+
+    for market_stats in stats.values():
+        for outcome_stats in market_stats.values():
+            outcome_stats["rate"] = round(outcome_stats["realized"] / outcome_stats["total"] * 100, 1)
+    return stats
+
+class AnalysisService:
+    """
+    Geçmiş veriyi bir kez yükleyip bellekte tutan analiz servisi.
+    DataFrame, oran matrisi, id indeksi ve gerçekleşme bit maskeleri bellekte kalır;
+    refresh() sadece yeni veya değişen maçları işler. Okuyucular kilit altında alınan
+    anlık görüntü üzerinde çalışır, güncelleme yeni diziler oluşturup referansları değiştirir.
+    """
+
+    def __init__(self, historic_file: str, bulletin_ttl: int = 300):
+        self.historic_file = historic_file
+        self.bulletin_ttl = bulletin_ttl
+        self.version = 0
+        self._lock = threading.RLock()
+        self._refresh_lock = threading.Lock()
+        self._state = None
+        self._dictionary = StringDictionary()
+        self._records = {}
+        self._bulletins = {}
+        self._query_cache = {}
+        self._odds_index = OddsIndex()
+        self._cube = self._odds_index.attach_cube(OutcomeCube())
+        self._series = OddsSeries()
+
+    def load(self, historic_data: Dict = None):
+        """Geçmiş veriyi yükler ve tüm bellek içi yapıları oluşturur"""
+        if historic_data is None:
+            historic_data = load_historic_data(self.historic_file)
+        matches = [match for day_matches in historic_data.get("matches", {}).values() for match in day_matches]
+        self._dictionary = get_string_dictionary(historic_data)
+        history = get_history_arrays(historic_data)
+        # Servis kendi oran indeksini ve ona bağlı sonuç küpünü tutar, refresh bunları artımlı günceller.
+        # Lig kırılımı ilk lig bazlı özet sorgusunda eklenir.
+        self._odds_index = get_odds_index(historic_data)
+        self._cube = get_outcome_cube(historic_data)
+        self._series = get_odds_series(historic_data)
+
+        with self._lock:
+            self._records = {match.get("id"): dict(match) for match in matches}
+            self._state = self._build_state(history.df, history.odds, history.settlement)
+            self.version += 1
+            self._query_cache.clear()
+
+    def _build_state(self, history_df: pd.DataFrame, history_odds: np.ndarray, settlement: np.ndarray) -> Dict:
+        """Sorguların kullandığı değişmez anlık görüntüyü oluşturur (diziler tarihe göre sıralı tutulur)"""
+        history = HistoryArrays(history_df, history_odds, settlement)
+        history_df = history.df
+        ids = history_df["id"].tolist() if "id" in history_df.columns else [None] * len(history_df)
+        return {
+            "history": history,
+            "df": history_df,
+            "odds": history.odds,
+            "settlement": history.settlement,
+            "positions": {match_id: pos for pos, match_id in enumerate(ids) if match_id is not None}
+        }
+
+    def refresh(self) -> Dict:
+        """auto_update_data ile güncelleme yapar ve sadece yeni/değişen maçları belleğe işler"""
+        with self._refresh_lock:
+            historic_data = auto_update_data(self.historic_file)
+
+            new_matches = []
+            changed_matches = []
+            for date_str, day_matches in historic_data.get("matches", {}).items():
+                for match in day_matches:
+                    previous = self._records.get(match.get("id"))
+                    if previous is None:
+                        new_matches.append(match)
+                    elif previous != match:
+                        changed_matches.append(match)
+                    else:
+                        continue
+                    # Oran indeksi ve küp sadece yeni/değişen satırlar için güncellenir
+                    self._odds_index.upsert(match, date_str, self._dictionary)
+
+            if not new_matches and not changed_matches:
+                return {"new_matches": 0, "updated_matches": 0, "version": self.version}
+
+            with self._lock:
+                state = self._state
+            history_df, history_odds, settlement = state["df"], state["odds"], state["settlement"]
+            odds_index = self._odds_index
+
+            # Değişen maçlar: sadece ilgili satırlar yeniden hesaplanır (kopya üzerinde)
+            updated_count = 0
+            if changed_matches:
+                history_df = history_df.copy()
+                history_odds = history_odds.copy()
+                settlement = settlement.copy()
+                # Yeni skor/saat metinleri önce sözlüğe eklenir ki kategorik sütunlara yazılabilsin
+                for match in changed_matches:
+                    self._dictionary.add_match(match)
+                history_df = align_categoricals(history_df, self._dictionary)
+                for match in changed_matches:
+                    pos = state["positions"].get(match.get("id"))
+                    if pos is None:
+                        continue
+                    row_df = pd.DataFrame([match])
+                    for column in row_df.columns:
+                        if column not in history_df.columns:
+                            history_df[column] = None
+                        history_df.at[pos, column] = row_df.at[0, column]
+                    row_odds, row_settlement = odds_index.rows_for(row_df)
+                    history_odds[pos] = row_odds[0]
+                    settlement[pos] = row_settlement[0]
+                    updated_count += 1
+
+            # Yeni maçlar sona eklenir (tekrarlar veri eklenirken MatchIndex ile reddedildi)
+            added = new_matches
+            if added:
+                added_df = encode_categoricals(pd.DataFrame(added), self._dictionary)
+                history_df = pd.concat([align_categoricals(history_df, self._dictionary), added_df], ignore_index=True)
+                added_odds, added_settlement = odds_index.rows_for(added_df)
+                history_odds = np.vstack([history_odds, added_odds])
+                settlement = np.concatenate([settlement, added_settlement])
+
+            new_state = self._build_state(history_df, history_odds, settlement)
+            with self._lock:
+                for match in new_matches + changed_matches:
+                    self._records[match.get("id")] = dict(match)
+                self._state = new_state
+                self.version += 1
+                self._query_cache.clear()
+
+            print(f"🔄 Servis güncellendi: {len(added)} yeni maç, {updated_count} maç güncellendi.")
+            return {"new_matches": len(added), "updated_matches": updated_count, "version": self.version}
+
+    def get_bulletin(self, date_str: str) -> pd.DataFrame:
+        """Analiz gününün bültenini önbellekten veya API'den döndürür"""
+        with self._lock:
+            cached = self._bulletins.get(date_str)
+        if cached and time.time() - cached[0] < self.bulletin_ttl:
+            return cached[1]
+
+        token = get_token()
+        if not token:
+            raise RuntimeError("Token alınamadı")
+        matches = get_matches_for_date(token, date_str)
+        if self._series.record_many(matches):
+            with HistoryLock(self.historic_file):
+                self._series.save(self.historic_file)
+        bulletin_df = pd.DataFrame(matches)
+        with self._lock:
+            self._bulletins[date_str] = (time.time(), bulletin_df)
+        return bulletin_df
+
+    def odds_movement(self, match_id: int) -> Dict:
+        """Maçın kaydedilen yoklamalardaki açılış ve kapanış oranları"""
+        movement = self._series.opening_closing(match_id)
+        if not movement:
+            raise ValueError(f"{match_id} için oran kaydı yok")
+        return {"match_id": match_id, **movement}
+
+    def query(self, date_str: str, window_days: int = 7, threshold: float = 0.05,
+              leagues: List[str] = None, teams: List[str] = None) -> Dict:
+        """Benzer maç sorgusunu yanıtlar; aynı parametreler ve veri sürümü için sonuç önbellekten döner"""
+        started = time.perf_counter()
+        analysis_date = datetime.strptime(date_str, "%Y-%m-%d")
+        bulletin_df = self.get_bulletin(date_str)
+
+        with self._lock:
+            state = self._state
+            version = self.version
+            bulletin_time = self._bulletins[date_str][0]
+        cache_key = (date_str, window_days, threshold_to_ticks(threshold), tuple(leagues or []), tuple(teams or []), version, bulletin_time)
+        with self._lock:
+            cached = self._query_cache.get(cache_key)
+        if cached is not None:
+            return dict(cached, cached=True, elapsed_ms=round((time.perf_counter() - started) * 1000, 2))
+
+        end_date = (analysis_date - timedelta(days=1)).strftime("%Y-%m-%d")
+        start_date = (analysis_date - timedelta(days=1 + window_days)).strftime("%Y-%m-%d")
+        window_df, window_odds = state["history"].window(start_date, end_date)
+
+        today_df = filter_matches(bulletin_df, leagues, teams)
+        similar_matches = []
+        if not today_df.empty:
+            similar_matches = find_similar_matches(window_df, today_df, threshold,
+                                                   historical_odds=window_odds, verbose=False)
+
+        settlement_by_id = {}
+        grouped = {}
+        for match in similar_matches:
+            pos = state["positions"].get(match.get("Geçmiş Maç ID"))
+            if pos is not None:
+                settlement_by_id[match["Geçmiş Maç ID"]] = int(state["settlement"][pos])
+            grouped.setdefault(match["Bugünkü Maç"], []).append(match)
+
+        response = {
+            "date": date_str,
+            "window": window_days,
+            "threshold": threshold,
+            "history_version": version,
+            "history_window": [start_date, end_date],
+            "matches": [
+                {
+                    "match": today_match,
+                    "similar_count": len(matches),
+                    "stats": summarize_outcomes(matches, settlement_by_id),
+                    "similar": matches
+                }
+                for today_match, matches in grouped.items()
+            ]
+        }
+        with self._lock:
+            self._query_cache[cache_key] = response
+        return dict(response, cached=False, elapsed_ms=round((time.perf_counter() - started) * 1000, 2))
+
+    def summary(self, date_str: str, window_days: int = 365, threshold: float = 0.05, leagues: List[str] = None,
+                teams: List[str] = None, by_league: bool = False) -> Dict:
+        """Geniş pencere özetini sonuç küpünden yanıtlar (geçmiş maç listesi için /similar kullanılır)"""
+        started = time.perf_counter()
+        analysis_date = datetime.strptime(date_str, "%Y-%m-%d")
+        today_df = filter_matches(self.get_bulletin(date_str), leagues, teams)
+        end_date = (analysis_date - timedelta(days=1)).strftime("%Y-%m-%d")
+        start_date = (analysis_date - timedelta(days=1 + window_days)).strftime("%Y-%m-%d")
+        with self._lock:
+            version = self.version
+        cube = self._cube
+        if by_league and not cube.by_league:
+            cube = self._odds_index.add_league_breakdown()
+        summaries = summarize_with_cube(cube, today_df, start_date, end_date, threshold,
+                                        self._dictionary if by_league else None)
+        return {
+            "date": date_str,
+            "window": window_days,
+            "threshold": threshold,
+            "history_version": version,
+            "history_window": [start_date, end_date],
+            "matches": summaries,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 2)
+        }
+
+    def health(self) -> Dict:
+        with self._lock:
+            state = self._state
+            return {
+                "status": "ok",
+                "history_version": self.version,
+                "history_matches": len(state["df"]) if state else 0,
+                "cached_bulletins": sorted(self._bulletins),
+                "cached_queries": len(self._query_cache)
+            }
+
+def create_service_handler(service: AnalysisService):
+    """Servis için JSON yanıt veren HTTP istek işleyicisini oluşturur"""
+
+    class ServiceRequestHandler(BaseHTTPRequestHandler):
+        def _send_json(self, status: int, payload: Dict):
+            body = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            params = parse_qs(url.query)
+            try:
+                if url.path == "/health":
+                    self._send_json(200, service.health())
+                elif url.path == "/similar":
+                    date_str = params.get("date", [datetime.now(timezone.utc).strftime("%Y-%m-%d")])[0]
+                    self._send_json(200, service.query(
+                        date_str,
+                        window_days=int(params.get("window", ["7"])[0]),
+                        threshold=float(params.get("threshold", ["0.05"])[0]),
+                        leagues=params.get("league", []),
+                        teams=params.get("match", [])
+                    ))
+                elif url.path == "/summary":
+                    date_str = params.get("date", [datetime.now(timezone.utc).strftime("%Y-%m-%d")])[0]
+                    self._send_json(200, service.summary(
+                        date_str,
+                        window_days=int(params.get("window", ["365"])[0]),
+                        threshold=float(params.get("threshold", ["0.05"])[0]),
+                        leagues=params.get("league", []),
+                        teams=params.get("match", []),
+                        by_league=params.get("by_league", ["0"])[0] in ("1", "true")
+                    ))
+                elif url.path == "/odds":
+                    self._send_json(200, service.odds_movement(int(params.get("match_id", [""])[0])))
+                else:
+                    self._send_json(404, {"error": "Bulunamadı"})
+            except ValueError as e:
+                self._send_json(400, {"error": str(e)})
+            except Exception as e:
+                self._send_json(500, {"error": str(e)})
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            try:
+                if url.path == "/refresh":
+                    self._send_json(200, service.refresh())
+                else:
+                    self._send_json(404, {"error": "Bulunamadı"})
+            except Exception as e:
+                self._send_json(500, {"error": str(e)})
+
+        def log_message(self, format, *args):
+            # İstek günlüğü kapalı (yük testlerinde konsolu doldurmaması için)
+            pass
+
+    return ServiceRequestHandler
+
+class ThreadingUnixHTTPServer(ThreadingMixIn, UnixStreamServer):
+    daemon_threads = True
+
+def run_service(args: argparse.Namespace, historic_file: str, historic_data: Dict = None) -> int:
+    """Servisi başlatır ve durdurulana kadar istekleri yanıtlar"""
+    service = AnalysisService(historic_file)
+    print("\n📂 Geçmiş veriler belleğe yükleniyor...")
+    service.load(historic_data)
+    print(f"✅ {service.health()['history_matches']} geçmiş maç yüklendi.")
+
+    if args.refresh_interval > 0:
+        def refresh_loop():
+            while True:
+                time.sleep(args.refresh_interval * 60)
+                try:
+                    service.refresh()
+                except Exception as e:
+                    print(f"❌ Servis güncelleme hatası: {str(e)}")
+        threading.Thread(target=refresh_loop, daemon=True).start()
+
+    handler = create_service_handler(service)
+    if args.socket:
+        if os.path.exists(args.socket):
+            os.remove(args.socket)
+        server = ThreadingUnixHTTPServer(args.socket, handler)
+        print(f"🚀 Servis çalışıyor: unix:{args.socket}")
+    else:
+        server = ThreadingHTTPServer((args.host, args.port), handler)
+        server.daemon_threads = True
+        print(f"🚀 Servis çalışıyor: http://{args.host}:{server.server_address[1]}")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Servis durduruluyor...")
+    finally:
+        server.server_close()
+        if args.socket and os.path.exists(args.socket):
+            os.remove(args.socket)
+    return EXIT_OK
+
+# Profil raporunda çağrılan fonksiyonları ayrıca listelenen sıcak yollar
+PROFILE_HOT_PATHS = ["find_similar_matches", "save_results_to_file"]
+
+class PeakMemorySampler(threading.Thread):
+    """tracemalloc belleğini periyodik olarak yoklar; bellek %10'dan fazla arttıkça anlık görüntü alır (tepeye en yakın olan saklanır)"""
+
+    def __init__(self, interval: float = 0.05):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.snapshot = None
+        self.snapshot_memory = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            current_memory = tracemalloc.get_traced_memory()[0]
+            if current_memory > self.snapshot_memory * 1.1:
+                self.snapshot = tracemalloc.take_snapshot()
+                self.snapshot_memory = current_memory
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+def run_with_profiling(func: Callable[[], Any], profile_dir: str, run_key: str, top_n: int = 25,
+                       run_params: Dict = None) -> Any:
+    """
+    Fonksiyonu cProfile ve tracemalloc altında çalıştırır.
+    Profil dökümü (.prof, snakeviz/pstats ile açılabilir) ve en sıcak fonksiyon / en çok bellek ayıran
+    satır raporu (.txt) profile_dir altına çalıştırma parametreleriyle isimlendirilerek yazılır.
+    """
+    os.makedirs(profile_dir, exist_ok=True)
+    base_name = f"Profil_{run_key}_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}".replace(':', '.').replace('/', '_').replace('\\', '_')
+    dump_path = os.path.join(profile_dir, f"{base_name}.prof")
+    report_path = os.path.join(profile_dir, f"{base_name}.txt")
+
+    profiler = cProfile.Profile()
+    tracemalloc.start(10)
+    sampler = PeakMemorySampler()
+    sampler.start()
+    started = time.perf_counter()
+    try:
+        profiler.enable()
+        try:
+            return func()
+        finally:
+            profiler.disable()
+    finally:
+        elapsed = time.perf_counter() - started
+        sampler.stop()
+        snapshot = tracemalloc.take_snapshot()
+        current_memory, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        profiler.dump_stats(dump_path)
+
+        report = io.StringIO()
+        report.write(f"Profil: {base_name}\n")
+        report.write(f"Parametreler: {json.dumps(run_params or {}, ensure_ascii=False, default=str)}\n")
+        report.write(f"Süre: {elapsed:.3f} s (profil yükü dahil)\n")
+        report.write(f"Tepe bellek (tracemalloc): {peak_memory / (1024 * 1024):.2f} MB\n")
+        report.write("─" * 80 + "\n")
+
+        stats = pstats.Stats(profiler, stream=report)
+        stats.strip_dirs()
+        report.write(f"\n🔥 Kümülatif süreye göre ilk {top_n} fonksiyon\n")
+        stats.sort_stats("cumulative").print_stats(top_n)
+        report.write(f"\n🔥 Kendi süresine göre ilk {top_n} fonksiyon\n")
+        stats.sort_stats("tottime").print_stats(top_n)
+        for hot_path in PROFILE_HOT_PATHS:
+            report.write(f"\n🔍 {hot_path} içinde zamanın dağılımı\n")
+            stats.sort_stats("tottime").print_callees(hot_path)
+
+        allocation_snapshots = []
+        if sampler.snapshot is not None:
+            allocation_snapshots.append((f"tepeye en yakın an, {sampler.snapshot_memory / (1024 * 1024):.2f} MB", sampler.snapshot))
+        allocation_snapshots.append((f"çalıştırma sonu, {current_memory / (1024 * 1024):.2f} MB", snapshot))
+        for title, allocation_snapshot in allocation_snapshots:
+            report.write(f"\n💾 En çok bellek ayıran ilk {top_n} satır ({title})\n")
+            report.write("─" * 80 + "\n")
+            for stat in allocation_snapshot.statistics("lineno")[:top_n]:
+                report.write(f"{stat.size / 1024:>10.1f} KB {stat.count:>8} blok  {stat.traceback}\n")
+
+        with open(report_path, 'w', encoding='utf-8') as f:
+            f.write(report.getvalue())
+        print(f"\n🧪 Profil kaydedildi: {dump_path}")
+        print(f"🧪 Profil raporu: {report_path}")
+
+# Komut satırı çıkış kodları
+EXIT_OK = 0
+EXIT_ERROR = 1
+EXIT_USAGE = 2
+EXIT_NO_MATCHES = 3
+EXIT_TOKEN_ERROR = 4
+
+def parse_arguments(argv: List[str] = None) -> argparse.Namespace:
+    """Etkileşimsiz (cron / pipeline) çalışma için komut satırı argümanlarını ayrıştırır"""
+    parser = argparse.ArgumentParser(
+        description="Oran Analiz - etkileşimsiz çalışma. Argümansız çalıştırıldığında menü açılır.",
+        epilog=f"Çıkış kodları: {EXIT_OK}=başarılı, {EXIT_ERROR}=hata, {EXIT_USAGE}=hatalı argüman, "
+               f"{EXIT_NO_MATCHES}=benzer maç bulunamadı, {EXIT_TOKEN_ERROR}=token alınamadı"
+    )
+    parser.add_argument("--date", help="Analiz günü (YYYY-MM-DD, varsayılan: bugün)")
+    parser.add_argument("--days", type=int, default=1, help="Analiz gününden itibaren analiz edilecek gün sayısı (varsayılan: 1)")
+    parser.add_argument("--window", type=int, default=7, help="Geçmiş maç aralığı, gün (varsayılan: 7)")
+    parser.add_argument("--threshold", type=float, default=0.05, help="Benzer oran eşiği (varsayılan: 0.05)")
+    parser.add_argument("--league", action="append", default=[], help="Lig filtresi (kısmi eşleşme, birden fazla verilebilir)")
+    parser.add_argument("--match", action="append", default=[], help="Takım veya 'Ev Sahibi vs Deplasman' filtresi (birden fazla verilebilir)")
+    parser.add_argument("--format", choices=list(OUTPUT_FORMATS), default="text",
+                        help="Çıktı biçimi: text, json, csv, both (text+json) veya all (varsayılan: text)")
+    parser.add_argument("--per-match", action="store_true",
+                        help="Her maç için Analizler/Toplu_Analiz_<tarih> altına ayrı rapor dosyaları da yaz")
+    parser.add_argument("--summary", action="store_true", help="Maç listesi yerine seçenek gerçekleşme özetini sonuç küpünden üret (geniş pencereler için)")
+    parser.add_argument("--by-league", action="store_true", help="--summary özetini her maçın kendi ligiyle sınırla")
+    parser.add_argument("--backtest", action="store_true", help="--date'ten itibaren --days geçmiş günü kendi pencereleriyle yeniden oynat, isabet ve kalibrasyon raporu yaz")
+    parser.add_argument("--workers", type=int, default=0, help="Geriye dönük testte paralel süreç sayısı (0: işlemci sayısı)")
+    parser.add_argument("--results", action="store_true", help="Kayıtlı analizleri sonuçlandır ve --date/--days, --league, --match, --market filtreleriyle başarı özetini yazdır")
+    parser.add_argument("--market", choices=list(MARKET_OUTCOMES), help="--results sorgusunu tek markete sınırla")
+    parser.add_argument("--shard-plan", type=int, metavar="N", help="Analizi N parçaya böl: bugünkü maç seçimini dondur ve parça planını yaz")
+    parser.add_argument("--partition", choices=["date", "league"], default="date", help="Parçalama anahtarı: gün aralığı veya lig (varsayılan: date)")
+    parser.add_argument("--shard-dir", help="Parça planı ve sonuç klasörü (varsayılan: Analizler/Parcali_<tarih>_<pencere>gun)")
+    parser.add_argument("--shard-work", type=int, metavar="K", help="Plandaki K numaralı parçayı tara ve sonucunu parça klasörüne yaz (güncelleme yapılmaz)")
+    parser.add_argument("--shard-merge", action="store_true", help="Parça sonuçlarını birleştirip raporları yaz (güncelleme yapılmaz)")
+    parser.add_argument("--update-only", action="store_true", help="Sadece geçmiş verileri güncelle, analiz yapma")
+    parser.add_argument("--no-update", action="store_true", help="Başlangıçtaki otomatik güncellemeyi atla")
+    parser.add_argument("--base-dir", help="Ana dizin (varsayılan: get_base_directory())")
+    parser.add_argument("--serve", action="store_true", help="Geçmiş veriyi bellekte tutan yerel analiz servisini başlat")
+    parser.add_argument("--host", default="127.0.0.1", help="Servis adresi (varsayılan: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8765, help="Servis portu (varsayılan: 8765)")
+    parser.add_argument("--socket", help="TCP yerine Unix soket yolu")
+    parser.add_argument("--refresh-interval", type=int, default=0, help="Servisin otomatik güncelleme aralığı, dakika (0: kapalı)")
+    parser.add_argument("--watch", action="store_true", help="Analiz gününün bültenini izle, oranı değişen maçları yeniden analiz et")
+    parser.add_argument("--interval", type=int, default=300, help="İzleme yoklama aralığı, saniye (varsayılan: 300)")
+    parser.add_argument("--tolerance", type=float, default=0.0, help="Yeniden analiz için en küçük oran değişimi (varsayılan: 0.0)")
+    parser.add_argument("--metrics", action="store_true", help="Aşama süreleri ve sayaçları Analizler/Metrikler altına JSON olarak yaz")
+    parser.add_argument("--metrics-summary", action="store_true", help="Çalıştırma sonunda aşama süreleri tablosunu yazdır (--metrics'i de açar)")
+    parser.add_argument("--profile", action="store_true", help="Analizi cProfile ve tracemalloc altında çalıştır, raporu Analizler/Profiller altına yaz")
+    parser.add_argument("--profile-top", type=int, default=25, help="Profil raporundaki satır sayısı (varsayılan: 25)")
+
+    args = parser.parse_args(argv)
+
+    if args.date:
+        try:
+            datetime.strptime(args.date, "%Y-%m-%d")
+        except ValueError:
+            parser.error("--date YYYY-MM-DD biçiminde olmalı")
+    if args.days < 1:
+        parser.error("--days en az 1 olmalı")
+    if args.window < 1:
+        parser.error("--window en az 1 olmalı")
+    if args.threshold < 0:
+        parser.error("--threshold negatif olamaz")
+    if args.update_only and args.no_update:
+        parser.error("--update-only ve --no-update birlikte kullanılamaz")
+    if args.update_only and (args.serve or args.watch):
+        parser.error("--update-only, --serve ve --watch ile birlikte kullanılamaz")
+    if args.serve and args.watch:
+        parser.error("--serve ve --watch birlikte kullanılamaz")
+    if args.summary and (args.serve or args.watch):
+        parser.error("--summary, --serve ve --watch ile birlikte kullanılamaz")
+    if args.by_league and not args.summary:
+        parser.error("--by-league sadece --summary ile kullanılabilir")
+    if args.backtest and (args.serve or args.watch or args.summary or args.update_only):
+        parser.error("--backtest, --serve, --watch, --summary ve --update-only ile birlikte kullanılamaz")
+    if args.backtest and not args.date:
+        parser.error("--backtest için --date (ilk test günü) gerekli")
+    if args.workers < 0:
+        parser.error("--workers negatif olamaz")
+    if args.profile and (args.serve or args.watch):
+        parser.error("--profile, --serve ve --watch ile birlikte kullanılamaz")
+    if args.profile_top < 1:
+        parser.error("--profile-top en az 1 olmalı")
+    if args.interval < 1:
+        parser.error("--interval en az 1 olmalı")
+    if args.tolerance < 0:
+        parser.error("--tolerance negatif olamaz")
+    if args.results and (args.serve or args.watch or args.summary or args.backtest or args.update_only):
+        parser.error("--results, --serve, --watch, --summary, --backtest ve --update-only ile birlikte kullanılamaz")
+    if args.market and not args.results:
+        parser.error("--market sadece --results ile kullanılabilir")
+    shard_modes = [args.shard_plan is not None, args.shard_work is not None, args.shard_merge]
+    if sum(shard_modes) > 1:
+        parser.error("--shard-plan, --shard-work ve --shard-merge birlikte kullanılamaz")
+    if any(shard_modes) and (args.serve or args.watch or args.summary or args.backtest or args.update_only or args.results):
+        parser.error("Parçalı analiz, --serve, --watch, --summary, --backtest ve --update-only ile birlikte kullanılamaz")
+    if args.shard_plan is not None and args.shard_plan < 1:
+        parser.error("--shard-plan en az 1 olmalı")
+    if args.shard_plan is not None and args.days != 1:
+        parser.error("--shard-plan tek analiz günü ile kullanılabilir (--days 1)")
+    if args.shard_work is not None and args.shard_work < 0:
+        parser.error("--shard-work negatif olamaz")
+
+    return args
+
+def filter_matches(matches_df: pd.DataFrame, leagues: List[str] = None, teams: List[str] = None) -> pd.DataFrame:
+    """Aktif maçları lig ve takım filtrelerine göre seçer (büyük/küçük harf duyarsız, kısmi eşleşme)"""
+    if matches_df.empty:
+        return matches_df
+
+    selected = matches_df[matches_df["Status"] == 1]
+
+    if leagues:
+        league_names = selected["Lig"].fillna("").str.lower()
+        league_mask = np.zeros(len(selected), dtype=bool)
+        for league in leagues:
+            league_mask |= league_names.str.contains(league.lower(), regex=False).to_numpy()
+        selected = selected[league_mask]
+
+    if teams:
+        home_names = selected["Ev Sahibi"].fillna("").str.lower()
+        away_names = selected["Deplasman"].fillna("").str.lower()
+        team_mask = np.zeros(len(selected), dtype=bool)
+        for team in teams:
+            if " vs " in team:
+                home, away = [part.strip().lower() for part in team.split(" vs ", 1)]
+                team_mask |= ((home_names == home) & (away_names == away)).to_numpy()
+            else:
+                team = team.strip().lower()
+                team_mask |= (home_names.str.contains(team, regex=False) | away_names.str.contains(team, regex=False)).to_numpy()
+        selected = selected[team_mask]
+
+    return selected
+
+def get_run_key(args: argparse.Namespace) -> str:
+    """Çalıştırmayı tanımlayan kısa anahtar (profil ve rapor dosya adlarında kullanılır)"""
+    run_date = args.date or datetime.now(timezone.utc).strftime("%Y-%m-%d")
+    parts = [run_date, f"{args.days}gun", f"pencere{args.window}", f"esik{args.threshold}"]
+    if args.league:
+        parts.append("lig-" + "-".join(args.league))
+    if args.match:
+        parts.append("mac-" + "-".join(args.match))
+    if args.update_only:
+        parts.append("guncelleme")
+    return "_".join(parts).replace(" ", "_")
+
+def report_stored_results(args: argparse.Namespace, historic_data: Dict, analysis_dir: str) -> int:
+    """Depodaki analizleri geçmiş veriyle sonuçlandırır ve filtrelenmiş başarı özetini yazdırır"""
+    start_date = end_date = None
+    if args.date:
+        start_date = args.date
+        end_date = (datetime.strptime(args.date, "%Y-%m-%d") + timedelta(days=args.days - 1)).strftime("%Y-%m-%d")
+    with ResultStore(os.path.join(analysis_dir, RESULT_STORE_FILE)) as store:
+        settled = store.settle(historic_data)
+        if settled:
+            print(f"\n✅ {settled} analiz edilen maç sonuçlandırıldı.")
+        rows = store.query(start_date, end_date, args.league, args.match, args.market, settled_only=True)
+    summary = summarize_store_results(rows)
+    print(format_store_summary(summary))
+    return EXIT_OK if summary else EXIT_NO_MATCHES
+
+def run_headless(args: argparse.Namespace) -> int:
+    """Menü göstermeden analiz/güncelleme yapar ve çıkış kodunu döndürür (stdin okunmaz)"""
+    if args.profile:
+        profile_dir = os.path.join(initialize_directories(args.base_dir)[2], "Profiller")
+        return run_with_profiling(lambda: _run_measured(args), profile_dir, get_run_key(args),
+                                  args.profile_top, vars(args))
+    return _run_measured(args)
+
+def _run_measured(args: argparse.Namespace) -> int:
+    if not (args.metrics or args.metrics_summary):
+        return _run_headless(args)
+
+    METRICS.enable()
+    METRICS.reset()
+    try:
+        return _run_headless(args)
+    finally:
+        if args.metrics_summary:
+            print(METRICS.summary_table())
+        metrics_dir = os.path.join(initialize_directories(args.base_dir)[2], "Metrikler")
+        print(f"\n📈 Ölçümler kaydedildi: {METRICS.write(metrics_dir, vars(args))}")
+        METRICS.disable()
+
+def _run_headless(args: argparse.Namespace) -> int:
+    try:
+        base_dir, data_dir, analysis_dir = initialize_directories(args.base_dir)
+        historic_file = os.path.join(data_dir, "historic_matches.json")
+
+        # Parça işçileri ve birleştirme planın kaydettiği veri sürümüyle çalışmalıdır; güncelleme yapılmaz
+        if args.no_update or args.shard_work is not None or args.shard_merge:
+            historic_data = load_historic_data(historic_file)
+            if not historic_data.get("matches"):
+                historic_data = {"matches": {}, "last_update": None}
+        else:
+            print("\n🔄 Otomatik veri güncelleme başlatılıyor...")
+            if not get_token():
+                print("❌ Token alınamadı! Güncelleme yapılamadı.")
+                return EXIT_TOKEN_ERROR
+            historic_data = auto_update_data(historic_file)
+
+        if args.update_only:
+            # Zamanlanmış çalıştırmalar başarısız günleri ve kaydı çıkış kodundan anlar
+            return EXIT_ERROR if historic_data.get("_update_errors") else EXIT_OK
+
+        if args.serve:
+            return run_service(args, historic_file, historic_data)
+
+        if args.results:
+            return report_stored_results(args, historic_data, analysis_dir)
+
+        if args.backtest:
+            # Geriye dönük test sadece kayıtlı geçmiş veriyle çalışır, API'ye gerek yoktur
+            summary = run_backtest(historic_data, datetime.strptime(args.date, "%Y-%m-%d"), args.days, args.window,
+                                   analysis_dir, threshold=args.threshold, workers=args.workers)
+            return EXIT_OK if summary["markets"] else EXIT_NO_MATCHES
+
+        run_date = args.date or datetime.now(timezone.utc).strftime("%Y-%m-%d")
+        shard_dir = args.shard_dir or get_shard_dir(analysis_dir, run_date, args.window)
+
+        # Parça işçileri ve birleştirme dondurulmuş seçimle çalışır, API'ye gerek yoktur
+        if args.shard_work is not None:
+            run_shard(historic_data, shard_dir, args.shard_work)
+            return EXIT_OK
+
+        if args.shard_merge:
+            similar_matches = merge_shards(shard_dir, analysis_dir, output_format=args.format)
+            return EXIT_OK if similar_matches else EXIT_NO_MATCHES
+
+        token = get_token()
+        if not token:
+            print("❌ Token alınamadı! Analiz yapılamıyor.")
+            return EXIT_TOKEN_ERROR
+
+        if args.date:
+            first_date = datetime.strptime(args.date, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+        else:
+            first_date = datetime.now(timezone.utc)
+
+        if args.watch:
+            watch_matches(first_date, args.window, historic_data, historic_file, analysis_dir,
+                          threshold=args.threshold, interval=args.interval, tolerance=args.tolerance,
+                          select_matches=lambda df: filter_matches(df, args.league, args.match))
+            return EXIT_OK
+
+        analysis_dates = [first_date + timedelta(days=i) for i in range(args.days)]
+
+        if args.shard_plan is not None:
+            # İşçilerin okuyacağı pencere eksiksiz olsun diye önce tamamlanıp kaydedilir
+            end_date = first_date - timedelta(days=1)
+            fill_missing_days(historic_data, end_date - timedelta(days=args.window), end_date, token)
+            save_historic_data(historic_data, historic_file)
+            bulletin = record_bulletin(historic_data, historic_file, get_matches_for_date(token, run_date))
+            create_shard_plan(historic_data, bulletin, first_date, args.window, shard_dir, args.shard_plan,
+                              partition=args.partition, threshold=args.threshold,
+                              select_matches=lambda df: filter_matches(df, args.league, args.match))
+            return EXIT_OK
+
+        if args.summary:
+            results = summarize_multiple_days(
+                analysis_dates, args.window, token, historic_data, historic_file, analysis_dir,
+                threshold=args.threshold,
+                select_matches=lambda df: filter_matches(df, args.league, args.match),
+                by_league=args.by_league
+            )
+            return EXIT_OK if any(results.values()) else EXIT_NO_MATCHES
+
+        results = analyze_multiple_days(
+            analysis_dates, args.window, token, historic_data, historic_file, analysis_dir,
+            threshold=args.threshold,
+            select_matches=lambda df: filter_matches(df, args.league, args.match),
+            output_format=args.format,
+            per_match=args.per_match
+        )
+
+        if not any(results.values()):
+            return EXIT_NO_MATCHES
+        return EXIT_OK
+
+    except Exception as e:
+        print(f"\n❌ Program hatası: {str(e)}")
+        return EXIT_ERROR
+
 # Global variables
 base_dir = None
 data_dir = None
 analysis_dir = None
 historic_data = None
 
-def main():
+def main(argv: List[str] = None) -> int:
     global base_dir, data_dir, analysis_dir, historic_data
-    
+
+    if argv is None:
+        argv = sys.argv[1:]
+    if argv:
+        return run_headless(parse_arguments(argv))
+
     try:
         # Dizinleri başlat
         base_dir, data_dir, analysis_dir = initialize_directories()
@@ -1249,6 +4906,11 @@ def main():
             print("❌ Token alınamadı! Güncelleme yapılamadı.")
             historic_data = load_historic_data(historic_file)
 
+        # Menüde sunulan günlerin bültenleri arka planda çekilir ve BULLETIN_TTL aralıkla yenilenir;
+        # her çekim oran zaman serisine de eklenir
+        bulletin_cache = BulletinCache(on_fetch=lambda date_str, matches: record_bulletin(historic_data, historic_file, matches))
+        bulletin_cache.start(lambda: [date.strftime("%Y-%m-%d") for date in get_upcoming_dates()])
+
         # Ana menüye devam et
         while True:
             print("\n📊 Oran Analiz Ana Menü:")
@@ -1260,7 +4922,7 @@ def main():
             choice = input("Seçiminiz (1-2): ")
 
             if choice == "1":
-                analyze_matches()
+                analyze_matches(bulletin_cache, historic_data)
             elif choice == "2":
                 print("\n👋 Programdan çıkılıyor...")
                 break
@@ -1273,9 +4935,13 @@ def main():
                     print("\n👋 Programdan çıkılıyor...")
                     break
 
+        bulletin_cache.stop()
+        return EXIT_OK
+
     except Exception as e:
         print(f"\n❌ Program hatası: {str(e)}")
         input("\nProgramı kapatmak için bir tuşa basın...")
+        return EXIT_ERROR
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file